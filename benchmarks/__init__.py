@@ -0,0 +1,6 @@
+"""
+Benchmark delle prestazioni di elaborazione
+
+Uso:
+    python -m benchmarks.run_benchmarks --quick
+"""
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generazione di immagini e loghi sintetici per i benchmark
+"""
+
+import os
+
+from PIL import Image, ImageDraw
+
+
+# Risoluzioni del corpus completo (fino a 50 MP) e di quello ridotto
+FULL_RESOLUTIONS = [
+    (1920, 1080),    # Full HD
+    (4000, 3000),    # 12 MP
+    (4000, 6000),    # 24 MP verticale
+    (8256, 5504),    # 45 MP
+    (8660, 5773),    # 50 MP
+]
+QUICK_RESOLUTIONS = [
+    (640, 480),
+    (1920, 1080),
+    (1080, 1920),
+]
+
+# Formati generati: (estensione, formato PIL, modo)
+CORPUS_FORMATS = [
+    ('.jpg', 'JPEG', 'RGB'),
+    ('.png', 'PNG', 'RGBA'),
+    ('.bmp', 'BMP', 'RGB'),
+    ('.gif', 'GIF', 'P'),
+]
+
+
+def _synthetic_photo(width, height, seed):
+    """
+    Crea un'immagine con gradiente e rumore (simile a una foto per i codec)
+
+    Args:
+        width: Larghezza
+        height: Altezza
+        seed: Variazione del contenuto tra un'immagine e l'altra
+
+    Returns:
+        Immagine PIL RGB
+    """
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 30 + seed % 20)
+    blue = Image.radial_gradient('L').resize((width, height))
+    return Image.merge('RGB', (gradient, noise, blue))
+
+
+def generate_corpus(folder, resolutions, copies=1):
+    """
+    Genera il corpus di immagini sintetiche in tutti i formati
+
+    Args:
+        folder: Cartella di destinazione (creata se non esiste)
+        resolutions: Lista di (larghezza, altezza)
+        copies: Immagini per ogni combinazione risoluzione/formato
+
+    Returns:
+        Lista ordinata dei percorsi generati
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    seed = 0
+    for width, height in resolutions:
+        for copy_idx in range(copies):
+            photo = _synthetic_photo(width, height, seed)
+            seed += 1
+            for extension, pil_format, mode in CORPUS_FORMATS:
+                path = os.path.join(folder, f"img_{width}x{height}_{copy_idx}{extension}")
+                if mode == 'P':
+                    img = photo.convert('P', palette=Image.Palette.ADAPTIVE)
+                else:
+                    img = photo.convert(mode)
+                if mode == 'RGBA':
+                    img.putalpha(Image.linear_gradient('L').resize((width, height)))
+                img.save(path, pil_format)
+                paths.append(path)
+    return sorted(paths)
+
+
+def generate_logos(folder):
+    """
+    Genera un logo RGBA (con trasparenza) e uno RGB
+
+    Args:
+        folder: Cartella di destinazione
+
+    Returns:
+        Dizionario {'rgba': percorso, 'rgb': percorso}
+    """
+    os.makedirs(folder, exist_ok=True)
+
+    logo = Image.new('RGBA', (700, 650), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(logo)
+    draw.ellipse([20, 20, 680, 630], fill=(200, 30, 30, 230))
+    draw.rectangle([200, 250, 500, 400], fill=(255, 255, 255, 255))
+    rgba_path = os.path.join(folder, 'logo_rgba.png')
+    logo.save(rgba_path)
+
+    rgb_path = os.path.join(folder, 'logo_rgb.jpg')
+    logo.convert('RGB').save(rgb_path, 'JPEG', quality=95)
+
+    return {'rgba': rgba_path, 'rgb': rgb_path}
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del tempo di avvio (import a freddo) dei moduli di elaborazione
+
+Ogni misura avvia un interprete nuovo, come un processo worker o un
+sottoprocesso per singola richiesta, e sottrae il tempo di avvio di un
+interprete vuoto. Controlla anche che il percorso di elaborazione non
+importi tkinter né ImageTk.
+
+Uso:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --detail 15 --output import_time.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+# Moduli misurati (punti di ingresso senza interfaccia grafica)
+IMPORT_TARGETS = (
+    'utils.image_processor',
+    'utils.batch_processor',
+    'utils.pipeline',
+    'logo_applier',
+    'logo_server',
+)
+
+# Moduli che il percorso di elaborazione non deve importare
+GUI_MODULES = ('tkinter', 'PIL.ImageTk', 'gui')
+
+# Cartella del progetto (i moduli vengono importati da qui)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(code, *options):
+    """Esegue codice in un interprete nuovo e ne restituisce l'output"""
+    return subprocess.run(
+        [sys.executable, *options, '-c', code],
+        cwd=PROJECT_DIR, check=True, capture_output=True, text=True
+    )
+
+
+def cold_start(code, repeat):
+    """Mediana dei secondi di esecuzione di codice in un interprete nuovo"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _run(code)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def loaded_gui_modules(module):
+    """Moduli GUI presenti in sys.modules dopo aver importato il modulo"""
+    code = (
+        f"import sys, {module}\n"
+        f"print('\\n'.join(name for name in {GUI_MODULES!r} if name in sys.modules))"
+    )
+    return _run(code).stdout.split()
+
+
+def slowest_imports(module, count):
+    """
+    Moduli con il tempo di import proprio più alto (python -X importtime)
+
+    Returns:
+        Lista di (microsecondi, nome modulo)
+    """
+    stderr = _run(f"import {module}", '-X', 'importtime').stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        entries.append((int(self_us), name.strip()))
+    return sorted(entries, reverse=True)[:count]
+
+
+def bench_import_time(repeat):
+    """
+    Misura il tempo di import a freddo di ogni modulo
+
+    Returns:
+        Dizionario {'import/<modulo>': voce di risultato} con i secondi oltre
+        l'avvio dell'interprete (compatibile con run_benchmarks)
+    """
+    interpreter = cold_start("pass", repeat)
+    results = {}
+    for module in IMPORT_TARGETS:
+        seconds = max(cold_start(f"import {module}", repeat) - interpreter, 1e-6)
+        results[f"import/{module}"] = {
+            'seconds': round(seconds, 6),
+            'ops_per_sec': round(1 / seconds, 3)
+        }
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="benchmarks.import_time",
+        description="Tempo di avvio dei moduli di elaborazione"
+    )
+    parser.add_argument("--repeat", type=int, default=7,
+                        help="Interpreti avviati per ogni misura (si usa la mediana)")
+    parser.add_argument("--detail", type=int, default=0, metavar="N",
+                        help="Elenca gli N import più lenti di ogni modulo")
+    parser.add_argument("--output", default=None,
+                        help="Salva i risultati in JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    results = bench_import_time(args.repeat)
+    for name, entry in results.items():
+        print(f"{name:<40} {entry['seconds'] * 1000:>8.1f} ms")
+
+    failed = False
+    for module in IMPORT_TARGETS:
+        gui = loaded_gui_modules(module)
+        if gui:
+            failed = True
+            print(f"ERRORE: {module} importa {', '.join(gui)}", file=sys.stderr)
+        if args.detail:
+            print(f"\nImport più lenti di {module}:")
+            for self_us, name in slowest_imports(module, args.detail):
+                print(f"  {self_us / 1000:>8.1f} ms  {name}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'results': results}, f, indent=2)
+        print(f"Risultati salvati in {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
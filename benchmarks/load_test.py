@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test di carico del servizio HTTP locale (logo_server)
+
+Invia richieste concorrenti con connessioni persistenti e riporta
+throughput, percentili di latenza e risposte 503 (servizio saturo).
+Accetta solo indirizzi locali.
+
+Uso:
+    python -m benchmarks.load_test --spawn --requests 200 --concurrency 16
+    python -m benchmarks.load_test --url http://127.0.0.1:8765/watermark?size=10
+"""
+
+import argparse
+import http.client
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from utils.batch_processor import DEFAULT_BATCH_SETTINGS
+from utils.watermark_server import WatermarkServer, WatermarkService
+from benchmarks.corpus import _synthetic_photo, generate_logos
+
+# Percentili di latenza riportati
+LATENCY_PERCENTILES = (50, 90, 99)
+
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="benchmarks.load_test",
+        description="Test di carico del servizio HTTP locale"
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8765/watermark",
+                        help="Indirizzo del servizio (solo locale), con eventuali parametri")
+    parser.add_argument("--spawn", action="store_true",
+                        help="Avvia un servizio temporaneo in questo processo (porta libera)")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="Numero totale di richieste")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Client concorrenti")
+    parser.add_argument("--image-size", default="3000x2000", metavar="LxA",
+                        help="Risoluzione dell'immagine sintetica inviata")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker del servizio avviato con --spawn")
+    parser.add_argument("--queue-size", type=int, default=16,
+                        help="Coda del servizio avviato con --spawn")
+    return parser
+
+
+def synthetic_jpeg(size):
+    """Codifica un'immagine sintetica in JPEG e ne restituisce i byte"""
+    width, height = (int(value) for value in size.lower().split("x"))
+    buffer = io.BytesIO()
+    _synthetic_photo(width, height, 0).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def percentile(sorted_values, percent):
+    """Percentile con metodo nearest-rank su valori già ordinati"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(percent / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_load(url, body, total, concurrency):
+    """
+    Invia le richieste dai client concorrenti
+
+    Returns:
+        Tupla (secondi totali, latenze delle risposte 200, {stato: conteggio})
+    """
+    parts = urlsplit(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    remaining = [total]
+
+    def client():
+        conn = None
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    break
+                remaining[0] -= 1
+            if conn is None:
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=120)
+            start = time.perf_counter()
+            try:
+                conn.request("POST", target, body=body,
+                             headers={"Content-Type": "application/octet-stream"})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                status = "errore di connessione"
+                conn.close()
+                conn = None
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+        if conn is not None:
+            conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sorted(latencies), statuses
+
+
+def spawn_server(args, workdir):
+    """Avvia un servizio temporaneo con un logo sintetico su una porta libera"""
+    logos = generate_logos(os.path.join(workdir, "logos"))
+    settings = dict(DEFAULT_BATCH_SETTINGS, logo_file=logos["rgba"],
+                    output_profile="jpeg", max_output_kb=0)
+    service = WatermarkService(settings, workers=args.workers, queue_size=args.queue_size)
+    service.preload()
+    server = WatermarkServer(service, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="logo_load_") as workdir:
+        server = None
+        url = args.url
+        if args.spawn:
+            server = spawn_server(args, workdir)
+            query = urlsplit(args.url).query
+            url = f"{server.url}/watermark" + (f"?{query}" if query else "")
+        if urlsplit(url).hostname not in LOCAL_HOSTS:
+            print("Errore: il test di carico accetta solo indirizzi locali", file=sys.stderr)
+            return 2
+
+        body = synthetic_jpeg(args.image_size)
+        print(f"{args.requests} richieste, {args.concurrency} client, "
+              f"immagine {args.image_size} ({len(body) / 1e6:.1f} MB) -> {url}")
+        try:
+            seconds, latencies, statuses = run_load(url, body, args.requests, args.concurrency)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+    ok = statuses.get(200, 0)
+    print(f"Tempo totale: {seconds:.2f} s, completate: {ok} ({ok / seconds:.1f} img/s)")
+    if latencies:
+        values = ", ".join(f"p{p} {percentile(latencies, p) * 1000:.0f} ms"
+                           for p in LATENCY_PERCENTILES)
+        print(f"Latenza: {values}, massima {latencies[-1] * 1000:.0f} ms")
+    for status, count in sorted(statuses.items(), key=lambda item: str(item[0])):
+        print(f"  {status}: {count}")
+    if server is not None:
+        stats = server.service.stats()
+        print(f"Cache logo: {stats['cache_hits']} riusi, {stats['cache_misses']} ridimensionamenti")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
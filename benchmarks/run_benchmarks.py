@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark di ImageProcessor e dell'elaborazione batch
+
+Genera un corpus sintetico, misura le operazioni principali e il throughput
+end-to-end, salva i risultati in JSON e li confronta con una baseline.
+
+Uso:
+    python -m benchmarks.run_benchmarks --quick --output bench.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import PIL
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from config import SUPPORTED_IMAGE_FORMATS
+from utils.image_processor import ImageProcessor
+from utils.logo_cache import LogoCache
+from utils.batch_processor import BatchProcessor
+from utils.pipeline import PipelineProcessor
+from benchmarks.import_time import bench_import_time
+from benchmarks.corpus import (
+    FULL_RESOLUTIONS, QUICK_RESOLUTIONS, generate_corpus, generate_logos
+)
+
+
+# Tolleranza di default prima di considerare un rallentamento una regressione
+DEFAULT_TOLERANCE = 0.15
+
+
+def peak_rss_mb():
+    """
+    Restituisce il picco di memoria residente (MB) del processo e dei figli
+
+    Returns:
+        Dizionario {'self': MB, 'children': MB} o None se non disponibile
+    """
+    if resource is None:
+        return None
+    # ru_maxrss è in KB su Linux e in byte su macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor, 1)
+    }
+
+
+def time_op(func, repeat):
+    """
+    Misura il tempo di un'operazione
+
+    Args:
+        func: Funzione senza argomenti da misurare
+        repeat: Numero di ripetizioni
+
+    Returns:
+        Secondi dell'esecuzione migliore (la meno disturbata dal sistema)
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def result_entry(seconds, ops=1):
+    """Crea la voce di risultato con secondi e operazioni al secondo"""
+    return {
+        'seconds': round(seconds, 6),
+        'ops_per_sec': round(ops / seconds, 3) if seconds > 0 else None
+    }
+
+
+def bench_resize_logo(logos, resolutions, repeat):
+    """Misura resize_logo per ogni logo e risoluzione target"""
+    results = {}
+    for kind, logo in logos.items():
+        for width, height in resolutions:
+            target = SimpleNamespace(width=width, height=height)
+            seconds = time_op(lambda: ImageProcessor.resize_logo(logo, target, 10), repeat)
+            results[f"resize_logo/{kind}/{width}x{height}"] = result_entry(seconds)
+    return results
+
+
+def bench_background(logos, repeat):
+    """Misura create_logo_with_background senza cache (rendering) e con cache"""
+    results = {}
+    for kind, logo in logos.items():
+        for shape in ('Circolare', 'Rettangolare', 'Ovale'):
+            def render():
+                ImageProcessor._background_cache.clear()
+                ImageProcessor.create_logo_with_background(logo, '#FFFFFF', shape, padding=15)
+            results[f"create_logo_with_background/{kind}/{shape}"] = result_entry(
+                time_op(render, repeat)
+            )
+        ImageProcessor.create_logo_with_background(logo, '#FFFFFF', 'Ovale', padding=15)
+        seconds = time_op(
+            lambda: ImageProcessor.create_logo_with_background(logo, '#FFFFFF', 'Ovale', padding=15),
+            repeat
+        )
+        results[f"create_logo_with_background/{kind}/cached"] = result_entry(seconds)
+    return results
+
+
+def bench_apply_logo(image_files, logo, output_folder, repeat):
+    """Misura apply_logo_to_image per ogni file del corpus"""
+    results = {}
+    os.makedirs(output_folder, exist_ok=True)
+    for img_path in image_files:
+        with Image.open(img_path) as img:
+            logo_resized = ImageProcessor.resize_logo(logo, img, 10)
+        output_path = os.path.join(output_folder, 'apply.jpg')
+        seconds = time_op(
+            lambda: ImageProcessor.apply_logo_to_image(img_path, logo_resized, (10, 10), output_path),
+            repeat
+        )
+        results[f"apply_logo_to_image/{os.path.basename(img_path)}"] = result_entry(seconds)
+    return results
+
+
+def bench_blend(logo, resolutions, repeat, batch_size=20):
+    """
+    Confronta i metodi di fusione su un batch di foto della stessa dimensione
+
+    Il logo ridimensionato (e i piani premoltiplicati) vengono dalla
+    LogoCache, come nell'elaborazione batch: si misura solo la fusione.
+    """
+    backends = ['pillow']
+    try:
+        ImageProcessor.set_blend_backend('numpy')
+        backends.append('numpy')
+    except ValueError:
+        pass  # NumPy non installato
+    finally:
+        ImageProcessor.set_blend_backend('pillow')
+    results = {}
+    for width, height in resolutions:
+        frame = Image.effect_noise((width, height), 40).convert('RGB')
+        for backend in backends:
+            ImageProcessor.set_blend_backend(backend)
+            cache = LogoCache()
+
+            def composite_batch():
+                for _ in range(batch_size):
+                    ImageProcessor.composite_logo(frame, logo, 10, 'bottom_right',
+                                                  logo_cache=cache, fingerprint='logo')
+            try:
+                composite_batch()
+                seconds = time_op(composite_batch, repeat)
+            finally:
+                ImageProcessor.set_blend_backend('pillow')
+            results[f"blend/{backend}/{width}x{height}"] = result_entry(seconds, batch_size)
+    return results
+
+
+def bench_batch(source_folder, logo_file, output_folder, workers):
+    """Misura il throughput end-to-end (immagini al secondo) dei motori batch"""
+    image_files = ImageProcessor.get_image_files(source_folder, tuple(SUPPORTED_IMAGE_FORMATS))
+    settings = {
+        'source_folder': source_folder,
+        'logo_file': logo_file,
+        'fixed_position': 'bottom_right',
+        'bg_color': 'Bianco'
+    }
+    engines = {
+        'serial': lambda dest: BatchProcessor(dict(settings, dest_folder=dest), workers=1),
+        f'process_pool_{workers}': lambda dest: BatchProcessor(dict(settings, dest_folder=dest), workers=workers),
+        'pipeline': lambda dest: PipelineProcessor(dict(settings, dest_folder=dest)),
+    }
+    results = {}
+    for name, factory in engines.items():
+        batch = factory(os.path.join(output_folder, name))
+        start = time.perf_counter()
+        processed, errors = batch.run(image_files)
+        seconds = time.perf_counter() - start
+        if errors:
+            raise RuntimeError(f"Errori nel benchmark '{name}': {errors[:3]}")
+        entry = result_entry(seconds, processed)
+        entry['images_per_sec'] = entry.pop('ops_per_sec')
+        results[f"batch/{name}"] = entry
+    return results
+
+
+def throughput(entry):
+    """Restituisce la metrica 'più alto = meglio' di una voce di risultato"""
+    return entry.get('images_per_sec') or entry.get('ops_per_sec')
+
+
+def compare_results(current, baseline, tolerance):
+    """
+    Confronta i risultati con la baseline
+
+    Args:
+        current: Dizionario risultati corrente
+        baseline: Dizionario risultati baseline
+        tolerance: Rallentamento relativo tollerato (es. 0.15 = 15%)
+
+    Returns:
+        Lista di (nome, valore baseline, valore corrente, variazione) regrediti
+    """
+    regressions = []
+    for name, base_entry in baseline['results'].items():
+        entry = current['results'].get(name)
+        if entry is None:
+            continue
+        base_value = throughput(base_entry)
+        value = throughput(entry)
+        if not base_value or not value:
+            continue
+        change = value / base_value - 1
+        if change < -tolerance:
+            regressions.append((name, base_value, value, change))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="benchmarks.run_benchmarks",
+        description="Benchmark di ImageProcessor e dell'elaborazione batch"
+    )
+    parser.add_argument("--quick", action="store_true",
+                        help="Corpus ridotto (risoluzioni piccole) per controlli rapidi")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Ripetizioni per ogni misura (default: 3)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processi worker per il benchmark del process pool")
+    parser.add_argument("--workdir", default=None,
+                        help="Cartella per corpus e output (default: temporanea)")
+    parser.add_argument("--output", default="bench_results.json",
+                        help="File JSON dei risultati")
+    parser.add_argument("--baseline", default=None,
+                        help="File JSON baseline da confrontare")
+    parser.add_argument("--save-baseline", default=None,
+                        help="Salva i risultati anche come nuova baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Rallentamento tollerato rispetto alla baseline (default: 0.15)")
+    return parser
+
+
+def run(args, workdir):
+    """Esegue tutti i benchmark nella cartella di lavoro"""
+    resolutions = QUICK_RESOLUTIONS if args.quick else FULL_RESOLUTIONS
+    source_folder = os.path.join(workdir, 'corpus')
+    output_folder = os.path.join(workdir, 'output')
+
+    print("Generazione corpus sintetico...")
+    image_files = generate_corpus(source_folder, resolutions)
+    logo_files = generate_logos(os.path.join(workdir, 'logos'))
+    logos = {kind: ImageProcessor.load_logo(path) for kind, path in logo_files.items()}
+
+    results = {}
+    print("Benchmark tempo di avvio (import a freddo)...")
+    results.update(bench_import_time(max(args.repeat, 5)))
+    print("Benchmark resize_logo...")
+    results.update(bench_resize_logo(logos, resolutions, args.repeat))
+    print("Benchmark create_logo_with_background...")
+    results.update(bench_background(logos, args.repeat))
+    print("Benchmark fusione del logo (Pillow e NumPy)...")
+    results.update(bench_blend(logos['rgba'], resolutions, args.repeat))
+    print("Benchmark apply_logo_to_image...")
+    results.update(bench_apply_logo(image_files, logos['rgba'], output_folder, args.repeat))
+    print("Benchmark batch end-to-end...")
+    results.update(bench_batch(source_folder, logo_files['rgba'], output_folder, args.workers))
+
+    return {
+        'meta': {
+            'profile': 'quick' if args.quick else 'full',
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'images': len(image_files)
+        },
+        'results': results,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.workdir:
+        report = run(args, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="logo_applier_bench_") as workdir:
+            report = run(args, workdir)
+
+    print()
+    for name, entry in report['results'].items():
+        print(f"{name:<60} {entry['seconds']:>10.4f} s  {throughput(entry):>10.2f} /s")
+    if report['peak_rss_mb']:
+        print(f"Picco RSS: {report['peak_rss_mb']['self']} MB "
+              f"(processi figli: {report['peak_rss_mb']['children']} MB)")
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Risultati salvati in {path}")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['meta'].get('profile') != report['meta']['profile']:
+        print("Attenzione: la baseline usa un profilo diverso, confronto non eseguito",
+              file=sys.stderr)
+        return 2
+
+    regressions = compare_results(report, baseline, args.tolerance)
+    if regressions:
+        print("\n" + "!" * 70, file=sys.stderr)
+        print(f"REGRESSIONE: {len(regressions)} misure più lente della baseline "
+              f"oltre il {args.tolerance:.0%}", file=sys.stderr)
+        for name, base_value, value, change in regressions:
+            print(f"  {name}: {base_value:.2f}/s -> {value:.2f}/s ({change:+.1%})", file=sys.stderr)
+        print("!" * 70, file=sys.stderr)
+        return 1
+
+    print(f"Nessuna regressione rispetto alla baseline (tolleranza {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,7 +16,7 @@ COPYRIGHT = f"Copyright 2025, {AUTHOR}"
 
 # Configurazione GUI
 WINDOW_WIDTH = 750
-WINDOW_HEIGHT = 620
+WINDOW_HEIGHT = 690
 PREVIEW_MAX_WIDTH = 1000
 PREVIEW_MAX_HEIGHT = 900
 
@@ -24,14 +24,69 @@ PREVIEW_MAX_HEIGHT = 900
 LOGO_SIZE_OPTIONS = [5, 10, 15, 20]  # percentuali
 MARGIN_OPTIONS = [1, 2, 5, 10, 15]  # percentuali
 
-# Formati supportati
-SUPPORTED_IMAGE_FORMATS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+# Prefetch anteprime in modalità manuale
+PREFETCH_DEPTH = 3  # immagini preparate in anticipo
+PREFETCH_WORKERS = 2  # thread di decodifica
+PREFETCH_MAX_MEMORY_MB = 64  # memoria massima per le anteprime in anticipo
 
-CLICK_DELAY = 200
+# Pipeline a stadi (lettura -> decodifica -> composizione -> scrittura)
+PIPELINE_THREADS = {
+    'reader': 4,
+    'decoder': 2,
+    'compositor': 2,
+    'writer': 2
+}
+PIPELINE_QUEUE_SIZE = 8  # elementi massimi in coda tra due stadi
+
+# Elaborazione dalla GUI (in un thread separato)
+GUI_WORKERS = None  # processi worker (None = numero di CPU)
+GUI_POLL_MS = 50  # intervallo di lettura degli eventi di avanzamento
+GUI_MAX_ERRORS_SHOWN = 10  # errori elencati nel riepilogo finale
+
+# Sorveglianza cartella (logo_applier --watch)
+WATCH_POLL_INTERVAL = 2.0  # secondi tra due controlli della cartella
+WATCH_SETTLE_SECONDS = 3.0  # secondi senza modifiche prima di elaborare un file
+
+# Coda di lavoro condivisa tra più macchine (cartella su disco di rete)
+WORK_QUEUE_LEASE_SECONDS = 120  # un'immagine non rinnovata da tanto viene riassegnata
+WORK_QUEUE_MAX_ATTEMPTS = 3  # assegnazioni scadute prima di considerarla fallita
+WORK_QUEUE_POLL_INTERVAL = 2.0  # secondi di attesa quando le immagini rimaste sono in corso
+
+# Servizio HTTP locale (python -m logo_server)
+SERVER_HOST = '127.0.0.1'  # solo connessioni dalla stessa macchina
+SERVER_PORT = 8765
+SERVER_WORKERS = None  # immagini elaborate contemporaneamente (None = numero di CPU)
+SERVER_QUEUE_SIZE = 16  # richieste in attesa oltre le quali si risponde 503
+SERVER_MAX_BODY_MB = 64  # dimensione massima dell'immagine ricevuta
+SERVER_RETRY_AFTER = 1  # secondi suggeriti al client quando il servizio è saturo
+
+# Variabile d'ambiente che attiva il profiler delle fasi nella GUI
+# ("1" = solo riepilogo, percorso .json/.csv = riepilogo e traccia)
+PROFILE_ENV_VAR = 'LOGO_APPLIER_PROFILE'
+
+# Immagini molto grandi: Pillow avvisa oltre questo numero di pixel e
+# rifiuta le immagini oltre il doppio (protezione "decompression bomb").
+# Vale solo per CLI e GUI: il servizio HTTP mantiene il limite di Pillow
+MAX_IMAGE_PIXELS = 300_000_000
+
+# Immagini PNG/BMP salvate in PNG oltre questo numero di pixel vengono
+# lette e scritte a fasce di righe, senza decodificarle intere
+STRIP_MIN_PIXELS = 50_000_000
+STRIP_MAX_BYTES = 32 * 1024 * 1024  # pixel decodificati di una fascia
+
+# Memoria massima (MB) per le immagini decodificate contemporaneamente
+# da tutti i worker di un batch
+MEMORY_BUDGET_MB = 2048
 
-OUTPUT_QUALITY = 100
+# Fusione del logo sull'immagine: 'pillow' (Image.paste) o 'numpy' (piani
+# premoltiplicati calcolati una volta per dimensione, richiede NumPy)
+BLEND_BACKEND = 'pillow'
 
-OUTPUT_FORMAT = "JPEG"
+# Numero massimo di loghi ridimensionati tenuti in cache
+LOGO_CACHE_SIZE = 32
+
+# Formati supportati
+SUPPORTED_IMAGE_FORMATS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
 
 BACKGROUND_COLORS = {
     'Nessuno': None,
@@ -50,20 +105,81 @@ BACKGROUND_COLORS = {
 
 BACKGROUND_SHAPES = ['Circolare', 'Rettangolare', 'Ovale']
 
+# Sfondo logo: sovracampionamento per l'anti-aliasing e loghi tenuti in cache
+BACKGROUND_SUPERSAMPLE = 4
+BACKGROUND_CACHE_SIZE = 16
+
 # Posizioni fisse
 FIXED_POSITIONS = {
     'top_left': 'In alto a sinistra',
     'top_right': 'In alto a destra',
     'bottom_left': 'In basso a sinistra',
-    'bottom_right': 'In basso a destra'
+    'bottom_right': 'In basso a destra',
+    'auto': 'Automatica (angolo più uniforme)',
+    'auto_edges': 'Automatica (angoli e centri dei lati)'
+}
+
+# Posizione automatica: lato lungo dell'immagine ridotta usata per l'analisi
+# e contrasto minimo di luminosità (0-255) tra il logo e la zona scelta
+AUTO_POSITION_ANALYSIS_SIZE = 256
+AUTO_POSITION_MIN_CONTRAST = 40
+
+# Profili di codifica dell'output: formato Pillow, estensione e opzioni di salvataggio
+OUTPUT_PROFILES = {
+    # Massima qualità (comportamento storico, file grandi e lenti da scrivere)
+    'jpeg-max': {'format': 'JPEG', 'extension': '.jpg',
+                 'options': {'quality': 100}},
+    'jpeg': {'format': 'JPEG', 'extension': '.jpg',
+             'options': {'quality': 90, 'subsampling': '4:2:0', 'optimize': True}},
+    'jpeg-fast': {'format': 'JPEG', 'extension': '.jpg',
+                  'options': {'quality': 90, 'subsampling': '4:2:0'}},
+    # Per il web/CDN: progressivo e più compresso
+    'jpeg-web': {'format': 'JPEG', 'extension': '.jpg',
+                 'options': {'quality': 82, 'subsampling': '4:2:0',
+                             'progressive': True, 'optimize': True}},
+    'webp': {'format': 'WEBP', 'extension': '.webp',
+             'options': {'quality': 85, 'method': 4}},
+    'webp-fast': {'format': 'WEBP', 'extension': '.webp',
+                  'options': {'quality': 85, 'method': 0}},
+    'png': {'format': 'PNG', 'extension': '.png',
+            'options': {'compress_level': 6}},
+    'png-fast': {'format': 'PNG', 'extension': '.png',
+                 'options': {'compress_level': 1}},
+    # GIF (animazioni): tavolozza fissa, ricalcolata solo ai cambi di scena
+    'gif': {'format': 'GIF', 'extension': '.gif',
+            'options': {}},
 }
+OUTPUT_PROFILE = 'jpeg-max'
+
+# Immagini animate (GIF, PNG e WebP): formati di output che mantengono
+# l'animazione e profilo usato quando quello scelto non la supporta (es. JPEG)
+ANIMATED_FORMATS = ('GIF', 'WEBP')
+ANIMATED_OUTPUT_PROFILE = 'gif'
+# GIF animate: lato del campione usato per verificare che la tavolozza fissa
+# copra i colori di un fotogramma ed errore medio (0-255) oltre il quale la
+# tavolozza viene ricalcolata per quel fotogramma
+ANIMATED_PALETTE_SAMPLE = 64
+ANIMATED_PALETTE_MAX_ERROR = 8
 
-# Qualità output
-OUTPUT_QUALITY = 100
-OUTPUT_FORMAT = 'JPEG'
+# Modalità dimensione massima: intervallo di qualità esplorato (JPEG e WebP)
+TARGET_QUALITY_RANGE = (30, 95)
 
-# File di configurazione utente
+# File di configurazione utente (nella cartella dell'applicazione, con i preset)
 SETTINGS_FILE = 'settings.json'
+# Variabile d'ambiente con un percorso alternativo del file impostazioni
+SETTINGS_ENV_VAR = 'LOGO_APPLIER_SETTINGS'
+
+# Manifest delle elaborazioni (salvato nella cartella destinazione)
+MANIFEST_FILE = '.logo_applier_manifest.jsonl'
+
+# Indice dei duplicati: hash sorgente -> output già prodotti (default nella
+# cartella destinazione, condivisibile tra più batch con --dedup-index)
+DEDUP_INDEX_FILE = '.logo_applier_dedup.jsonl'
+DEDUP_HARDLINK = True  # riusa gli output con hardlink (False = copia)
 
 # Delay dopo click (millisecondi)
-CLICK_DELAY = 200
\ No newline at end of file
+CLICK_DELAY = 200
+
+# Intervallo minimo tra due ridisegni del logo che segue il mouse
+# (millisecondi, ~60 fotogrammi al secondo)
+HOVER_FRAME_MS = 16
\ No newline at end of file
@@ -1,8 +1,22 @@
 """
 Modulo GUI dell'applicazione
+
+Le finestre (e quindi tkinter) vengono importate al primo accesso.
 """
 
-from .main_window import LogoApplierApp
-from .preview_window import PreviewWindow
+import importlib
+
+# Classe esportata -> modulo che la definisce
+_EXPORTS = {
+    'LogoApplierApp': 'main_window',
+    'PreviewWindow': 'preview_window',
+}
+
+__all__ = ['LogoApplierApp', 'PreviewWindow']
+
 
-__all__ = ['LogoApplierApp', 'PreviewWindow']
\ No newline at end of file
+def __getattr__(name):
+    if name in _EXPORTS:
+        module = importlib.import_module(f".{_EXPORTS[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
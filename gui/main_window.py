@@ -5,13 +5,17 @@ Finestra principale dell'applicazione
 """
 
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
 from PIL import Image, ImageTk
 import os
 
 from config import *
 from utils.settings_manager import SettingsManager
 from utils.image_processor import ImageProcessor
+from utils.batch_processor import BatchProcessor
+from utils.background_batch import BackgroundBatch
+from utils.preview_prefetcher import PreviewPrefetcher
+from utils.stage_profiler import StageProfiler
 from gui.preview_window import PreviewWindow
 
 
@@ -37,15 +41,29 @@ class LogoApplierApp:
         self.bg_color = tk.StringVar(value='Nessuno')
         self.bg_shape = tk.StringVar(value='Rettangolare')
         
+        # Variabili per codifica output
+        self.output_profile = tk.StringVar(value=OUTPUT_PROFILE)
+        self.max_output_kb = tk.IntVar(value=0)
+        
+        # Varianti di output (solo da settings.json, conservate al salvataggio)
+        self.variants = []
+        
         # Variabili per modalità manuale
         self.current_image_index = 0
         self.image_files = []
         self.manual_positions = {}
         self.preview_window_obj = None
+        self.prefetcher = None
         
         # Processore immagini
         self.processor = ImageProcessor()
         
+        # Elaborazione in background (BackgroundBatch)
+        self.background = None
+        self._batch_total = 0
+        self._batch_done = 0
+        self._batch_skipped = []
+        
         # Carica impostazioni salvate
         self.load_settings()
         
@@ -69,13 +87,32 @@ class LogoApplierApp:
         # Progress bar
         self._build_progress_frame()
         
-        # Pulsante avvia
+        # Pulsanti avvia, pausa e annulla
+        button_frame = ttk.Frame(self.root)
+        button_frame.pack(pady=10)
+        
         self.start_button = ttk.Button(
-            self.root, 
+            button_frame, 
             text="Avvia Elaborazione", 
             command=self.start_processing
         )
-        self.start_button.pack(pady=10)
+        self.start_button.pack(side="left", padx=5)
+        
+        self.pause_button = ttk.Button(
+            button_frame,
+            text="Pausa",
+            command=self.toggle_pause,
+            state="disabled"
+        )
+        self.pause_button.pack(side="left", padx=5)
+        
+        self.cancel_button = ttk.Button(
+            button_frame,
+            text="Annulla",
+            command=self.cancel_processing,
+            state="disabled"
+        )
+        self.cancel_button.pack(side="left", padx=5)
         
         # Menu bar
         self._build_menu_bar()
@@ -131,6 +168,27 @@ class LogoApplierApp:
                 variable=self.margin_percent, 
                 value=margin
             ).pack(side="left", padx=5)
+        
+        # Codifica output
+        output_frame = ttk.Frame(frame)
+        output_frame.pack(fill="x", pady=5)
+        ttk.Label(output_frame, text="Formato output:").pack(side="left", padx=5)
+        ttk.Combobox(
+            output_frame,
+            textvariable=self.output_profile,
+            values=list(OUTPUT_PROFILES.keys()),
+            state="readonly",
+            width=12
+        ).pack(side="left", padx=5)
+        ttk.Label(output_frame, text="Dimensione max (KB, 0 = nessun limite):").pack(side="left", padx=(20, 5))
+        ttk.Spinbox(
+            output_frame,
+            textvariable=self.max_output_kb,
+            from_=0,
+            to=100000,
+            increment=50,
+            width=8
+        ).pack(side="left", padx=5)
     
     def _build_background_frame(self):
         """Costruisce frame impostazioni sfondo logo"""
@@ -218,6 +276,23 @@ class LogoApplierApp:
             value="bottom_right"
         )
         self.rb_bottom_right.grid(row=1, column=1, sticky="w", padx=10)
+        
+        # Angolo scelto per ogni immagine in base ai dettagli della foto
+        self.rb_auto = ttk.Radiobutton(
+            self.fixed_pos_frame, 
+            text="Automatica (angolo più uniforme)", 
+            variable=self.fixed_position, 
+            value="auto"
+        )
+        self.rb_auto.grid(row=2, column=0, sticky="w")
+        
+        self.rb_auto_edges = ttk.Radiobutton(
+            self.fixed_pos_frame, 
+            text="Automatica (anche centri dei lati)", 
+            variable=self.fixed_position, 
+            value="auto_edges"
+        )
+        self.rb_auto_edges.grid(row=2, column=1, sticky="w", padx=10)
     
     def _build_progress_frame(self):
         """Costruisce frame barra di progresso"""
@@ -234,8 +309,46 @@ class LogoApplierApp:
         """Costruisce barra menu"""
         menubar = tk.Menu(self.root)
         self.root.config(menu=menubar)
+        # Elenco dei preset ricostruito a ogni apertura (il file può cambiare)
+        self.preset_menu = tk.Menu(menubar, tearoff=0, postcommand=self._refresh_preset_menu)
+        menubar.add_cascade(label="Preset", menu=self.preset_menu)
         menubar.add_command(label="Informazioni", command=self.show_about)
     
+    def _refresh_preset_menu(self):
+        """Elenca i preset salvati nel menu"""
+        self.preset_menu.delete(0, "end")
+        self.preset_menu.add_command(label="Salva come preset...", command=self.save_preset)
+        names = SettingsManager.list_presets()
+        if names:
+            self.preset_menu.add_separator()
+        for name in names:
+            self.preset_menu.add_command(
+                label=name,
+                command=lambda name=name: self.load_preset(name)
+            )
+    
+    def save_preset(self):
+        """Salva le impostazioni correnti come preset con nome"""
+        name = simpledialog.askstring(
+            "Salva preset",
+            "Nome del preset (es. cliente o marchio):",
+            parent=self.root
+        )
+        if not name or not name.strip():
+            return
+        if not SettingsManager.save_preset(name.strip(), self.get_current_settings()):
+            messagebox.showerror("Errore", "Impossibile salvare il preset")
+    
+    def load_preset(self, name):
+        """Applica le impostazioni di un preset"""
+        try:
+            settings = SettingsManager.load_preset(name)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Errore", f"Impossibile caricare il preset:\n{str(e)}")
+            return
+        self.apply_settings(settings)
+        self.update_mode()
+    
     def show_about(self):
         """Mostra finestra informazioni"""
         about_text = f"""{APP_NAME}
@@ -279,7 +392,9 @@ un logo su immagini con supporto per sfondi personalizzati."""
         self.rb_top_left.config(state=state)
         self.rb_top_right.config(state=state)
         self.rb_bottom_left.config(state=state)
-        self.rb_bottom_right.config(state=state)# Continua classe LogoApplierApp...
+        self.rb_bottom_right.config(state=state)
+        self.rb_auto.config(state=state)
+        self.rb_auto_edges.config(state=state)# Continua classe LogoApplierApp...
     
     def validate_inputs(self):
         """Valida gli input dell'utente"""
@@ -326,6 +441,19 @@ un logo su immagini con supporto per sfondi personalizzati."""
         self.progress['maximum'] = len(self.image_files)
         
         if self.position_mode.get() == "manual":
+            try:
+                logo = self._load_logo_with_background()
+            except Exception as e:
+                messagebox.showerror("Errore", f"Impossibile caricare il logo:\n{str(e)}")
+                return
+            
+            # Prepara in background le anteprime delle prossime immagini
+            self._stop_prefetch()
+            self.prefetcher = PreviewPrefetcher(
+                self.image_files,
+                logo,
+                self.logo_size_percent.get()
+            )
             self.show_next_image_for_positioning()
         else:
             self.process_all_images()
@@ -347,23 +475,23 @@ un logo su immagini con supporto per sfondi personalizzati."""
         self.root.update()
         
         try:
-            img = Image.open(img_path)
+            # Anteprima e logo preparati in background dal prefetcher
+            img, original_size, preview_logo = self.prefetcher.get(self.current_image_index)
             filename = os.path.basename(img_path)
             
-            # Carica logo con sfondo
-            logo = self._load_logo_with_background()
-            
             # Crea finestra preview
             self.preview_window_obj = PreviewWindow(
                 self.root,
                 img,
-                logo,
+                self.prefetcher.logo,
                 filename,
                 self.current_image_index,
                 len(self.image_files),
                 self.logo_size_percent.get(),
                 self.on_position_selected,
-                self.on_preview_closed
+                self.on_preview_closed,
+                original_size=original_size,
+                preview_logo=preview_logo
             )
             
         except Exception as e:
@@ -371,24 +499,38 @@ un logo su immagini con supporto per sfondi personalizzati."""
             self.current_image_index += 1
             self.show_next_image_for_positioning()
     
+    def _stop_prefetch(self):
+        """Ferma la preparazione anticipata delle anteprime"""
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+            self.prefetcher = None
+    
     def _load_logo_with_background(self):
         """Carica il logo e applica sfondo se necessario"""
-        logo = Image.open(self.logo_file.get())
-        if logo.mode != 'RGBA':
-            logo = logo.convert('RGBA')
-        
-        # Applica sfondo se selezionato
-        bg_color_value = BACKGROUND_COLORS.get(self.bg_color.get())
-        if bg_color_value:
-            logo = self.processor.create_logo_with_background(
-                logo,
-                bg_color_value,
-                self.bg_shape.get(),
-                padding=15
-            )
-        
-        return logo
+        return self.processor.load_logo(
+            self.logo_file.get(),
+            self.bg_color.get(),
+            self.bg_shape.get(),
+            padding=15
+        )
 
+    def _start_profiler(self):
+        """Attiva il profiler delle fasi se richiesto dalla variabile d'ambiente"""
+        if os.environ.get(PROFILE_ENV_VAR):
+            ImageProcessor.profiler = StageProfiler()
+    
+    def _report_profiler(self):
+        """Stampa il riepilogo del profiler (e salva la traccia) e lo disattiva"""
+        profiler, ImageProcessor.profiler = ImageProcessor.profiler, None
+        if profiler is None:
+            return
+        print(profiler.summary())
+        trace_path = os.environ.get(PROFILE_ENV_VAR, "")
+        if trace_path.lower().endswith((".json", ".csv")):
+            try:
+                profiler.write_trace(trace_path)
+            except Exception as e:
+                print(f"Errore nel salvataggio della traccia: {e}")
     
     def on_position_selected(self, position):
         """Callback quando posizione è selezionata"""
@@ -408,85 +550,31 @@ un logo su immagini con supporto per sfondi personalizzati."""
     
     def process_positioned_images(self):
         """Elabora solo le immagini posizionate manualmente"""
+        self._stop_prefetch()
+        
         if not self.manual_positions:
             messagebox.showinfo("Nessuna immagine", "Nessuna immagine è stata posizionata.")
             self.progress_label.config(text="")
             return
         
-        try:
-            logo = self._load_logo_with_background()
-        except Exception as e:
-            messagebox.showerror("Errore", f"Impossibile caricare il logo:\n{str(e)}")
-            return
-        
-        self.progress['value'] = 0
-        self.progress['maximum'] = len(self.manual_positions)
-        processed = 0
-        
-        for idx, (img_path, position) in enumerate(self.manual_positions.items()):
-            try:
-                img = Image.open(img_path)
-                if img.mode != 'RGBA':
-                    img = img.convert('RGBA')
-                
-                # Ridimensiona logo
-                logo_resized = self.processor.resize_logo(
-                    logo, 
-                    img, 
-                    self.logo_size_percent.get()
-                )
-                
-                # Calcola posizione
-                rel_x, rel_y = position
-                x = int(rel_x * img.width) - logo_resized.width // 2
-                y = int(rel_y * img.height) - logo_resized.height // 2
-                
-                # Applica logo
-                img.paste(logo_resized, (x, y), logo_resized)
-                
-                # Salva
-                img_rgb = img.convert('RGB')
-                output_name = os.path.splitext(os.path.basename(img_path))[0] + ".jpg"
-                output_path = os.path.join(self.dest_folder.get(), output_name)
-                img_rgb.save(output_path, OUTPUT_FORMAT, quality=OUTPUT_QUALITY)
-                
-                processed += 1
-                
-            except Exception as e:
-                messagebox.showerror("Errore", f"Errore elaborazione {os.path.basename(img_path)}:\n{str(e)}")
-                continue
-            
-            # Aggiorna progress bar
-            self.progress['value'] = idx + 1
-            percentage = int((idx + 1) / len(self.manual_positions) * 100)
-            self.progress_label.config(
-                text=f"Elaborazione: {percentage}% ({idx + 1}/{len(self.manual_positions)})"
-            )
-            self.root.update()
-        
-        self.save_settings()
-        
-        total_images = len(self.image_files)
-        msg = f"Elaborazione completata!\n\nImmagini elaborate: {processed}\nImmagini totali: {total_images}"
-        messagebox.showinfo("Completato", msg)
-        self.progress_label.config(text="")
+        self._start_batch(list(self.manual_positions), self.manual_positions)
     
     def process_all_images(self):
         """Elabora tutte le immagini (modalità automatica o dopo posizionamento manuale)"""
-        try:
-            logo = self._load_logo_with_background()
-        except Exception as e:
-            messagebox.showerror("Errore", f"Impossibile caricare il logo:\n{str(e)}")
-            return
+        self._stop_prefetch()
         
-        self.progress['value'] = 0
-        self.progress['maximum'] = len(self.image_files)
-        processed = 0
+        image_files = self.image_files
+        positions = None
         skipped = []
         
-        for idx, img_path in enumerate(self.image_files):
-            # Controlla se immagine posizionata in modalità manuale
-            if self.position_mode.get() == "manual" and img_path not in self.manual_positions:
+        if self.position_mode.get() == "manual":
+            # Le domande sulle immagini non posizionate precedono l'elaborazione
+            image_files = []
+            positions = self.manual_positions
+            for img_path in self.image_files:
+                if img_path in self.manual_positions:
+                    image_files.append(img_path)
+                    continue
                 response = messagebox.askyesnocancel(
                     "Immagine non posizionata",
                     f"Non hai selezionato una posizione per:\n{os.path.basename(img_path)}\n\n"
@@ -500,69 +588,122 @@ un logo su immagini con supporto per sfondi personalizzati."""
                     break
                 else:
                     skipped.append(os.path.basename(img_path))
-                    continue
-            
-            try:
-                img = Image.open(img_path)
-                if img.mode != 'RGBA':
-                    img = img.convert('RGBA')
-                
-                # Ridimensiona logo
-                logo_resized = self.processor.resize_logo(
-                    logo, 
-                    img, 
-                    self.logo_size_percent.get()
+        
+        self._start_batch(image_files, positions, skipped)
+    
+    def _start_batch(self, image_files, positions=None, skipped=None):
+        """
+        Avvia l'elaborazione in un thread separato
+        
+        La finestra resta reattiva: l'avanzamento arriva come eventi in coda,
+        letti ogni GUI_POLL_MS da _poll_batch.
+        
+        Args:
+            image_files: Lista di percorsi immagine da elaborare
+            positions: Dizionario {img_path: (rel_x, rel_y)} (solo modalità manuale)
+            skipped: Nomi delle immagini non posizionate saltate (opzionale)
+        """
+        if self.background is not None and self.background.is_alive():
+            return
+        
+        try:
+            batch = BatchProcessor(self.get_current_settings(), workers=GUI_WORKERS)
+        except ValueError as e:
+            messagebox.showerror("Errore", f"Varianti non valide:\n{str(e)}")
+            return
+        self.background = BackgroundBatch(batch, image_files, positions)
+        self._batch_total = len(image_files)
+        self._batch_done = 0
+        self._batch_skipped = skipped or []
+        
+        self.progress['value'] = 0
+        self.progress['maximum'] = max(1, self._batch_total)
+        self.progress_label.config(text="Elaborazione in corso...")
+        self.start_button.config(state="disabled")
+        self.pause_button.config(state="normal", text="Pausa")
+        self.cancel_button.config(state="normal")
+        
+        self._start_profiler()
+        self.background.start()
+        self.root.after(GUI_POLL_MS, self._poll_batch)
+    
+    def _poll_batch(self):
+        """Legge gli eventi del thread di elaborazione e aggiorna l'interfaccia"""
+        for event in self.background.poll():
+            if event[0] == 'progress':
+                self._batch_done += 1
+                self.progress['value'] = self._batch_done
+                percentage = int(self._batch_done / max(1, self._batch_total) * 100)
+                status = " (in pausa)" if self.background.paused else ""
+                self.progress_label.config(
+                    text=f"Elaborazione: {percentage}% ({self._batch_done}/{self._batch_total}){status}"
                 )
-                
-                # Determina posizione
-                if self.position_mode.get() == "manual":
-                    rel_x, rel_y = self.manual_positions[img_path]
-                    x = int(rel_x * img.width) - logo_resized.width // 2
-                    y = int(rel_y * img.height) - logo_resized.height // 2
-                else:
-                    x, y = self.processor.calculate_fixed_position(
-                        img.width, 
-                        img.height, 
-                        logo_resized.width, 
-                        logo_resized.height,
-                        self.fixed_position.get(), 
-                        self.margin_percent.get()
-                    )
-                
-                # Applica logo
-                img.paste(logo_resized, (x, y), logo_resized)
-                
-                # Salva
-                img_rgb = img.convert('RGB')
-                output_name = os.path.splitext(os.path.basename(img_path))[0] + ".jpg"
-                output_path = os.path.join(self.dest_folder.get(), output_name)
-                img_rgb.save(output_path, OUTPUT_FORMAT, quality=OUTPUT_QUALITY)
-                
-                processed += 1
-                
-            except Exception as e:
-                messagebox.showerror("Errore", f"Errore elaborazione {os.path.basename(img_path)}:\n{str(e)}")
-                continue
-            
-            # Aggiorna progress bar
-            self.progress['value'] = idx + 1
-            percentage = int((idx + 1) / len(self.image_files) * 100)
-            self.progress_label.config(
-                text=f"Elaborazione: {percentage}% ({idx + 1}/{len(self.image_files)})"
-            )
-            self.root.update()
+            elif event[0] == 'done':
+                self._finish_batch(*event[1:])
+                return
+            elif event[0] == 'failed':
+                self._finish_batch(0, [], False, failure=event[1])
+                return
+        self.root.after(GUI_POLL_MS, self._poll_batch)
+    
+    def _finish_batch(self, processed, errors, cancelled, failure=None):
+        """Ripristina l'interfaccia e mostra il riepilogo dell'elaborazione"""
+        self._report_profiler()
+        self.start_button.config(state="normal")
+        self.pause_button.config(state="disabled", text="Pausa")
+        self.cancel_button.config(state="disabled")
+        self.progress_label.config(text="")
+        
+        if failure is not None:
+            messagebox.showerror("Errore", f"Elaborazione non avviata:\n{failure}")
+            return
         
         self.save_settings()
         
-        msg = f"Elaborazione completata!\n\nImmagini elaborate: {processed}"
-        if skipped:
-            msg += f"\nImmagini saltate: {len(skipped)}"
-        messagebox.showinfo("Completato", msg)
-        self.progress_label.config(text="")
+        title = "Annullato" if cancelled else "Completato"
+        msg = "Elaborazione annullata!" if cancelled else "Elaborazione completata!"
+        msg += f"\n\nImmagini elaborate: {processed}"
+        if self.position_mode.get() == "manual":
+            msg += f"\nImmagini totali: {len(self.image_files)}"
+        if self._batch_skipped:
+            msg += f"\nImmagini saltate: {len(self._batch_skipped)}"
+        if errors:
+            msg += f"\nImmagini con errori: {len(errors)}\n"
+            for img_path, error in errors[:GUI_MAX_ERRORS_SHOWN]:
+                msg += f"\n{os.path.basename(img_path)}: {error}"
+            if len(errors) > GUI_MAX_ERRORS_SHOWN:
+                msg += f"\n... e altre {len(errors) - GUI_MAX_ERRORS_SHOWN}"
+        messagebox.showinfo(title, msg)
+    
+    def toggle_pause(self):
+        """Sospende o riprende l'elaborazione in corso"""
+        if self.background is None or not self.background.is_alive():
+            return
+        if self.background.paused:
+            self.background.resume()
+            self.pause_button.config(text="Pausa")
+            self.progress_label.config(text="Elaborazione in corso...")
+        else:
+            self.background.pause()
+            self.pause_button.config(text="Riprendi")
+            self.progress_label.config(text="In pausa (le immagini in corso vengono completate)")
+    
+    def cancel_processing(self):
+        """Annulla l'elaborazione in corso (le immagini già avviate vengono completate)"""
+        if self.background is None or not self.background.is_alive():
+            return
+        self.background.cancel()
+        self.pause_button.config(state="disabled")
+        self.cancel_button.config(state="disabled")
+        self.progress_label.config(text="Annullamento in corso...")
     
     def save_settings(self):
         """Salva le impostazioni correnti"""
-        settings = {
+        SettingsManager.save_settings(self.get_current_settings())
+    
+    def get_current_settings(self):
+        """Restituisce le impostazioni correnti come dizionario"""
+        return {
             "source_folder": self.source_folder.get(),
             "logo_file": self.logo_file.get(),
             "dest_folder": self.dest_folder.get(),
@@ -571,13 +712,18 @@ un logo su immagini con supporto per sfondi personalizzati."""
             "logo_size_percent": self.logo_size_percent.get(),
             "margin_percent": self.margin_percent.get(),
             "bg_color": self.bg_color.get(),
-            "bg_shape": self.bg_shape.get()
+            "bg_shape": self.bg_shape.get(),
+            "output_profile": self.output_profile.get(),
+            "max_output_kb": self.max_output_kb.get(),
+            "variants": self.variants
         }
-        SettingsManager.save_settings(settings)
     
     def load_settings(self):
         """Carica le impostazioni salvate"""
-        settings = SettingsManager.load_settings()
+        self.apply_settings(SettingsManager.load_settings())
+    
+    def apply_settings(self, settings):
+        """Mostra nei controlli le impostazioni indicate"""
         self.source_folder.set(settings.get("source_folder", ""))
         self.logo_file.set(settings.get("logo_file", ""))
         self.dest_folder.set(settings.get("dest_folder", ""))
@@ -586,4 +732,8 @@ un logo su immagini con supporto per sfondi personalizzati."""
         self.logo_size_percent.set(settings.get("logo_size_percent", 10))
         self.margin_percent.set(settings.get("margin_percent", 2))
         self.bg_color.set(settings.get("bg_color", "Nessuno"))
-        self.bg_shape.set(settings.get("bg_shape", "Rettangolare"))
\ No newline at end of file
+        self.bg_shape.set(settings.get("bg_shape", "Rettangolare"))
+        if settings.get("output_profile") in OUTPUT_PROFILES:
+            self.output_profile.set(settings["output_profile"])
+        self.max_output_kb.set(settings.get("max_output_kb", 0))
+        self.variants = settings.get("variants", [])
\ No newline at end of file
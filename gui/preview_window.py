@@ -4,11 +4,15 @@
 Finestra di anteprima per posizionamento manuale del logo
 """
 
+import os
+import time
 import tkinter as tk
 from tkinter import messagebox, ttk
-from PIL import Image, ImageTk
+from PIL import ImageTk
 
-from config import PREVIEW_MAX_WIDTH, PREVIEW_MAX_HEIGHT, CLICK_DELAY
+from config import (
+    PREVIEW_MAX_WIDTH, PREVIEW_MAX_HEIGHT, CLICK_DELAY, HOVER_FRAME_MS, PROFILE_ENV_VAR
+)
 from utils.image_processor import ImageProcessor
 
 
@@ -16,13 +20,14 @@ class PreviewWindow:
     """Classe per gestire la finestra di anteprima"""
     
     def __init__(self, parent, img, logo, filename, current_idx, total_images, 
-                 logo_size_percent, position_callback, close_callback):
+                 logo_size_percent, position_callback, close_callback, original_size=None,
+                 preview_logo=None):
         """
         Inizializza finestra di anteprima
         
         Args:
             parent: Finestra padre
-            img: Immagine PIL da mostrare
+            img: Immagine PIL da mostrare (anche già ridotta per l'anteprima)
             logo: Logo PIL (con sfondo se applicato)
             filename: Nome file immagine
             current_idx: Indice immagine corrente
@@ -30,9 +35,14 @@ class PreviewWindow:
             logo_size_percent: Percentuale dimensione logo
             position_callback: Callback quando posizione selezionata
             close_callback: Callback quando finestra chiusa
+            original_size: Dimensioni (larghezza, altezza) dell'immagine originale
+                se img è già ridotta (None = dimensioni di img)
+            preview_logo: Logo già ridimensionato per l'anteprima (opzionale)
         """
         self.parent = parent
         self.original_img = img
+        self.original_size = original_size or img.size
+        self.preview_logo = preview_logo
         self.original_logo = logo
         self.logo_size_percent = logo_size_percent
         self.position_callback = position_callback
@@ -40,6 +50,11 @@ class PreviewWindow:
         self.window_closed_manually = False
         self.click_position = None
         
+        # Movimenti del mouse raggruppati: si ridisegna al massimo ogni HOVER_FRAME_MS
+        self._hover_point = None
+        self._hover_job = None
+        self._frame_times = []
+        
         # Crea finestra
         self.window = tk.Toplevel(parent)
         self.window.title(f"Posiziona il logo - {filename}")
@@ -63,7 +78,21 @@ class PreviewWindow:
             bg="gray80"
         )
         self.canvas.pack(pady=5)
+        
+        # Elementi persistenti: al passaggio del mouse il logo viene solo spostato
         self.canvas.create_image(0, 0, anchor="nw", image=self.preview_photo)
+        self.logo_item = self.canvas.create_image(
+            0, 0,
+            image=self.preview_logo_photo,
+            state="hidden",
+            tags="hover_logo"
+        )
+        
+        # Tempo di ridisegno (visibile solo con il profiler attivo)
+        self.frame_time_label = None
+        if os.environ.get(PROFILE_ENV_VAR):
+            self.frame_time_label = ttk.Label(main_frame, text="Ridisegno: -")
+            self.frame_time_label.pack()
         
         # Bind eventi
         self.canvas.bind("<Button-1>", self.on_canvas_click)
@@ -91,29 +120,23 @@ class PreviewWindow:
     
     def _prepare_preview_images(self):
         """Prepara immagine e logo per anteprima"""
-        # Ridimensiona immagine per anteprima
-        display_img = self.original_img.copy()
-        display_img.thumbnail((PREVIEW_MAX_WIDTH, PREVIEW_MAX_HEIGHT))
+        # Ridimensiona immagine per anteprima (no-op se già ridotta)
+        display_img = self.original_img
+        if (display_img.width > PREVIEW_MAX_WIDTH or
+                display_img.height > PREVIEW_MAX_HEIGHT):
+            display_img = display_img.copy()
+            display_img.thumbnail((PREVIEW_MAX_WIDTH, PREVIEW_MAX_HEIGHT))
         self.preview_image = display_img
         self.preview_photo = ImageTk.PhotoImage(display_img)
         
-        # Ridimensiona logo per anteprima
-        processor = ImageProcessor()
-        logo_resized_orig = processor.resize_logo(
-            self.original_logo,
-            self.original_img,
-            self.logo_size_percent
-        )
-        
-        # Scala logo proporzionalmente all'anteprima
-        scale_factor = display_img.width / self.original_img.width
-        logo_width_preview = int(logo_resized_orig.width * scale_factor)
-        logo_height_preview = int(logo_resized_orig.height * scale_factor)
-        
-        self.preview_logo = logo_resized_orig.resize(
-            (logo_width_preview, logo_height_preview),
-            Image.Resampling.LANCZOS
-        )
+        # Ridimensiona logo per anteprima (se non già preparato)
+        if self.preview_logo is None:
+            self.preview_logo = ImageProcessor.create_preview_logo(
+                self.original_logo,
+                self.original_size,
+                display_img.size,
+                self.logo_size_percent
+            )
         self.preview_logo_photo = ImageTk.PhotoImage(self.preview_logo)
     
     def _center_window(self):
@@ -128,23 +151,50 @@ class PreviewWindow:
         if self.preview_logo is None:
             return
         
+        # Conserva solo l'ultima posizione: gli eventi intermedi vengono scartati
+        self._hover_point = (event.x, event.y)
+        if self._hover_job is None:
+            self._hover_job = self.window.after(HOVER_FRAME_MS, self._render_hover)
+    
+    def _render_hover(self):
+        """Sposta il logo all'ultima posizione del mouse"""
+        self._hover_job = None
+        if self._hover_point is None:
+            return
+        start = time.perf_counter()
+        
         # Calcola posizione logo centrata sul cursore
-        x = event.x - self.preview_logo.width // 2
-        y = event.y - self.preview_logo.height // 2
+        event_x, event_y = self._hover_point
+        x = event_x - self.preview_logo.width // 2
+        y = event_y - self.preview_logo.height // 2
         
         # Limita ai bordi
         x = max(0, min(x, self.preview_image.width - self.preview_logo.width))
         y = max(0, min(y, self.preview_image.height - self.preview_logo.height))
         
-        # Ridisegna
-        self.canvas.delete("all")
-        self.canvas.create_image(0, 0, anchor="nw", image=self.preview_photo)
-        self.canvas.create_image(
+        self.canvas.coords(
+            self.logo_item,
             x + self.preview_logo.width // 2,
-            y + self.preview_logo.height // 2,
-            image=self.preview_logo_photo,
-            tags="hover_logo"
+            y + self.preview_logo.height // 2
         )
+        self.canvas.itemconfigure(self.logo_item, state="normal")
+        
+        if self.frame_time_label is not None:
+            # Forza il ridisegno per misurarne il costo reale
+            self.canvas.update_idletasks()
+            self._frame_times.append((time.perf_counter() - start) * 1000)
+            if len(self._frame_times) >= 10:
+                average = sum(self._frame_times) / len(self._frame_times)
+                self.frame_time_label.config(
+                    text=f"Ridisegno: {average:.2f} ms (max {max(self._frame_times):.2f} ms)"
+                )
+                self._frame_times = []
+    
+    def _cancel_hover(self):
+        """Annulla il ridisegno in attesa"""
+        if self._hover_job is not None:
+            self.window.after_cancel(self._hover_job)
+            self._hover_job = None
     
     def on_canvas_click(self, event):
         """Gestisce click sul canvas"""
@@ -164,18 +214,17 @@ class PreviewWindow:
         
         self.click_position = (rel_x, rel_y)
         
-        # Ridisegna con logo finale
-        self.canvas.delete("all")
-        self.canvas.create_image(0, 0, anchor="nw", image=self.preview_photo)
-        
+        # Mostra il logo nella posizione finale (il mouse non lo sposta più)
+        self._cancel_hover()
+        self.canvas.unbind("<Motion>")
         x = int(rel_x * self.preview_image.width) - self.preview_logo.width // 2
         y = int(rel_y * self.preview_image.height) - self.preview_logo.height // 2
-        self.canvas.create_image(
+        self.canvas.coords(
+            self.logo_item,
             x + self.preview_logo.width // 2,
-            y + self.preview_logo.height // 2,
-            image=self.preview_logo_photo,
-            tags="final_logo"
+            y + self.preview_logo.height // 2
         )
+        self.canvas.itemconfigure(self.logo_item, state="normal", tags="final_logo")
         
         # Chiama callback dopo delay
         self.window.after(CLICK_DELAY, self._on_position_confirmed)
@@ -189,6 +238,7 @@ class PreviewWindow:
     def on_window_close(self):
         """Gestisce chiusura finestra"""
         self.window_closed_manually = True
+        self._cancel_hover()
         self.window.destroy()
         
         response = messagebox.askyesno(
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Applicatore Logo su Immagini - Riga di comando (senza interfaccia grafica)
+
+Uso:
+    python -m logo_applier --source foto/ --logo logo.png --dest output/
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from config import (
+    APP_NAME, APP_VERSION, SUPPORTED_IMAGE_FORMATS,
+    BACKGROUND_COLORS, BACKGROUND_SHAPES, FIXED_POSITIONS,
+    PIPELINE_THREADS, PIPELINE_QUEUE_SIZE, MEMORY_BUDGET_MB, OUTPUT_PROFILES,
+    BLEND_BACKEND, WATCH_POLL_INTERVAL, WATCH_SETTLE_SECONDS, DEDUP_INDEX_FILE,
+    WORK_QUEUE_LEASE_SECONDS
+)
+from utils.settings_manager import SettingsManager
+from utils.image_processor import ImageProcessor
+from utils.batch_processor import BatchProcessor, resolve_variants
+from utils.pipeline import PipelineProcessor
+from utils.run_manifest import RunManifest
+from utils.dedup_index import DedupIndex
+from utils.folder_watcher import FolderWatcher, WatchService
+from utils.memory_budget import MemoryBudget
+from utils.work_queue import QueueWorker, WorkQueue
+from utils.stage_profiler import StageProfiler
+
+
+def build_parser(defaults):
+    """
+    Costruisce il parser degli argomenti
+
+    Args:
+        defaults: Dizionario impostazioni usate come valori di default
+
+    Returns:
+        argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog="logo_applier",
+        description=f"{APP_NAME} - elaborazione batch da riga di comando"
+    )
+    parser.add_argument("--version", action="version", version=f"%(prog)s {APP_VERSION}")
+    parser.add_argument("--preset", default=None, metavar="NOME",
+                        help="Usa come default le impostazioni del preset salvato "
+                             "(es. cliente o marchio) invece di quelle correnti")
+    parser.add_argument("--source", default=defaults["source_folder"],
+                        help="Cartella immagini sorgente")
+    parser.add_argument("--logo", default=defaults["logo_file"],
+                        help="File logo")
+    parser.add_argument("--dest", default=defaults["dest_folder"],
+                        help="Cartella destinazione")
+    parser.add_argument("--recursive", action="store_true",
+                        help="Elabora anche le sottocartelle (riprodotte nella destinazione)")
+    parser.add_argument("--include", action="append", default=[], metavar="PATTERN",
+                        help="Elabora solo i file che corrispondono al pattern glob "
+                             "(percorso relativo alla sorgente, ripetibile)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help="Esclude file o sottocartelle che corrispondono al pattern "
+                             "glob (ripetibile)")
+    parser.add_argument("--sorted", action="store_true",
+                        help="Elabora i file in ordine alfabetico (riproducibile)")
+    parser.add_argument("--position", default=defaults["fixed_position"],
+                        choices=list(FIXED_POSITIONS.keys()),
+                        help="Posizione fissa del logo")
+    parser.add_argument("--size", type=int, default=defaults["logo_size_percent"],
+                        help="Dimensione logo (%% rispetto all'immagine)")
+    parser.add_argument("--margin", type=int, default=defaults["margin_percent"],
+                        help="Margine dai bordi (%%)")
+    parser.add_argument("--bg-color", default=defaults["bg_color"],
+                        choices=list(BACKGROUND_COLORS.keys()),
+                        help="Colore sfondo logo")
+    parser.add_argument("--bg-shape", default=defaults["bg_shape"],
+                        choices=BACKGROUND_SHAPES,
+                        help="Forma sfondo logo")
+    parser.add_argument("--output-profile", default=defaults["output_profile"],
+                        choices=list(OUTPUT_PROFILES.keys()),
+                        help="Profilo di codifica dell'output (formato, qualità, velocità)")
+    parser.add_argument("--max-kb", type=int, default=defaults["max_output_kb"],
+                        help="Dimensione massima di ogni file in KB: la qualità viene "
+                             "cercata per ogni immagine (solo JPEG e WebP, 0 = nessun limite)")
+    parser.add_argument("--variants", default=None, metavar="FILE",
+                        help="File JSON con la lista delle varianti da produrre per ogni "
+                             "immagine (default: 'variants' delle impostazioni salvate)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Numero di processi worker (default: numero di CPU)")
+    parser.add_argument("--blend", default=BLEND_BACKEND, choices=["pillow", "numpy"],
+                        help="Metodo di fusione del logo ('numpy' richiede NumPy)")
+    parser.add_argument("--memory-budget", type=int, default=MEMORY_BUDGET_MB, metavar="MB",
+                        help="Memoria massima per le immagini decodificate contemporaneamente "
+                             "da tutti i worker (0 = nessun limite)")
+    parser.add_argument("--force", action="store_true",
+                        help="Rielabora tutte le immagini, anche quelle già aggiornate "
+                             "secondo il manifest della cartella destinazione")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Elabora una sola volta le immagini con contenuto identico: "
+                             "le copie riusano l'output (hardlink o copia)")
+    parser.add_argument("--dedup-index", default=None, metavar="FILE",
+                        help="Indice dei duplicati condiviso tra più batch e destinazioni "
+                             f"(implica --dedup, default: {DEDUP_INDEX_FILE} nella destinazione)")
+    parser.add_argument("--dedup-copy", action="store_true",
+                        help="Copia gli output riusati invece di creare hardlink")
+    parser.add_argument("--profile", action="store_true",
+                        help="Misura i tempi di ogni fase e stampa un riepilogo finale")
+    parser.add_argument("--profile-trace", default=None, metavar="FILE",
+                        help="Salva le misure per immagine e fase in JSON o CSV "
+                             "(implica --profile)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Resta in esecuzione ed elabora i file nuovi o modificati "
+                             "che arrivano nella cartella sorgente (Ctrl+C per terminare)")
+    parser.add_argument("--poll-interval", type=float, default=WATCH_POLL_INTERVAL,
+                        help="Secondi tra due controlli della cartella in modalità --watch")
+    parser.add_argument("--settle", type=float, default=WATCH_SETTLE_SECONDS,
+                        help="Secondi senza modifiche prima di elaborare un file "
+                             "(attende la fine della copia)")
+    parser.add_argument("--queue", default=None, metavar="CARTELLA",
+                        help="Aggiunge le immagini alla coda condivisa (es. su NFS) invece "
+                             "di elaborarle: le elaborano i worker avviati con --queue-worker")
+    parser.add_argument("--queue-worker", default=None, metavar="CARTELLA",
+                        help="Elabora le immagini della coda condivisa con --workers processi "
+                             "finché non ne restano (impostazioni lette dalla coda)")
+    parser.add_argument("--lease", type=float, default=WORK_QUEUE_LEASE_SECONDS,
+                        metavar="SECONDI",
+                        help="Secondi senza rinnovo dopo cui l'immagine di un worker "
+                             "terminato torna in coda")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Usa la pipeline a stadi con thread invece dei processi "
+                             "(utile per cartelle su disco di rete)")
+    for stage in PipelineProcessor.STAGES:
+        parser.add_argument(f"--{stage}-threads", type=int, default=PIPELINE_THREADS[stage],
+                            help=f"Thread dello stadio '{stage}' della pipeline")
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE,
+                        help="Elementi massimi in coda tra due stadi della pipeline")
+    return parser
+
+
+def settings_from_args(args):
+    """Converte gli argomenti in dizionario impostazioni (chiavi di save_settings)"""
+    return {
+        "source_folder": args.source,
+        "logo_file": args.logo,
+        "dest_folder": args.dest,
+        "position_mode": "fixed",
+        "fixed_position": args.position,
+        "logo_size_percent": args.size,
+        "margin_percent": args.margin,
+        "bg_color": args.bg_color,
+        "bg_shape": args.bg_shape,
+        "output_profile": args.output_profile,
+        "max_output_kb": args.max_kb
+    }
+
+
+def validate_settings(settings):
+    """
+    Valida le impostazioni
+
+    Returns:
+        Messaggio di errore o None se valide
+    """
+    if not settings["source_folder"]:
+        return "Specifica la cartella delle immagini (--source)"
+    if not settings["logo_file"]:
+        return "Specifica il file del logo (--logo)"
+    if not settings["dest_folder"]:
+        return "Specifica la cartella di destinazione (--dest)"
+    if not os.path.exists(settings["source_folder"]):
+        return "La cartella sorgente non esiste"
+    if not os.path.exists(settings["logo_file"]):
+        return "Il file logo non esiste"
+    if not 0 < settings["logo_size_percent"] <= 100:
+        return "La dimensione del logo deve essere tra 1 e 100"
+    try:
+        variants = resolve_variants(settings)
+    except ValueError as e:
+        return str(e)
+    for variant in variants:
+        if variant["output_profile"] not in OUTPUT_PROFILES:
+            return f"Profilo di output sconosciuto: {variant['output_profile']}"
+        if variant["max_output_kb"] < 0:
+            return "La dimensione massima non può essere negativa"
+        if not os.path.exists(variant["logo_file"]):
+            return f"Il file logo non esiste: {variant['logo_file']}"
+    return None
+
+
+def print_profile(args):
+    """Stampa il riepilogo del profiler e salva la traccia se richiesto"""
+    if ImageProcessor.profiler is None:
+        return
+    print(ImageProcessor.profiler.summary())
+    if args.profile_trace:
+        ImageProcessor.profiler.write_trace(args.profile_trace)
+        print(f"Traccia salvata in {args.profile_trace}")
+
+
+def watch(args, batch, manifest, exclude):
+    """
+    Modalità sorveglianza: elabora i file man mano che arrivano
+
+    Returns:
+        Codice di uscita
+    """
+    watcher = FolderWatcher(
+        batch.settings["source_folder"],
+        tuple(SUPPORTED_IMAGE_FORMATS),
+        settle_seconds=args.settle,
+        recursive=args.recursive,
+        include=args.include,
+        exclude=exclude
+    )
+    service = WatchService(batch, watcher, manifest, poll_interval=args.poll_interval)
+    print(f"In attesa di immagini in {batch.settings['source_folder']} (Ctrl+C per terminare)")
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 1
+
+    print(f"\nSorveglianza terminata. Immagini elaborate: {len(service.waits)}")
+    if service.waits:
+        waits = sorted(service.waits)
+        print(f"Attesa dal rilevamento all'output: media {sum(waits) / len(waits):.1f} s, "
+              f"mediana {waits[len(waits) // 2]:.1f} s, massima {waits[-1]:.1f} s")
+    print_profile(args)
+    return 0
+
+
+def _init_queue_worker(blend_backend, memory_budget):
+    """Inizializza un processo worker della coda condivisa"""
+    ImageProcessor.set_blend_backend(blend_backend)
+    ImageProcessor.allow_large_images()
+    # Budget condiviso da tutti i worker della macchina
+    ImageProcessor.memory_budget = memory_budget
+
+
+def _run_queue_worker(queue_dir, lease_seconds):
+    """Elabora la coda condivisa nel processo corrente"""
+    return QueueWorker(WorkQueue(queue_dir, lease_seconds=lease_seconds)).run()
+
+
+def queue_worker(args):
+    """
+    Modalità worker: elabora le immagini della coda condivisa
+
+    Returns:
+        Codice di uscita
+    """
+    queue = WorkQueue(args.queue_worker, lease_seconds=args.lease)
+    try:
+        queue.load_settings()
+    except (OSError, ValueError) as e:
+        print(f"Errore: coda senza impostazioni (avvia prima --queue): {e}", file=sys.stderr)
+        return 2
+    try:
+        ImageProcessor.set_blend_backend(args.blend)
+    except ValueError as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 2
+
+    print(f"Elaborazione della coda {queue.queue_dir} con {args.workers} processi")
+    try:
+        if args.workers <= 1:
+            if args.memory_budget:
+                ImageProcessor.memory_budget = MemoryBudget(args.memory_budget)
+            results = [_run_queue_worker(args.queue_worker, args.lease)]
+        else:
+            memory_budget = None
+            if args.memory_budget:
+                memory_budget = MemoryBudget(args.memory_budget, shared=True)
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_queue_worker,
+                                     initargs=(args.blend, memory_budget)) as executor:
+                futures = [executor.submit(_run_queue_worker, args.queue_worker, args.lease)
+                           for _ in range(args.workers)]
+                results = [future.result() for future in futures]
+    except KeyboardInterrupt:
+        # Le immagini in corso sono tornate in coda
+        print("\nInterrotto", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 1
+
+    status = queue.status()
+    print(f"Immagini elaborate da questa macchina: {sum(p for p, _ in results)}, "
+          f"con errori: {sum(e for _, e in results)}")
+    print(f"Coda: {status['done']} elaborate, {status['failed']} in errore, "
+          f"{status['todo']} in attesa, {status['leases']} in corso")
+    return 1 if status['failed'] else 0
+
+
+def main(argv=None):
+    """Punto di ingresso da riga di comando"""
+    # Le impostazioni salvate dalla GUI (o il preset) fanno da default
+    try:
+        defaults = SettingsManager.load_defaults(argv)
+    except ValueError as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 2
+
+    args = build_parser(defaults).parse_args(argv)
+    # Immagini locali molto grandi (il servizio HTTP mantiene il limite di Pillow)
+    ImageProcessor.allow_large_images()
+    if args.queue_worker:
+        return queue_worker(args)
+    settings = settings_from_args(args)
+    settings["variants"] = defaults["variants"]
+    if args.variants:
+        try:
+            with open(args.variants, "r", encoding="utf-8") as f:
+                settings["variants"] = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Errore nella lettura delle varianti: {e}", file=sys.stderr)
+            return 2
+        if not isinstance(settings["variants"], list):
+            print("Errore: il file delle varianti deve contenere una lista", file=sys.stderr)
+            return 2
+
+    error = validate_settings(settings)
+    if error:
+        print(f"Errore: {error}", file=sys.stderr)
+        return 2
+    try:
+        ImageProcessor.set_blend_backend(args.blend)
+    except ValueError as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 2
+
+    # Non rielabora le immagini già prodotte se la destinazione è dentro la sorgente
+    exclude = list(args.exclude)
+    dest_rel = os.path.relpath(os.path.abspath(settings["dest_folder"]),
+                               os.path.abspath(settings["source_folder"]))
+    if dest_rel != os.curdir and not dest_rel.startswith(os.pardir):
+        exclude.append(dest_rel.replace(os.sep, "/"))
+
+    # I file vengono elaborati man mano che vengono trovati
+    image_files = ImageProcessor.iter_image_files(
+        settings["source_folder"],
+        tuple(SUPPORTED_IMAGE_FORMATS),
+        recursive=args.recursive,
+        include=args.include,
+        exclude=exclude,
+        sort=args.sorted
+    )
+
+    if args.queue:
+        # I percorsi devono essere gli stessi su tutte le macchine dei worker
+        for key in ("source_folder", "logo_file", "dest_folder"):
+            settings[key] = os.path.abspath(settings[key])
+        for variant in settings["variants"] or []:
+            if "logo_file" in variant:
+                variant["logo_file"] = os.path.abspath(variant["logo_file"])
+        queue = WorkQueue(args.queue)
+        try:
+            added = queue.submit(settings, image_files, force=args.force)
+        except (OSError, ValueError) as e:
+            print(f"Errore: {e}", file=sys.stderr)
+            return 1
+        status = queue.status()
+        print(f"Immagini aggiunte alla coda: {added} ({status['todo']} in attesa, "
+              f"{status['leases']} in corso, {status['done']} già elaborate)")
+        print(f"Avvia i worker con: python -m logo_applier --queue-worker {queue.queue_dir}")
+        return 0
+
+    done = 0
+
+    def on_progress(img_path, success, error):
+        nonlocal done
+        done += 1
+        if not success:
+            print(f"Errore elaborazione {os.path.basename(img_path)}: {error}", file=sys.stderr)
+        # Il totale non è noto in anticipo: mostra le immagini completate
+        print(f"\rElaborazione: {done} immagini", end="", flush=True)
+
+    if args.pipeline:
+        threads = {
+            stage: getattr(args, f"{stage}_threads")
+            for stage in PipelineProcessor.STAGES
+        }
+        batch = PipelineProcessor(settings, threads=threads, queue_size=args.queue_size,
+                                  memory_budget_mb=args.memory_budget)
+    else:
+        batch = BatchProcessor(settings, workers=args.workers,
+                               memory_budget_mb=args.memory_budget)
+    if args.profile or args.profile_trace:
+        ImageProcessor.profiler = StageProfiler()
+
+    if args.dedup or args.dedup_index:
+        index_path = args.dedup_index or os.path.join(settings["dest_folder"], DEDUP_INDEX_FILE)
+        # Con --force gli output delle esecuzioni precedenti non vengono riusati
+        since = DedupIndex.end_offset(index_path) if args.force else None
+        batch.dedup = DedupIndex(index_path, hardlink=not args.dedup_copy, since=since)
+
+    manifest = RunManifest(settings["dest_folder"], settings)
+    if args.force:
+        manifest.entries.clear()
+
+    if args.watch:
+        return watch(args, batch, manifest, exclude)
+
+    try:
+        processed, errors = batch.run(
+            image_files,
+            progress_callback=on_progress,
+            manifest=manifest
+        )
+    except Exception as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 1
+
+    if done == 0 and manifest.skipped == 0:
+        print("Nessuna immagine trovata", file=sys.stderr)
+        return 1
+
+    print(f"\nElaborazione completata! Immagini elaborate: {processed}")
+    if manifest.skipped:
+        print(f"Immagini già aggiornate (saltate): {manifest.skipped}")
+    if batch.dedup is not None:
+        print(f"Output riusati da immagini duplicate: {batch.dedup_reused}")
+    print_profile(args)
+    print(f"Cache logo: {batch.cache_hits} riusi, {batch.cache_misses} ridimensionamenti")
+    if errors:
+        print(f"Immagini con errori: {len(errors)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
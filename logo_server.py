@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Applicatore Logo su Immagini - Servizio HTTP locale
+
+Uso:
+    python -m logo_server --logo logo.png --port 8765
+    curl --data-binary @foto.jpg "http://127.0.0.1:8765/watermark?position=bottom_right&size=10" -o out.jpg
+"""
+
+import argparse
+import ipaddress
+import os
+import sys
+
+from config import (
+    APP_NAME, APP_VERSION, BACKGROUND_COLORS, BACKGROUND_SHAPES, FIXED_POSITIONS,
+    MEMORY_BUDGET_MB, OUTPUT_PROFILES, BLEND_BACKEND, SERVER_HOST, SERVER_PORT,
+    SERVER_QUEUE_SIZE, SERVER_MAX_BODY_MB
+)
+from utils.image_processor import ImageProcessor
+from utils.memory_budget import MemoryBudget
+from utils.settings_manager import SettingsManager
+from utils.watermark_server import WatermarkServer, WatermarkService
+
+
+def build_parser(defaults):
+    """
+    Costruisce il parser degli argomenti
+
+    Args:
+        defaults: Dizionario impostazioni usate come valori di default
+
+    Returns:
+        argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog="logo_server",
+        description=f"{APP_NAME} - servizio HTTP locale"
+    )
+    parser.add_argument("--version", action="version", version=f"%(prog)s {APP_VERSION}")
+    parser.add_argument("--preset", default=None, metavar="NOME",
+                        help="Usa come default le impostazioni del preset salvato")
+    parser.add_argument("--host", default=SERVER_HOST,
+                        help="Indirizzo di ascolto (default solo connessioni locali)")
+    parser.add_argument("--port", type=int, default=SERVER_PORT,
+                        help="Porta di ascolto")
+    parser.add_argument("--logo", default=defaults["logo_file"],
+                        help="File logo di default")
+    parser.add_argument("--extra-logo", action="append", default=[], metavar="NOME=FILE",
+                        help="Logo aggiuntivo scelto con il parametro 'logo' della "
+                             "richiesta (ripetibile)")
+    parser.add_argument("--position", default=defaults["fixed_position"],
+                        choices=list(FIXED_POSITIONS.keys()),
+                        help="Posizione fissa di default")
+    parser.add_argument("--size", type=int, default=defaults["logo_size_percent"],
+                        help="Dimensione logo di default (%% rispetto all'immagine)")
+    parser.add_argument("--margin", type=int, default=defaults["margin_percent"],
+                        help="Margine di default dai bordi (%%)")
+    parser.add_argument("--bg-color", default=defaults["bg_color"],
+                        choices=list(BACKGROUND_COLORS.keys()),
+                        help="Colore sfondo logo di default")
+    parser.add_argument("--bg-shape", default=defaults["bg_shape"],
+                        choices=BACKGROUND_SHAPES,
+                        help="Forma sfondo logo di default")
+    parser.add_argument("--output-profile", default=defaults["output_profile"],
+                        choices=list(OUTPUT_PROFILES.keys()),
+                        help="Profilo di codifica di default")
+    parser.add_argument("--max-kb", type=int, default=defaults["max_output_kb"],
+                        help="Dimensione massima di default della risposta in KB "
+                             "(0 = nessun limite)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Immagini elaborate contemporaneamente (default: numero di CPU)")
+    parser.add_argument("--queue-size", type=int, default=SERVER_QUEUE_SIZE,
+                        help="Richieste in attesa oltre le quali si risponde 503")
+    parser.add_argument("--max-body-mb", type=float, default=SERVER_MAX_BODY_MB,
+                        help="Dimensione massima dell'immagine ricevuta in MB")
+    parser.add_argument("--blend", default=BLEND_BACKEND, choices=["pillow", "numpy"],
+                        help="Metodo di fusione del logo ('numpy' richiede NumPy)")
+    parser.add_argument("--memory-budget", type=int, default=MEMORY_BUDGET_MB, metavar="MB",
+                        help="Memoria massima per le immagini decodificate contemporaneamente "
+                             "(0 = nessun limite)")
+    parser.add_argument("--access-log", action="store_true",
+                        help="Stampa una riga per ogni richiesta")
+    return parser
+
+
+def parse_extra_logos(values):
+    """
+    Converte gli argomenti NOME=FILE in dizionario
+
+    Raises:
+        ValueError: Argomento senza nome o file inesistente
+    """
+    logos = {}
+    for value in values:
+        name, sep, path = value.partition("=")
+        if not sep or not name or not path:
+            raise ValueError(f"Logo aggiuntivo non valido (usa NOME=FILE): {value}")
+        if not os.path.exists(path):
+            raise ValueError(f"Il file logo non esiste: {path}")
+        logos[name] = path
+    return logos
+
+
+def is_loopback(host):
+    """True se l'indirizzo accetta solo connessioni dalla stessa macchina"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main(argv=None):
+    """Punto di ingresso del servizio"""
+    try:
+        defaults = SettingsManager.load_defaults(argv)
+    except ValueError as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 2
+
+    args = build_parser(defaults).parse_args(argv)
+    if not args.logo:
+        print("Errore: specifica il file del logo (--logo)", file=sys.stderr)
+        return 2
+    if not os.path.exists(args.logo):
+        print("Errore: il file logo non esiste", file=sys.stderr)
+        return 2
+    try:
+        logos = parse_extra_logos(args.extra_logo)
+        ImageProcessor.set_blend_backend(args.blend)
+    except ValueError as e:
+        print(f"Errore: {e}", file=sys.stderr)
+        return 2
+
+    settings = dict(defaults)
+    settings.update({
+        "logo_file": args.logo,
+        "fixed_position": args.position,
+        "logo_size_percent": args.size,
+        "margin_percent": args.margin,
+        "bg_color": args.bg_color,
+        "bg_shape": args.bg_shape,
+        "output_profile": args.output_profile,
+        "max_output_kb": args.max_kb
+    })
+
+    service = WatermarkService(settings, logos, workers=args.workers,
+                               queue_size=args.queue_size)
+    try:
+        service.preload()
+    except OSError as e:
+        print(f"Errore nel caricamento del logo: {e}", file=sys.stderr)
+        return 1
+    if args.memory_budget:
+        ImageProcessor.memory_budget = MemoryBudget(args.memory_budget)
+
+    if not is_loopback(args.host):
+        print(f"Attenzione: il servizio non ha autenticazione ed è raggiungibile su {args.host}",
+              file=sys.stderr)
+    server = WatermarkServer(service, args.host, args.port, max_body_mb=args.max_body_mb,
+                             access_log=args.access_log)
+    print(f"Servizio in ascolto su {server.url}/watermark "
+          f"({service.workers} worker, {args.queue_size} in coda; Ctrl+C per terminare)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    stats = service.stats()
+    print(f"\nServizio terminato. Immagini elaborate: {stats['processed']}, "
+          f"errori: {stats['errors']}, rifiutate (servizio saturo): {stats['rejected']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,14 +8,23 @@ __author__ = "Michele Barbella"
 __version__ = "1.0.0"
 __license__ = "MIT"
 
-import tkinter as tk
-from gui.main_window import LogoApplierApp
+import multiprocessing
 
 def main():
     """Punto di ingresso principale dell'applicazione"""
+    # Importati qui: i processi worker (che su Windows rieseguono questo
+    # modulo) non caricano tkinter né la GUI
+    import tkinter as tk
+    from gui.main_window import LogoApplierApp
+    from utils.image_processor import ImageProcessor
+    
+    # Immagini locali molto grandi (vedi config.MAX_IMAGE_PIXELS)
+    ImageProcessor.allow_large_images()
     root = tk.Tk()
     app = LogoApplierApp(root)
     root.mainloop()
 
 if __name__ == "__main__":
+    # Necessario per i processi worker negli eseguibili impacchettati
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+import unittest
+from utils.background_batch import BackgroundBatch
+from utils.batch_processor import BatchProcessor
+from utils.image_processor import ImageProcessor
+from PIL import Image
+
+class TestBackgroundBatch(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        source = os.path.join(self.tmp.name, 'src')
+        os.makedirs(source)
+        for i in range(6):
+            Image.new('RGB', (200, 150), (i * 40, 0, 0)).save(os.path.join(source, f'{i}.jpg'))
+        logo_file = os.path.join(self.tmp.name, 'logo.png')
+        Image.new('RGBA', (20, 20), (255, 0, 0, 255)).save(logo_file)
+        self.settings = {
+            'source_folder': source,
+            'dest_folder': os.path.join(self.tmp.name, 'dst'),
+            'logo_file': logo_file
+        }
+        self.files = ImageProcessor.get_image_files(source, ('.jpg',))
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def _events(self, background):
+        background.join(10)
+        self.assertFalse(background.is_alive())
+        return background.poll()
+    
+    def test_pause_then_resume_processes_everything(self):
+        for workers in (1, 2):
+            background = BackgroundBatch(BatchProcessor(self.settings, workers=workers), self.files)
+            background.pause()
+            background.start()
+            time.sleep(0.2)
+            self.assertEqual(background.poll(), [])
+            background.resume()
+            events = self._events(background)
+            self.assertEqual(sum(1 for e in events if e[0] == 'progress'), 6)
+            self.assertEqual(events[-1], ('done', 6, [], False))
+    
+    def test_cancel_while_paused(self):
+        for workers in (1, 2):
+            background = BackgroundBatch(BatchProcessor(self.settings, workers=workers), self.files)
+            background.pause()
+            background.start()
+            background.cancel()
+            self.assertEqual(self._events(background), [('done', 0, [], True)])
+    
+    def test_failure_is_reported(self):
+        settings = dict(self.settings, logo_file=os.path.join(self.tmp.name, 'missing.png'))
+        background = BackgroundBatch(BatchProcessor(settings, workers=1), self.files)
+        background.start()
+        events = self._events(background)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0][0], 'failed')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from utils.batch_processor import BatchProcessor
+from PIL import Image
+
+class TestBatchProcessor(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'source')
+        self.dest = os.path.join(self.tmp.name, 'dest')
+        os.makedirs(self.source)
+        self.logo_file = os.path.join(self.tmp.name, 'logo.png')
+        Image.new('RGBA', (50, 50), (255, 0, 0, 255)).save(self.logo_file)
+        self.image_files = []
+        for i, size in enumerate([(400, 300), (300, 400), (640, 480)]):
+            path = os.path.join(self.source, f'img_{i}.png')
+            Image.new('RGB', size, (0, 0, 255)).save(path)
+            self.image_files.append(path)
+        self.settings = {
+            'logo_file': self.logo_file,
+            'dest_folder': self.dest,
+            'fixed_position': 'top_left',
+            'logo_size_percent': 10,
+            'margin_percent': 0
+        }
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_run_single_process(self):
+        batch = BatchProcessor(self.settings, workers=1)
+        processed, errors = batch.run(self.image_files)
+        self.assertEqual(processed, 3)
+        self.assertEqual(errors, [])
+        out = Image.open(os.path.join(self.dest, 'img_0.jpg'))
+        self.assertEqual(out.size, (400, 300))
+        r, g, b = out.getpixel((2, 2))
+        self.assertGreater(r, 200)
+        self.assertLess(b, 50)
+    
+    def test_run_process_pool(self):
+        batch = BatchProcessor(self.settings, workers=2)
+        processed, errors = batch.run(self.image_files)
+        self.assertEqual(processed, 3)
+        self.assertEqual(sorted(os.listdir(self.dest)), ['img_0.jpg', 'img_1.jpg', 'img_2.jpg'])
+    
+    def test_run_reports_errors(self):
+        broken = os.path.join(self.source, 'broken.jpg')
+        with open(broken, 'wb') as f:
+            f.write(b'non un jpeg')
+        batch = BatchProcessor(self.settings, workers=1)
+        processed, errors = batch.run(self.image_files + [broken])
+        self.assertEqual(processed, 3)
+        self.assertEqual([path for path, _ in errors], [broken])
+    
+    def test_manual_position(self):
+        batch = BatchProcessor(self.settings, workers=1)
+        batch.run(self.image_files[:1], positions={self.image_files[0]: (0.5, 0.5)})
+        out = Image.open(os.path.join(self.dest, 'img_0.jpg'))
+        r, g, b = out.getpixel((200, 150))
+        self.assertGreater(r, 200)
+        self.assertLess(b, 50)
+    
+    def test_variants_share_one_decode(self):
+        green_logo = os.path.join(self.tmp.name, 'green.png')
+        Image.new('RGBA', (50, 50), (0, 255, 0, 255)).save(green_logo)
+        settings = dict(self.settings, variants=[
+            {'name': 'web', 'max_size': 200, 'output_profile': 'webp'},
+            {'name': 'print'},
+            {'name': 'corner', 'logo_file': green_logo, 'fixed_position': 'bottom_right'},
+        ])
+        for pipeline in (False, True):
+            dest = os.path.join(self.tmp.name, f'variants_{pipeline}')
+            if pipeline:
+                from utils.pipeline import PipelineProcessor
+                batch = PipelineProcessor(dict(settings, dest_folder=dest))
+            else:
+                batch = BatchProcessor(dict(settings, dest_folder=dest), workers=1)
+            processed, errors = batch.run(self.image_files[:1])
+            self.assertEqual((processed, errors), (1, []))
+            with Image.open(os.path.join(dest, 'web', 'img_0.webp')) as web:
+                self.assertEqual(web.size, (200, 150))
+                self.assertGreater(web.getpixel((1, 1))[0], 200)
+            with Image.open(os.path.join(dest, 'print', 'img_0.jpg')) as full:
+                self.assertEqual(full.size, (400, 300))
+                self.assertGreater(full.getpixel((2, 2))[0], 200)
+                self.assertLess(full.getpixel((397, 297))[1], 50)
+            with Image.open(os.path.join(dest, 'corner', 'img_0.jpg')) as corner:
+                self.assertGreater(corner.getpixel((397, 297))[1], 200)
+                self.assertLess(corner.getpixel((2, 2))[0], 50)
+    
+    def test_animated_gif_keeps_animation(self):
+        animated = os.path.join(self.source, 'anim.gif')
+        frames = [Image.new('RGB', (400, 300), color)
+                  for color in [(0, 0, 255), (0, 255, 0), (255, 255, 0)]]
+        frames[0].save(animated, save_all=True, append_images=frames[1:],
+                       duration=[50, 60, 70], loop=0)
+        still = os.path.join(self.source, 'still.gif')
+        Image.new('RGB', (400, 300), (0, 0, 255)).save(still)
+        for workers in (1, 2):
+            batch = BatchProcessor(self.settings, workers=workers)
+            processed, errors = batch.run([animated, still])
+            self.assertEqual((processed, errors), (2, []))
+            # Il profilo JPEG non supporta l'animazione: l'output resta GIF
+            self.assertEqual(sorted(os.listdir(self.dest)), ['anim.gif', 'still.jpg'])
+            with Image.open(os.path.join(self.dest, 'anim.gif')) as out:
+                self.assertEqual((out.n_frames, out.info['loop']), (3, 0))
+                for i, color in enumerate([(0, 0, 255), (0, 255, 0), (255, 255, 0)]):
+                    out.seek(i)
+                    frame = out.convert('RGB')
+                    self.assertEqual(out.info['duration'], 50 + 10 * i)
+                    self.assertEqual(frame.getpixel((2, 2)), (255, 0, 0))
+                    self.assertEqual(frame.getpixel((300, 200)), color)
+    
+    def test_invalid_variants(self):
+        for variants in ([{'name': 'a'}, {'name': 'a'}], [{'name': '../x'}], [{'name': 'a', 'qualità': 1}]):
+            with self.assertRaises(ValueError):
+                BatchProcessor(dict(self.settings, variants=variants), workers=1)
+
+if __name__ == '__main__':
+    unittest.main()
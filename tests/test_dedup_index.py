@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from utils.batch_processor import BatchProcessor
+from utils.dedup_index import DedupIndex
+from utils.image_processor import ImageProcessor
+from utils.pipeline import PipelineProcessor
+from utils.run_manifest import RunManifest
+from PIL import Image
+
+class TestDedupIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'source')
+        self.dest = os.path.join(self.tmp.name, 'dest')
+        os.makedirs(self.source)
+        self.logo_file = os.path.join(self.tmp.name, 'logo.png')
+        Image.new('RGBA', (50, 50), (255, 0, 0, 255)).save(self.logo_file)
+        original = os.path.join(self.source, 'foto.png')
+        Image.new('RGB', (400, 300), (0, 0, 255)).save(original)
+        copy = os.path.join(self.source, 'foto_copia.png')
+        shutil.copyfile(original, copy)
+        other = os.path.join(self.source, 'altra.png')
+        Image.new('RGB', (400, 300), (0, 255, 0)).save(other)
+        self.image_files = [original, copy, other]
+        self.index_path = os.path.join(self.tmp.name, 'dedup.jsonl')
+        self.settings = {
+            'logo_file': self.logo_file,
+            'source_folder': self.source,
+            'dest_folder': self.dest,
+            'fixed_position': 'top_left',
+            'logo_size_percent': 10,
+            'margin_percent': 0
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, batch_class=BatchProcessor, **kwargs):
+        batch = batch_class(self.settings, **kwargs)
+        batch.dedup = DedupIndex(self.index_path)
+        with mock.patch.object(ImageProcessor, 'save_image',
+                               wraps=ImageProcessor.save_image) as save:
+            processed, errors = batch.run(self.image_files)
+        self.assertEqual((processed, errors), (3, []))
+        return batch, save.call_count
+
+    def test_duplicates_are_linked(self):
+        batch, saved = self._run(workers=1)
+        self.assertEqual((saved, batch.dedup_reused), (2, 1))
+        first = os.stat(os.path.join(self.dest, 'foto.jpg'))
+        second = os.stat(os.path.join(self.dest, 'foto_copia.jpg'))
+        self.assertEqual(first.st_ino, second.st_ino)
+
+        # Un output condiviso viene sostituito, l'altro non cambia
+        with open(os.path.join(self.dest, 'foto.jpg'), 'rb') as f:
+            data = f.read()
+        ImageProcessor.save_image(Image.new('RGB', (10, 10)),
+                                  os.path.join(self.dest, 'foto_copia.jpg'))
+        with open(os.path.join(self.dest, 'foto.jpg'), 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_index_persists_across_runs(self):
+        self._run(workers=1)
+        self.settings['dest_folder'] = os.path.join(self.tmp.name, 'altra_dest')
+        batch, saved = self._run(workers=1)
+        self.assertEqual((saved, batch.dedup_reused), (0, 3))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'altra_dest', 'altra.jpg')))
+
+        # Impostazioni diverse: nessun riuso
+        self.settings['logo_size_percent'] = 20
+        batch, saved = self._run(workers=1)
+        self.assertEqual((saved, batch.dedup_reused), (2, 1))
+
+    def test_overwritten_output_is_not_reused(self):
+        self._run(workers=1)
+        with open(os.path.join(self.dest, 'altra.jpg'), 'ab') as f:
+            f.write(b'modificato')
+        index = DedupIndex(self.index_path)
+        job = BatchProcessor(self.settings, workers=1).variant_jobs(self.image_files[2])[0]
+        self.assertIsNone(index.lookup(RunManifest.file_hash(self.image_files[2]),
+                                       job['output_fingerprint']))
+        self.assertEqual(index.lookup(RunManifest.file_hash(self.image_files[0]),
+                                      job['output_fingerprint']),
+                         os.path.join(self.dest, 'foto.jpg'))
+
+    def test_since_ignores_previous_runs(self):
+        self._run(workers=1)
+        output = os.path.join(self.dest, 'foto.jpg')
+        with open(output, 'rb') as f:
+            data = f.read()
+        os.remove(os.path.join(self.dest, 'altra.jpg'))
+        # Come --force: gli output già presenti vengono rigenerati, ma le
+        # copie prodotte in questa esecuzione vengono ancora riusate
+        for workers in (1, 2):
+            batch = BatchProcessor(self.settings, workers=workers)
+            batch.dedup = DedupIndex(self.index_path,
+                                     since=DedupIndex.end_offset(self.index_path))
+            self.assertEqual(batch.dedup.entries, {})
+            os.utime(output, ns=(0, 0))
+            processed, errors = batch.run(self.image_files)
+            self.assertEqual((processed, errors), (3, []))
+            self.assertNotEqual(os.stat(output).st_mtime_ns, 0)
+            self.assertTrue(os.path.exists(os.path.join(self.dest, 'altra.jpg')))
+            with open(output, 'rb') as f:
+                self.assertEqual(f.read(), data)
+            if workers == 1:
+                self.assertEqual(batch.dedup_reused, 1)
+
+    def test_pipeline_and_copy_mode(self):
+        batch = PipelineProcessor(self.settings)
+        batch.dedup = DedupIndex(self.index_path, hardlink=False)
+        # Nella pipeline la copia letta prima del salvataggio dell'originale
+        # verrebbe elaborata: l'originale viene elaborato in un batch precedente
+        batch.run(self.image_files[:1])
+        processed, errors = batch.run(self.image_files[1:])
+        self.assertEqual((processed, errors, batch.dedup_reused), (2, [], 1))
+        first = os.stat(os.path.join(self.dest, 'foto.jpg'))
+        second = os.stat(os.path.join(self.dest, 'foto_copia.jpg'))
+        self.assertNotEqual(first.st_ino, second.st_ino)
+        self.assertEqual(first.st_size, second.st_size)
+
+if __name__ == '__main__':
+    unittest.main()
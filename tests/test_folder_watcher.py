@@ -0,0 +1,83 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from utils.batch_processor import BatchProcessor
+from utils.folder_watcher import FolderWatcher, WatchService
+from utils.run_manifest import RunManifest
+from PIL import Image
+
+class TestFolderWatcher(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'src')
+        self.dest = os.path.join(self.tmp.name, 'dst')
+        os.makedirs(self.source)
+        self.logo_file = os.path.join(self.tmp.name, 'logo.png')
+        Image.new('RGBA', (20, 20), (255, 0, 0, 255)).save(self.logo_file)
+        self.watcher = FolderWatcher(self.source, ('.jpg',), settle_seconds=0)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def _add(self, name, color=(0, 0, 255)):
+        path = os.path.join(self.source, name)
+        Image.new('RGB', (200, 150), color).save(path)
+        return path
+    
+    def test_file_ready_once_stable(self):
+        path = self._add('a.jpg')
+        self.assertEqual(self.watcher.poll(), [])
+        self.assertEqual(self.watcher.poll(), [path])
+        self.watcher.mark_done(path)
+        self.assertEqual(self.watcher.poll(), [])
+    
+    def test_growing_file_waits(self):
+        path = os.path.join(self.source, 'b.jpg')
+        with open(path, 'wb') as f:
+            f.write(b'\xff\xd8' + b'0' * 100)
+            f.flush()
+            self.watcher.poll()
+            f.write(b'0' * 100)
+            f.flush()
+            self.assertEqual(self.watcher.poll(), [])
+        self.assertEqual(self.watcher.poll(), [path])
+    
+    def test_changed_file_is_proposed_again(self):
+        path = self._add('c.jpg')
+        self.watcher.poll()
+        self.watcher.mark_done(self.watcher.poll()[0])
+        time.sleep(0.01)
+        self._add('c.jpg', color=(0, 255, 0))
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+        self.assertEqual(self.watcher.poll(), [])
+        self.assertEqual(self.watcher.poll(), [path])
+    
+    def test_service_processes_new_files_with_warm_pool(self):
+        settings = {'source_folder': self.source, 'dest_folder': self.dest, 'logo_file': self.logo_file}
+        batch = BatchProcessor(settings, workers=2)
+        reports = []
+        service = WatchService(batch, self.watcher, RunManifest(self.dest, settings),
+                               poll_interval=0.05, report=reports.append)
+        stop = threading.Event()
+        thread = threading.Thread(target=service.run, args=(stop,))
+        thread.start()
+        try:
+            self._add('d.jpg')
+            deadline = time.time() + 20
+            while len(service.waits) < 1 and time.time() < deadline:
+                time.sleep(0.05)
+            self._add('e.jpg')
+            while len(service.waits) < 2 and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            stop.set()
+            thread.join(20)
+        self.assertEqual(sorted(os.listdir(self.dest))[-2:], ['d.jpg', 'e.jpg'])
+        self.assertEqual(len(service.waits), 2)
+        self.assertTrue(all('pronto in' in message for message in reports))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,14 @@
+import os
+import tempfile
 import unittest
 from utils.image_processor import ImageProcessor
-from PIL import Image
+from utils.logo_cache import LogoCache
+from PIL import Image, ImageStat
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class TestImageProcessor(unittest.TestCase):
     
@@ -21,11 +29,167 @@ class TestImageProcessor(unittest.TestCase):
         )
         self.assertIsNotNone(result)
     
+    def test_create_logo_with_background_antialiased_and_cached(self):
+        result = self.processor.create_logo_with_background(
+            self.logo, '#00FF00', 'Ovale', padding=10
+        )
+        alpha_values = set(result.getchannel('A').tobytes())
+        self.assertTrue(any(0 < value < 255 for value in alpha_values))
+        
+        again = self.processor.create_logo_with_background(
+            self.logo, '#00FF00', 'Ovale', padding=10
+        )
+        self.assertIsNot(again, result)
+        self.assertEqual(again.tobytes(), result.tobytes())
+        
+        other = self.processor.create_logo_with_background(
+            self.logo, '#00FF00', 'Ovale', padding=12
+        )
+        self.assertEqual(other.size, (124, 124))
+    
     def test_resize_logo_horizontal(self):
         target = Image.new('RGB', (1920, 1080))
         result = self.processor.resize_logo(self.logo, target, 10)
         expected_width = int(1920 * 0.1)
         self.assertEqual(result.width, expected_width)
+    
+    def test_composite_logo_matches_rgba_round_trip(self):
+        img = Image.effect_noise((300, 200), 60).convert('RGB')
+        logo = Image.new('RGBA', (60, 40), (255, 0, 0, 128))
+        
+        # Vecchio percorso: intero fotogramma RGBA, incolla, di nuovo RGB
+        expected = img.convert('RGBA')
+        logo_resized = self.processor.resize_logo(logo, expected, 10)
+        expected.paste(logo_resized, (4, 4), logo_resized)
+        expected = expected.convert('RGB')
+        
+        result = self.processor.composite_logo(img.copy(), logo, 10, 'top_left', 2)
+        self.assertEqual(result.mode, 'RGB')
+        self.assertEqual(result.tobytes(), expected.tobytes())
+    
+    @unittest.skipIf(numpy is None, "NumPy non installato")
+    def test_numpy_blend_matches_pillow(self):
+        img = Image.effect_noise((300, 200), 60).convert('RGB')
+        logo = Image.merge('RGBA', [Image.effect_noise((64, 48), 80)] * 2 +
+                           [Image.linear_gradient('L').resize((64, 48))] * 2)
+        cases = [{'position_type': 'bottom_right'},
+                 {'rel_position': (0.02, 0.98)},
+                 {'rel_position': (0.5, 0.5), 'logo_cache': LogoCache()}]
+        try:
+            for options in cases:
+                ImageProcessor.set_blend_backend('pillow')
+                expected = self.processor.composite_logo(img.copy(), logo, 20, **options)
+                ImageProcessor.set_blend_backend('numpy')
+                result = self.processor.composite_logo(img.copy(), logo, 20, **options)
+                self.assertEqual(result.tobytes(), expected.tobytes(), options)
+        finally:
+            ImageProcessor.set_blend_backend('pillow')
+        with self.assertRaises(ValueError):
+            ImageProcessor.set_blend_backend('simd')
+    
+    def test_auto_position_picks_calm_visible_corner(self):
+        img = Image.effect_noise((400, 300), 80).convert('RGB')
+        img.paste((30, 30, 30), (0, 150, 150, 300))      # in basso a sinistra: uniforme e scuro
+        img.paste((250, 250, 250), (250, 0, 400, 150))   # in alto a destra: uniforme ma chiaro
+        white_logo = Image.new('RGBA', (40, 30), (255, 255, 255, 255))
+        
+        position = self.processor.calculate_auto_position(img, white_logo, 2)
+        self.assertEqual(position, (6, 300 - 30 - 6))
+        
+        # Un logo scuro non sarebbe visibile in basso a sinistra
+        dark_logo = Image.new('RGBA', (40, 30), (20, 20, 20, 255))
+        position = self.processor.calculate_auto_position(img, dark_logo, 2)
+        self.assertEqual(position, (400 - 40 - 6, 6))
+        
+        result = self.processor.composite_logo(img.copy(), dark_logo, 10, 'auto_edges', 2)
+        self.assertEqual(result.getpixel((400 - 7, 7)), (20, 20, 20))
+    
+    def test_window_stats_match_imagestat(self):
+        img = Image.effect_noise((120, 80), 50)
+        boxes = [(0, 0, 10, 10), (30, 20, 120, 80), (5, 70, 6, 71)]
+        for (mean, stddev), box in zip(self.processor.window_stats(img, boxes), boxes):
+            stat = ImageStat.Stat(img.crop(box))
+            self.assertAlmostEqual(mean, stat.mean[0], places=6)
+            self.assertAlmostEqual(stddev, stat.stddev[0], places=6)
+    
+    def test_iter_image_files_recursive_with_globs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for rel_path in ['a.jpg', 'b.txt', 'sub/c.PNG', 'sub/raw/d.jpg', 'sub/e.gif']:
+                path = os.path.join(tmp, rel_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                open(path, 'wb').close()
+            extensions = ('.jpg', '.png', '.gif')
+            
+            flat = list(self.processor.iter_image_files(tmp, extensions))
+            self.assertEqual(flat, [os.path.join(tmp, 'a.jpg')])
+            
+            found = self.processor.iter_image_files(
+                tmp, extensions, recursive=True, exclude=['sub/raw', '*.gif'], sort=True
+            )
+            self.assertEqual(
+                [os.path.relpath(p, tmp) for p in found],
+                ['a.jpg', os.path.join('sub', 'c.PNG')]
+            )
+            
+            found = self.processor.iter_image_files(
+                tmp, extensions, recursive=True, include=['sub/*.jpg']
+            )
+            self.assertEqual([os.path.relpath(p, tmp) for p in found],
+                             [os.path.join('sub', 'raw', 'd.jpg')])
+    
+    def test_get_output_path_mirrors_subfolders(self):
+        output = self.processor.get_output_path('/src/2024/img.png', '/out', '/src')
+        self.assertEqual(output, os.path.join('/out', '2024', 'img.jpg'))
+        output = self.processor.get_output_path('/src/img.png', '/out', '/src')
+        self.assertEqual(output, os.path.join('/out', 'img.jpg'))
+    
+    def test_open_preview_image_keeps_original_size(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'big.jpg')
+            Image.new('RGB', (4000, 3000), (0, 128, 0)).save(path)
+            preview, original_size = self.processor.open_preview_image(path, (1000, 900))
+            self.assertEqual(original_size, (4000, 3000))
+            self.assertEqual(preview.size, (1000, 750))
+    
+    def test_save_image_with_profiles(self):
+        img = Image.effect_noise((200, 150), 40).convert('RGB')
+        with tempfile.TemporaryDirectory() as tmp:
+            for profile, fmt in (('jpeg', 'JPEG'), ('webp', 'WEBP'), ('png-fast', 'PNG')):
+                path = self.processor.get_output_path('/src/a.png', tmp, profile=profile)
+                self.processor.save_image(img, path, profile)
+                with Image.open(path) as saved:
+                    self.assertEqual(saved.format, fmt)
+    
+    def test_save_image_with_max_bytes(self):
+        img = Image.effect_noise((400, 300), 60).convert('RGB')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'a.jpg')
+            self.processor.save_image(img, path, 'jpeg-max')
+            full_size = os.path.getsize(path)
+            self.processor.save_image(img, path, 'jpeg-max', max_bytes=full_size // 3)
+            self.assertLessEqual(os.path.getsize(path), full_size // 3)
+    
+    def test_save_animation_keeps_frames_and_durations(self):
+        colors = [(0, 0, 255), (0, 255, 0), (255, 255, 0)]
+        with tempfile.TemporaryDirectory() as tmp:
+            for profile, name in (('gif', 'a.gif'), ('webp', 'a.webp')):
+                path = os.path.join(tmp, name)
+                frames = iter([(Image.new('RGB', (60, 40), color), 100 * (i + 1))
+                               for i, color in enumerate(colors)])
+                self.processor.save_animation(frames, 3, path, profile, loop=0)
+                with Image.open(path) as saved:
+                    self.assertEqual((saved.n_frames, saved.info['loop']), (3, 0))
+                    for i, color in enumerate(colors):
+                        saved.seek(i)
+                        # WebP legge la durata al caricamento del fotogramma
+                        pixel = saved.convert('RGB').getpixel((30, 20))
+                        self.assertEqual(saved.info['duration'], 100 * (i + 1))
+                        self.assertTrue(all(abs(a - b) <= 4 for a, b in zip(pixel, color)))
+    
+    def test_palette_covers(self):
+        palette = Image.new('RGB', (10, 10), (0, 0, 255)).quantize(256)
+        self.assertTrue(self.processor.palette_covers(palette, Image.new('RGB', (100, 100), (0, 0, 250))))
+        self.assertFalse(self.processor.palette_covers(palette, Image.new('RGB', (100, 100), (0, 255, 0))))
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,42 @@
+import unittest
+from utils.logo_cache import LogoCache
+from PIL import Image
+
+class TestLogoCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.cache = LogoCache(maxsize=2)
+        self.logo = Image.new('RGBA', (100, 50), (255, 0, 0, 255))
+    
+    def test_same_size_is_a_hit(self):
+        first = self.cache.get_resized(self.logo, (1920, 1080), 10, 'a')
+        second = self.cache.get_resized(self.logo, (1920, 1200), 10, 'a')
+        self.assertIs(first, second)
+        self.assertEqual(first.size, (192, 96))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+    
+    def test_fingerprint_is_part_of_key(self):
+        self.cache.get_resized(self.logo, (1920, 1080), 10, 'a')
+        self.cache.get_resized(self.logo, (1920, 1080), 10, 'b')
+        self.assertEqual(self.cache.misses, 2)
+    
+    def test_without_fingerprint_logos_are_not_shared(self):
+        other = Image.new('RGBA', (100, 50), (0, 0, 255, 255))
+        first = self.cache.get_resized(self.logo, (1920, 1080), 10)
+        second = self.cache.get_resized(other, (1920, 1080), 10)
+        self.assertEqual(first.getpixel((0, 0)), (255, 0, 0, 255))
+        self.assertEqual(second.getpixel((0, 0)), (0, 0, 255, 255))
+        self.assertIs(self.cache.get_resized(self.logo, (1920, 1080), 10), first)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+    
+    def test_lru_eviction(self):
+        self.cache.get_resized(self.logo, (1000, 500), 10, 'a')
+        self.cache.get_resized(self.logo, (2000, 500), 10, 'a')
+        self.cache.get_resized(self.logo, (1000, 500), 10, 'a')
+        self.cache.get_resized(self.logo, (3000, 500), 10, 'a')
+        self.assertEqual(len(self.cache), 2)
+        self.cache.get_resized(self.logo, (1000, 500), 10, 'a')
+        self.assertEqual(self.cache.hits, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import utils.image_processor
+from utils.memory_budget import MemoryBudget
+from utils.image_processor import ImageProcessor
+from utils.batch_processor import BatchProcessor
+from utils.pipeline import PipelineProcessor
+from PIL import Image
+
+class TestMemoryBudget(unittest.TestCase):
+    
+    def test_estimate_from_header(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            rgb = os.path.join(tmp, 'a.jpg')
+            rgba = os.path.join(tmp, 'b.png')
+            Image.new('RGB', (100, 50)).save(rgb)
+            Image.new('RGBA', (100, 50)).save(rgba)
+            with Image.open(rgb) as img:
+                self.assertEqual(ImageProcessor.estimate_memory(img), 100 * 50 * 4)
+            with Image.open(rgba) as img:
+                # Immagine decodificata più la copia RGB
+                self.assertEqual(ImageProcessor.estimate_memory(img), 100 * 50 * 8)
+    
+    def test_reserve_waits_for_release(self):
+        budget = MemoryBudget(1)
+        half = budget.limit // 2 + 1
+        budget.acquire(half)
+        acquired = threading.Event()
+        
+        def second():
+            with budget.reserve(half):
+                acquired.set()
+        
+        thread = threading.Thread(target=second)
+        thread.start()
+        time.sleep(0.05)
+        self.assertFalse(acquired.is_set())
+        budget.release(half)
+        thread.join(1)
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(budget.used, 0)
+    
+    def test_oversized_job_runs_alone(self):
+        budget = MemoryBudget(1, shared=True)
+        with budget.reserve(10 * budget.limit) as reserved:
+            self.assertEqual(reserved, budget.limit)
+        self.assertEqual(budget.used, 0)
+    
+    def test_batch_with_small_budget(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'src')
+            os.makedirs(source)
+            for i in range(4):
+                Image.new('RGB', (300, 200), (i * 40, 0, 0)).save(os.path.join(source, f'{i}.jpg'))
+            logo_file = os.path.join(tmp, 'logo.png')
+            Image.new('RGBA', (30, 30), (255, 0, 0, 255)).save(logo_file)
+            files = ImageProcessor.get_image_files(source, ('.jpg',))
+            settings = {'source_folder': source, 'logo_file': logo_file}
+            pool = BatchProcessor(dict(settings, dest_folder=os.path.join(tmp, 'pool')),
+                                  workers=2, memory_budget_mb=0.2)
+            pipeline = PipelineProcessor(dict(settings, dest_folder=os.path.join(tmp, 'pipe')),
+                                         memory_budget_mb=0.2)
+            self.assertEqual(pool.run(files), (4, []))
+            self.assertEqual(pipeline.run(files), (4, []))
+            self.assertEqual(pipeline._memory_budget.used, 0)
+    
+    def test_large_png_and_bmp_processed_in_strips(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'src')
+            os.makedirs(source)
+            noise = Image.effect_noise((300, 200), 60)
+            Image.merge('RGB', (noise, noise.rotate(90), noise.transpose(Image.Transpose.FLIP_TOP_BOTTOM))
+                        ).save(os.path.join(source, 'rgb.png'))
+            noise.convert('RGB').quantize(32).save(os.path.join(source, 'palette.png'), transparency=3)
+            noise.convert('RGBA').save(os.path.join(source, 'rgba.bmp'))
+            logo_file = os.path.join(tmp, 'logo.png')
+            Image.new('RGBA', (30, 30), (255, 0, 0, 128)).save(logo_file)
+            files = ImageProcessor.get_image_files(source, ('.png', '.bmp'))
+            settings = {'source_folder': source, 'logo_file': logo_file,
+                        'output_profile': 'png', 'fixed_position': 'center'}
+            full = BatchProcessor(dict(settings, dest_folder=os.path.join(tmp, 'full')), workers=1)
+            self.assertEqual(full.run(files), (3, []))
+            
+            # Fasce di poche righe e nessuna decodifica dell'immagine intera
+            with mock.patch.object(utils.image_processor, 'STRIP_MIN_PIXELS', 0), \
+                    mock.patch.object(utils.image_processor, 'STRIP_MAX_BYTES', 300 * 4 * 7), \
+                    mock.patch.object(ImageProcessor, 'decode_image', side_effect=AssertionError):
+                strips = BatchProcessor(dict(settings, dest_folder=os.path.join(tmp, 'strips')),
+                                        workers=1, memory_budget_mb=0.1)
+                pipeline = PipelineProcessor(dict(settings, dest_folder=os.path.join(tmp, 'pipe')),
+                                             memory_budget_mb=0.1)
+                self.assertEqual(strips.run(files), (3, []))
+                self.assertEqual(pipeline.run(files), (3, []))
+                self.assertEqual(pipeline._memory_budget.used, 0)
+            
+            for name in ('rgb.png', 'palette.png', 'rgba.png'):
+                with Image.open(os.path.join(tmp, 'full', name)) as expected:
+                    for folder in ('strips', 'pipe'):
+                        with Image.open(os.path.join(tmp, folder, name)) as result:
+                            self.assertEqual(result.tobytes(), expected.tobytes())
+                            self.assertEqual(result.info.get('transparency'),
+                                             expected.info.get('transparency'))
+    
+    def test_strip_estimate_covers_one_strip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'a.png')
+            Image.new('RGB', (100, 50)).save(path)
+            with Image.open(path) as img:
+                self.assertEqual(ImageProcessor.estimate_memory(img, rows=10), 100 * 10 * 4)
+                with mock.patch.object(utils.image_processor, 'STRIP_MIN_PIXELS', 0):
+                    variants = [{'output_profile': 'png', 'max_size': 0, 'position_type': 'top_left'}]
+                    self.assertTrue(ImageProcessor.can_stream(img, variants))
+                    # JPEG, riduzione e posizione automatica richiedono l'immagine intera
+                    for change in ({'output_profile': 'jpeg'}, {'max_size': 50},
+                                   {'position_type': 'auto'}):
+                        self.assertFalse(ImageProcessor.can_stream(img, [dict(variants[0], **change)]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from utils.pipeline import PipelineProcessor
+from PIL import Image
+
+class TestPipelineProcessor(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, 'dest')
+        self.logo_file = os.path.join(self.tmp.name, 'logo.png')
+        Image.new('RGBA', (50, 50), (255, 0, 0, 255)).save(self.logo_file)
+        self.image_files = []
+        for i in range(10):
+            path = os.path.join(self.tmp.name, f'img_{i}.png')
+            Image.new('RGB', (400 + i * 10, 300), (0, 0, 255)).save(path)
+            self.image_files.append(path)
+        self.settings = {
+            'logo_file': self.logo_file,
+            'dest_folder': self.dest,
+            'margin_percent': 0
+        }
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_run_processes_all_images(self):
+        pipeline = PipelineProcessor(self.settings, queue_size=2)
+        processed, errors = pipeline.run(iter(self.image_files))
+        self.assertEqual(processed, 10)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(os.listdir(self.dest)), 10)
+        out = Image.open(os.path.join(self.dest, 'img_3.jpg'))
+        self.assertEqual(out.size, (430, 300))
+        self.assertGreater(out.getpixel((2, 2))[0], 200)
+    
+    def test_errors_do_not_stop_pipeline(self):
+        missing = os.path.join(self.tmp.name, 'missing.jpg')
+        pipeline = PipelineProcessor(self.settings, threads={'reader': 1, 'writer': 3})
+        processed, errors = pipeline.run([missing] + self.image_files)
+        self.assertEqual(processed, 10)
+        self.assertEqual([path for path, _ in errors], [missing])
+    
+    def test_animated_gif_keeps_animation(self):
+        animated = os.path.join(self.tmp.name, 'anim.gif')
+        frames = [Image.new('RGB', (400, 300), color) for color in [(0, 0, 255), (0, 255, 0)]]
+        frames[0].save(animated, save_all=True, append_images=frames[1:], duration=80)
+        pipeline = PipelineProcessor(dict(self.settings, output_profile='webp'))
+        processed, errors = pipeline.run([animated] + self.image_files[:2])
+        self.assertEqual((processed, errors), (3, []))
+        with Image.open(os.path.join(self.dest, 'anim.webp')) as out:
+            self.assertEqual(out.n_frames, 2)
+            out.seek(1)
+            self.assertGreater(out.convert('RGB').getpixel((300, 200))[1], 200)
+
+if __name__ == '__main__':
+    unittest.main()
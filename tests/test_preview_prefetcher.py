@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+from utils.preview_prefetcher import PreviewPrefetcher
+from PIL import Image
+
+class TestPreviewPrefetcher(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.image_files = []
+        for i, size in enumerate([(3000, 2000), (2000, 3000), (800, 600)]):
+            path = os.path.join(self.tmp.name, f'img_{i}.jpg')
+            Image.new('RGB', size, (0, 0, 255)).save(path)
+            self.image_files.append(path)
+        self.logo = Image.new('RGBA', (100, 100), (255, 0, 0, 255))
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_get_returns_preview_and_original_size(self):
+        prefetcher = PreviewPrefetcher(self.image_files, self.logo, 10, depth=2)
+        try:
+            preview, original_size, preview_logo = prefetcher.get(0)
+            self.assertEqual(original_size, (3000, 2000))
+            self.assertEqual(preview.size, (1000, 667))
+            self.assertEqual(preview_logo.width, 100)
+            # Le immagini successive sono già in preparazione
+            self.assertIn(1, prefetcher._futures)
+            self.assertIn(2, prefetcher._futures)
+            _, original_size, _ = prefetcher.get(1)
+            self.assertEqual(original_size, (2000, 3000))
+        finally:
+            prefetcher.shutdown()
+    
+    def test_depth_limited_by_memory(self):
+        prefetcher = PreviewPrefetcher(self.image_files, self.logo, 10, depth=10, max_memory_mb=4)
+        self.assertEqual(prefetcher.depth, 1)
+        prefetcher.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
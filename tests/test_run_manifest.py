@@ -0,0 +1,92 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+from utils.batch_processor import BatchProcessor
+from utils.image_processor import ImageProcessor
+from utils.run_manifest import RunManifest
+from PIL import Image
+
+class TestRunManifest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, 'dest')
+        self.logo_file = os.path.join(self.tmp.name, 'logo.png')
+        Image.new('RGBA', (50, 50), (255, 0, 0, 255)).save(self.logo_file)
+        self.image_files = []
+        for i in range(3):
+            path = os.path.join(self.tmp.name, f'img_{i}.png')
+            Image.new('RGB', (400, 300), (0, 0, 255)).save(path)
+            self.image_files.append(path)
+        self.settings = {'logo_file': self.logo_file, 'dest_folder': self.dest}
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def run_batch(self, settings=None):
+        settings = settings or self.settings
+        manifest = RunManifest(self.dest, settings)
+        processed, errors = BatchProcessor(settings, workers=1).run(
+            self.image_files, manifest=manifest
+        )
+        return processed, manifest.skipped
+    
+    def test_rerun_skips_up_to_date_images(self):
+        self.assertEqual(self.run_batch(), (3, 0))
+        self.assertEqual(self.run_batch(), (0, 3))
+    
+    def test_changed_source_is_reprocessed(self):
+        self.run_batch()
+        Image.new('RGB', (400, 300), (0, 255, 0)).save(self.image_files[1])
+        self.assertEqual(self.run_batch(), (1, 2))
+    
+    def test_touched_source_with_same_content_is_skipped(self):
+        self.run_batch()
+        future = time.time() + 10
+        os.utime(self.image_files[0], (future, future))
+        self.assertEqual(self.run_batch(), (0, 3))
+    
+    def test_changed_settings_or_missing_output_reprocess(self):
+        self.run_batch()
+        os.remove(os.path.join(self.dest, 'img_2.jpg'))
+        self.assertEqual(self.run_batch(), (1, 2))
+        settings = dict(self.settings, logo_size_percent=20)
+        self.assertEqual(self.run_batch(settings), (3, 0))
+    
+    def test_missing_variant_output_reprocess(self):
+        settings = dict(self.settings, variants=[
+            {'name': 'web', 'max_size': 200},
+            {'name': 'stampa'}
+        ])
+        self.assertEqual(self.run_batch(settings), (3, 0))
+        os.remove(os.path.join(self.dest, 'stampa', 'img_1.jpg'))
+        self.assertEqual(self.run_batch(settings), (1, 2))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, 'stampa', 'img_1.jpg')))
+    
+    def test_source_changed_during_processing_is_not_recorded(self):
+        process_variants = ImageProcessor.process_variants
+        
+        def change_source(img_path, *args, **kwargs):
+            process_variants(img_path, *args, **kwargs)
+            if img_path == self.image_files[1]:
+                Image.new('RGB', (400, 300), (0, 255, 0)).save(img_path)
+                os.utime(img_path, (1, 1))
+        
+        with mock.patch.object(ImageProcessor, 'process_variants', side_effect=change_source):
+            self.assertEqual(self.run_batch(), (3, 0))
+        self.assertEqual(self.run_batch(), (1, 2))
+        out = Image.open(os.path.join(self.dest, 'img_1.jpg'))
+        self.assertGreater(out.getpixel((200, 150))[1], 200)
+    
+    def test_truncated_journal_line_is_ignored(self):
+        self.run_batch()
+        with open(os.path.join(self.dest, '.logo_applier_manifest.jsonl'), 'a') as f:
+            f.write('{"source": "troncat')
+        self.assertEqual(self.run_batch(), (0, 3))
+        manifest = RunManifest(self.dest, self.settings)
+        self.assertEqual(len(manifest.entries), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+from config import SETTINGS_ENV_VAR
+from utils.settings_manager import SettingsManager
+
+
+def _save_preset_worker(path, index):
+    os.environ[SETTINGS_ENV_VAR] = path
+    SettingsManager.invalidate()
+    for round_idx in range(5):
+        assert SettingsManager.save_preset(f"cliente{index}", {"logo_size_percent": round_idx})
+
+
+class TestSettingsManager(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'conf', 'settings.json')
+        self.env = mock.patch.dict(os.environ, {SETTINGS_ENV_VAR: self.path})
+        self.env.start()
+        SettingsManager.invalidate()
+    
+    def tearDown(self):
+        self.env.stop()
+        SettingsManager.invalidate()
+        self.tmp.cleanup()
+    
+    def test_save_and_load_are_cached_until_file_changes(self):
+        self.assertEqual(SettingsManager.load_settings(), {})
+        self.assertTrue(SettingsManager.save_settings({"bg_color": "Bianco", "variants": []}))
+        self.assertEqual(SettingsManager.get_setting("bg_color"), "Bianco")
+        
+        with mock.patch("builtins.open", side_effect=AssertionError("file riletto")):
+            self.assertEqual(SettingsManager.get_setting("bg_color"), "Bianco")
+        
+        # I valori restituiti sono copie
+        SettingsManager.load_settings()["variants"].append("x")
+        self.assertEqual(SettingsManager.get_setting("variants"), [])
+        
+        # Modifica esterna: il file viene riletto
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"bg_color": "Giallo", "extra": "valore più lungo"}, f)
+        self.assertEqual(SettingsManager.get_setting("bg_color"), "Giallo")
+        self.assertEqual([name for name in os.listdir(os.path.dirname(self.path))
+                          if name.endswith(".tmp")], [])
+    
+    def test_presets(self):
+        SettingsManager.save_settings({"bg_color": "Bianco", "logo_size_percent": 10})
+        self.assertTrue(SettingsManager.save_preset("marchio", {"logo_size_percent": 20}))
+        SettingsManager.save_settings({"bg_color": "Rosso", "logo_size_percent": 5})
+        
+        self.assertEqual(SettingsManager.list_presets(), ["marchio"])
+        self.assertNotIn("presets", SettingsManager.load_settings())
+        self.assertEqual(SettingsManager.load_preset("marchio"),
+                         {"bg_color": "Rosso", "logo_size_percent": 20})
+        with self.assertRaises(ValueError):
+            SettingsManager.load_preset("sconosciuto")
+        
+        self.assertTrue(SettingsManager.delete_preset("marchio"))
+        self.assertFalse(SettingsManager.delete_preset("marchio"))
+        self.assertEqual(SettingsManager.list_presets(), [])
+    
+    def test_save_repairs_corrupt_file_and_keeps_mode(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as f:
+            f.write("{bad")
+        os.chmod(self.path, 0o640)
+        with mock.patch("builtins.print"):
+            self.assertTrue(SettingsManager.save_settings({"bg_color": "Bianco"}))
+        self.assertEqual(SettingsManager.get_setting("bg_color"), "Bianco")
+        with open(self.path + ".bak") as f:
+            self.assertEqual(f.read(), "{bad")
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+        
+        os.remove(self.path)
+        umask = os.umask(0o022)
+        try:
+            self.assertTrue(SettingsManager.save_preset("marchio", {"logo_size_percent": 20}))
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o644)
+    
+    def test_concurrent_processes_do_not_lose_updates(self):
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=_save_preset_worker, args=(self.path, index))
+                     for index in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+        
+        self.assertEqual(SettingsManager.list_presets(),
+                         ["cliente0", "cliente1", "cliente2", "cliente3"])
+        self.assertEqual(SettingsManager.load_preset("cliente2")["logo_size_percent"], 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import json
+import tempfile
+import unittest
+from utils.image_processor import ImageProcessor
+from utils.batch_processor import BatchProcessor
+from utils.stage_profiler import StageProfiler
+from PIL import Image
+
+class TestStageProfiler(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'src')
+        os.makedirs(self.source)
+        for i in range(3):
+            Image.new('RGB', (400, 300), (i * 50, 0, 0)).save(os.path.join(self.source, f'img{i}.jpg'))
+        self.logo_file = os.path.join(self.tmp.name, 'logo.png')
+        Image.new('RGBA', (40, 40), (255, 0, 0, 255)).save(self.logo_file)
+        ImageProcessor.profiler = StageProfiler()
+    
+    def tearDown(self):
+        ImageProcessor.profiler = None
+        self.tmp.cleanup()
+    
+    def _run(self, workers):
+        settings = {
+            'source_folder': self.source,
+            'dest_folder': os.path.join(self.tmp.name, 'dst'),
+            'logo_file': self.logo_file
+        }
+        files = ImageProcessor.get_image_files(self.source, ('.jpg',))
+        return BatchProcessor(settings, workers=workers).run(files)
+    
+    def test_records_every_stage_per_image(self):
+        processed, errors = self._run(workers=1)
+        self.assertEqual((processed, errors), (3, []))
+        records = ImageProcessor.profiler.records
+        stages = {r['stage'] for r in records}
+        self.assertTrue({'open', 'decode', 'resize_logo', 'paste', 'save'} <= stages)
+        self.assertEqual(len({r['image'] for r in records}), 3)
+        self.assertTrue(all(r['image'] is not None for r in records))
+        saved = [r for r in records if r['stage'] == 'save']
+        self.assertTrue(all(r['bytes_written'] > 0 for r in saved))
+        self.assertIn('Immagini più lente', ImageProcessor.profiler.summary())
+    
+    def test_worker_records_are_merged(self):
+        processed, errors = self._run(workers=2)
+        self.assertEqual(processed, 3)
+        saved = [r for r in ImageProcessor.profiler.records if r['stage'] == 'save']
+        self.assertEqual(len(saved), 3)
+    
+    def test_write_trace(self):
+        self._run(workers=1)
+        json_path = os.path.join(self.tmp.name, 'trace.json')
+        csv_path = os.path.join(self.tmp.name, 'trace.csv')
+        ImageProcessor.profiler.write_trace(json_path)
+        ImageProcessor.profiler.write_trace(csv_path)
+        with open(json_path) as f:
+            self.assertEqual(len(json.load(f)), len(ImageProcessor.profiler.records))
+        with open(csv_path) as f:
+            self.assertEqual(f.readline().strip(), 'image,stage,wall,cpu,bytes_read,bytes_written')
+
+if __name__ == '__main__':
+    unittest.main()
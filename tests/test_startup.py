@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestStartup(unittest.TestCase):
+    
+    def _run(self, code):
+        return subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIR,
+                              capture_output=True, text=True)
+    
+    def test_processing_core_does_not_need_tkinter(self):
+        # tkinter e ImageTk non importabili: il nucleo deve funzionare comunque
+        result = self._run(
+            "import sys\n"
+            "sys.modules['tkinter'] = None\n"
+            "sys.modules['PIL.ImageTk'] = None\n"
+            "import main, logo_applier, logo_server, utils\n"
+            "from utils import BatchProcessor\n"
+            "from utils.pipeline import PipelineProcessor\n"
+            "assert 'gui.main_window' not in sys.modules\n"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+    
+    def test_lazy_imports(self):
+        result = self._run(
+            "import sys\n"
+            "import utils.image_processor\n"
+            "print('numpy' in sys.modules, 'concurrent.futures.process' in sys.modules, "
+            "'PIL.TiffImagePlugin' in sys.modules)\n"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split(), ['False', 'False', 'False'])
+    
+    def test_server_does_not_load_batch_cli(self):
+        result = self._run(
+            "import sys\n"
+            "import logo_server\n"
+            "print(sorted(name for name in ('logo_applier', 'utils.pipeline', 'utils.work_queue',\n"
+            "                               'utils.folder_watcher', 'utils.batch_processor')\n"
+            "             if name in sys.modules))\n"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '[]')
+    
+    def test_server_keeps_pillow_pixel_limit(self):
+        # Il limite alto di pixel vale solo per CLI e GUI (allow_large_images)
+        result = self._run(
+            "from PIL import Image\n"
+            "default = Image.MAX_IMAGE_PIXELS\n"
+            "import logo_server, utils.image_processor\n"
+            "print(Image.MAX_IMAGE_PIXELS == default)\n"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), 'True')
+    
+    def test_only_supported_formats_are_opened(self):
+        result = self._run(
+            "import io, sys\n"
+            "from PIL import Image\n"
+            "from utils.image_processor import ImageProcessor, INPUT_FORMATS\n"
+            "buffer = io.BytesIO()\n"
+            "Image.new('RGB', (8, 8)).save(buffer, 'TIFF')\n"
+            "try:\n"
+            "    ImageProcessor.open_image(buffer)\n"
+            "except OSError:\n"
+            "    print('rifiutata')\n"
+            "print(sorted(INPUT_FORMATS))\n"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split('\n')[0], 'rifiutata')
+        self.assertIn("'JPEG'", result.stdout)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import http.client
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from utils.batch_processor import DEFAULT_BATCH_SETTINGS
+from utils.watermark_server import ServiceBusy, WatermarkServer, WatermarkService
+from PIL import Image
+
+class TestWatermarkServer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        logo_file = os.path.join(self.tmp.name, 'logo.png')
+        Image.new('RGBA', (20, 20), (255, 0, 0, 255)).save(logo_file)
+        settings = dict(DEFAULT_BATCH_SETTINGS, logo_file=logo_file,
+                        fixed_position='top_left', margin_percent=0, output_profile='png')
+        self.service = WatermarkService(settings, workers=1, queue_size=0)
+        self.service.preload()
+        self.server = WatermarkServer(self.service, '127.0.0.1', 0, max_body_mb=1)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        buffer = io.BytesIO()
+        Image.new('RGB', (200, 100), (0, 0, 255)).save(buffer, 'JPEG')
+        self.body = buffer.getvalue()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def _request(self, method, path, body=None):
+        conn = http.client.HTTPConnection(*self.server.server_address[:2], timeout=10)
+        try:
+            conn.request(method, path, body=body)
+            response = conn.getresponse()
+            return response.status, response.getheader('Content-Type'), response.read()
+        finally:
+            conn.close()
+
+    def test_watermark_returns_image(self):
+        status, content_type, data = self._request(
+            'POST', '/watermark?position=bottom_right&size=10', self.body)
+        self.assertEqual(status, 200)
+        self.assertEqual(content_type, 'image/png')
+        result = Image.open(io.BytesIO(data))
+        self.assertEqual(result.size, (200, 100))
+        self.assertEqual(result.getpixel((199, 99)), (255, 0, 0))
+        self.assertNotEqual(result.getpixel((0, 0)), (255, 0, 0))
+
+        status, content_type, _ = self._request('POST', '/watermark?profile=jpeg', self.body)
+        self.assertEqual((status, content_type), (200, 'image/jpeg'))
+        self.assertEqual(self.service.stats()['cache_misses'], 1)
+
+    def test_animated_upload_and_gif_profile(self):
+        buffer = io.BytesIO()
+        frames = [Image.new('RGB', (200, 100), color) for color in [(0, 0, 255), (0, 255, 0)]]
+        frames[0].save(buffer, 'GIF', save_all=True, append_images=frames[1:], duration=70)
+        for path in ('/watermark?profile=jpeg', '/watermark?profile=gif'):
+            status, content_type, data = self._request('POST', path, buffer.getvalue())
+            self.assertEqual((status, content_type), (200, 'image/gif'))
+            with Image.open(io.BytesIO(data)) as result:
+                self.assertEqual(result.n_frames, 2)
+                result.seek(1)
+                frame = result.convert('RGB')
+                self.assertEqual(frame.getpixel((0, 0)), (255, 0, 0))
+                self.assertEqual(frame.getpixel((199, 99)), (0, 255, 0))
+
+        status, content_type, data = self._request('POST', '/watermark?profile=gif', self.body)
+        self.assertEqual((status, content_type), (200, 'image/gif'))
+        self.assertEqual(Image.open(io.BytesIO(data)).format, 'GIF')
+        self.assertEqual(self.service.stats()['errors'], 0)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self._request('POST', '/watermark?position=centro', self.body)[0], 400)
+        self.assertEqual(self._request('POST', '/watermark?colore=Bianco', self.body)[0], 400)
+        self.assertEqual(self._request('POST', '/watermark', b'non un\'immagine')[0], 400)
+        self.assertEqual(self._request('POST', '/altro', self.body)[0], 404)
+
+        # Rifiutata dalla sola intestazione, senza attendere il corpo
+        conn = http.client.HTTPConnection(*self.server.server_address[:2], timeout=10)
+        try:
+            conn.putrequest('POST', '/watermark')
+            conn.putheader('Content-Length', str(2 * 1024 * 1024))
+            conn.endheaders()
+            self.assertEqual(conn.getresponse().status, 413)
+        finally:
+            conn.close()
+
+    def test_busy_service_rejects(self):
+        with self.service.admit():
+            with self.assertRaises(ServiceBusy):
+                with self.service.admit():
+                    pass
+            status, _, _ = self._request('POST', '/watermark', self.body)
+        self.assertEqual(status, 503)
+        self.assertEqual(self._request('POST', '/watermark', self.body)[0], 200)
+
+        status, _, data = self._request('GET', '/health')
+        stats = json.loads(data)
+        self.assertEqual(status, 200)
+        self.assertEqual(stats['rejected'], 2)
+        self.assertEqual(stats['processed'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from utils.batch_processor import BatchProcessor, DEFAULT_BATCH_SETTINGS
+from utils.work_queue import QueueWorker, WorkQueue
+from PIL import Image
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'source')
+        self.queue_dir = os.path.join(self.tmp.name, 'coda')
+        os.makedirs(os.path.join(self.source, 'sotto'))
+        logo_file = os.path.join(self.tmp.name, 'logo.png')
+        Image.new('RGBA', (50, 50), (255, 0, 0, 128)).save(logo_file)
+        self.image_files = []
+        for i in range(8):
+            folder = self.source if i % 2 else os.path.join(self.source, 'sotto')
+            path = os.path.join(folder, f'img_{i}.png')
+            Image.effect_noise((200 + 10 * i, 150), 30 + i).convert('RGB').save(path)
+            self.image_files.append(path)
+        self.settings = dict(DEFAULT_BATCH_SETTINGS, logo_file=logo_file,
+                             source_folder=self.source,
+                             dest_folder=os.path.join(self.tmp.name, 'coda_out'),
+                             fixed_position='bottom_right', output_profile='jpeg')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _outputs(self, folder):
+        outputs = {}
+        for root, _, files in os.walk(folder):
+            for name in files:
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    outputs[os.path.relpath(path, folder)] = f.read()
+        return outputs
+
+    def test_worker_processes_match_single_node(self):
+        single = dict(self.settings, dest_folder=os.path.join(self.tmp.name, 'singolo'))
+        BatchProcessor(single, workers=1).run(self.image_files)
+
+        queue = WorkQueue(self.queue_dir)
+        self.assertEqual(queue.submit(self.settings, self.image_files), 8)
+        env = dict(os.environ, LOGO_APPLIER_SETTINGS=os.path.join(self.tmp.name, 's.json'))
+        command = [sys.executable, '-m', 'logo_applier', '--queue-worker', self.queue_dir,
+                   '--workers', '1']
+        workers = [subprocess.Popen(command, cwd=PROJECT_DIR, env=env,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                   for _ in range(3)]
+        for worker in workers:
+            _, stderr = worker.communicate(timeout=120)
+            self.assertEqual(worker.returncode, 0, stderr)
+
+        self.assertEqual(queue.status(), {'todo': 0, 'leases': 0, 'done': 8, 'failed': 0})
+        expected = self._outputs(single['dest_folder'])
+        self.assertEqual(len(expected), 8)
+        self.assertEqual(self._outputs(self.settings['dest_folder']), expected)
+
+        # Stesse impostazioni: le immagini già elaborate non vengono riaggiunte
+        self.assertEqual(queue.submit(self.settings, self.image_files), 0)
+
+    def test_expired_lease_is_reclaimed(self):
+        queue = WorkQueue(self.queue_dir, lease_seconds=60, max_attempts=2)
+        queue.submit(self.settings, self.image_files[:1])
+        with self.assertRaises(ValueError):
+            queue.submit(dict(self.settings, logo_size_percent=20), self.image_files)
+
+        # Worker terminato: l'assegnazione non viene più rinnovata
+        crashed = WorkQueue(self.queue_dir)
+        task = crashed.claim()
+        self.assertIsNone(queue.claim())
+        self.assertEqual(queue.reclaim_expired(), 0)
+        os.utime(task['lease'], (0, 0))
+        self.assertEqual(queue.reclaim_expired(), 1)
+        self.assertEqual(queue.status()['todo'], 1)
+        self.assertFalse(crashed.complete(task))
+
+        # Seconda scadenza: l'immagine viene segnata in errore
+        task = queue.claim()
+        self.assertEqual(task['attempts'], 1)
+        os.utime(task['lease'], (0, 0))
+        queue.reclaim_expired()
+        self.assertEqual(queue.status(), {'todo': 0, 'leases': 0, 'done': 0, 'failed': 1})
+        self.assertEqual(queue.failures()[0][0], self.image_files[0])
+
+    def test_corrupt_and_abandoned_leases(self):
+        queue = WorkQueue(self.queue_dir, lease_seconds=60)
+        queue.submit(self.settings, self.image_files[:2])
+        corrupt = queue.claim()
+        with open(corrupt['lease'], 'w') as f:
+            f.write('{tronc')
+        os.utime(corrupt['lease'], (0, 0))
+
+        # Worker terminato tra la presa in carico della scadenza e la rimessa in attesa
+        crashed = WorkQueue(self.queue_dir)
+        task = crashed.claim()
+        name = os.path.basename(task['lease'])
+        owned = os.path.join(self.queue_dir, f".{name}.{crashed.worker_id}.expired")
+        os.rename(task['lease'], owned)
+        self.assertEqual(queue.reclaim_expired(), 1)
+        self.assertEqual(queue.status(), {'todo': 0, 'leases': 0, 'done': 0, 'failed': 1})
+
+        os.utime(owned, (0, 0))
+        self.assertEqual(queue.reclaim_expired(), 1)
+        self.assertEqual(queue.status(), {'todo': 1, 'leases': 0, 'done': 0, 'failed': 1})
+        self.assertFalse(os.path.exists(owned))
+        self.assertEqual(queue.claim()['attempts'], 1)
+
+    def test_queue_worker_reports_errors(self):
+        broken = os.path.join(self.source, 'rotta.jpg')
+        with open(broken, 'wb') as f:
+            f.write(b'non un jpeg')
+        queue = WorkQueue(self.queue_dir)
+        queue.submit(self.settings, self.image_files[:2] + [broken])
+        worker = QueueWorker(queue, report=lambda message: None)
+        self.assertEqual(worker.run(), (2, 1))
+        self.assertEqual([source for source, _ in queue.failures()], [broken])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,24 @@
 """
 Modulo utilità dell'applicazione
+
+Le classi vengono importate al primo accesso: importare un solo modulo
+(es. utils.image_processor) non carica anche il pool di processi.
 """
 
-from .image_processor import ImageProcessor
-from .settings_manager import SettingsManager
+import importlib
+
+# Classe esportata -> modulo che la definisce
+_EXPORTS = {
+    'ImageProcessor': 'image_processor',
+    'SettingsManager': 'settings_manager',
+    'BatchProcessor': 'batch_processor',
+}
+
+__all__ = ['ImageProcessor', 'SettingsManager', 'BatchProcessor']
+
 
-__all__ = ['ImageProcessor', 'SettingsManager']
\ No newline at end of file
+def __getattr__(name):
+    if name in _EXPORTS:
+        module = importlib.import_module(f".{_EXPORTS[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
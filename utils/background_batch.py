@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo per eseguire un batch in background comunicando tramite coda di eventi
+"""
+
+import queue
+import threading
+
+
+class BackgroundBatch:
+    """
+    Esegue BatchProcessor.run in un thread separato
+
+    Il thread non tocca l'interfaccia: pubblica gli eventi in una coda che
+    la GUI legge periodicamente (es. con root.after). Eventi:
+
+        ('progress', img_path, successo, errore o None)
+        ('done', immagini elaborate, lista di (img_path, errore), annullato)
+        ('failed', messaggio di errore)
+    """
+
+    def __init__(self, batch, image_files, positions=None):
+        """
+        Prepara l'esecuzione in background
+
+        Args:
+            batch: BatchProcessor (o PipelineProcessor) da eseguire
+            image_files: Lista di percorsi immagine
+            positions: Dizionario {img_path: (rel_x, rel_y)} (opzionale)
+        """
+        self.batch = batch
+        self.image_files = image_files
+        self.positions = positions
+        self.events = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        """Avvia il thread di elaborazione"""
+        self._thread = threading.Thread(target=self._run, name="background-batch", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            processed, errors = self.batch.run(
+                self.image_files,
+                self.positions,
+                progress_callback=self._on_progress
+            )
+            self.events.put(('done', processed, errors, self.batch.cancelled))
+        except Exception as e:
+            self.events.put(('failed', str(e)))
+
+    def _on_progress(self, img_path, success, error):
+        self.events.put(('progress', img_path, success, error))
+
+    def poll(self):
+        """
+        Restituisce gli eventi arrivati senza attendere
+
+        Returns:
+            Lista di tuple evento (vuota se non ci sono novità)
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def pause(self):
+        self.batch.pause()
+
+    def resume(self):
+        self.batch.resume()
+
+    def cancel(self):
+        self.batch.cancel()
+
+    @property
+    def paused(self):
+        return self.batch.paused
@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo per l'elaborazione batch delle immagini senza interfaccia grafica
+"""
+
+import os
+import signal
+import threading
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from PIL import Image
+
+from config import MEMORY_BUDGET_MB
+from utils.dedup_index import DedupIndex
+from utils.image_processor import ImageProcessor
+from utils.logo_cache import LogoCache
+from utils.memory_budget import MemoryBudget
+from utils.run_manifest import RunManifest
+from utils.settings_manager import DEFAULT_BATCH_SETTINGS
+from utils.stage_profiler import StageProfiler
+
+
+# Chiavi che una variante può sovrascrivere rispetto alle impostazioni del batch
+# (max_size = lato lungo massimo in pixel dell'output, 0 = nessuna riduzione)
+VARIANT_KEYS = (
+    "logo_file", "logo_size_percent", "fixed_position", "margin_percent",
+    "bg_color", "bg_shape", "output_profile", "max_output_kb", "max_size"
+)
+
+# Numero massimo di immagini in coda per ogni processo worker
+PENDING_PER_WORKER = 4
+
+# Intervallo (secondi) con cui, in pausa, si raccolgono le immagini già avviate
+CONTROL_POLL_INTERVAL = 0.1
+
+# Stato del processo worker (logo caricato una sola volta per processo)
+_worker_processor = None
+
+
+def resolve_variants(settings):
+    """
+    Espande la lista "variants" delle impostazioni
+
+    Ogni variante eredita le chiavi che non specifica dalle impostazioni
+    del batch e viene salvata nella sottocartella con il suo nome. Senza
+    varianti si ha un'unica variante, salvata direttamente nella destinazione.
+
+    Args:
+        settings: Dizionario impostazioni (chiavi di save_settings)
+
+    Returns:
+        Lista di dizionari impostazioni, uno per variante
+
+    Raises:
+        ValueError: Se una variante ha nome mancante, duplicato o chiavi non valide
+    """
+    base = {key: value for key, value in settings.items() if key != "variants"}
+    base.setdefault("max_size", 0)
+    if not settings.get("variants"):
+        return [dict(base, name=None)]
+
+    resolved = []
+    names = set()
+    for variant in settings["variants"]:
+        name = variant.get("name")
+        if (not name or name in names or name in (os.curdir, os.pardir)
+                or "/" in name or os.sep in name):
+            raise ValueError(f"Nome variante non valido o duplicato: {name!r}")
+        unknown = set(variant) - set(VARIANT_KEYS) - {"name"}
+        if unknown:
+            raise ValueError(f"Chiavi non valide nella variante '{name}': "
+                             f"{', '.join(sorted(unknown))}")
+        names.add(name)
+        resolved.append(dict(base, **variant, dest_folder=os.path.join(base["dest_folder"], name)))
+    return resolved
+
+
+def _init_worker(settings, hash_sources, profile, memory_budget, blend_backend, dedup,
+                 max_image_pixels):
+    """Inizializza il processo worker caricando il logo"""
+    global _worker_processor
+    # Ctrl+C viene gestito dal processo principale, che chiude il pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ImageProcessor.set_blend_backend(blend_backend)
+    # Stesso limite di pixel del processo principale (vedi allow_large_images)
+    ImageProcessor.allow_large_images(max_image_pixels)
+    _worker_processor = BatchProcessor(settings, workers=1)
+    _worker_processor.hash_sources = hash_sources
+    if dedup is not None:
+        # Ogni worker apre lo stesso file indice (path, hardlink, since)
+        _worker_processor.dedup = DedupIndex(*dedup)
+    # Budget condiviso da tutti i worker del batch
+    ImageProcessor.memory_budget = memory_budget
+    if profile:
+        ImageProcessor.profiler = StageProfiler()
+
+
+def _process_in_worker(img_path, rel_position):
+    """
+    Elabora un'immagine nel processo worker
+
+    Returns:
+        Tupla (risultato di process_file, pid, hit cache, miss cache,
+        output riusati, misure del profiler o None)
+    """
+    result = _worker_processor.process_file(img_path, rel_position)
+    cache = _worker_processor.logo_cache
+    dedup = _worker_processor.dedup
+    profiler = ImageProcessor.profiler
+    records = profiler.drain() if profiler is not None else None
+    return (result, os.getpid(), cache.hits, cache.misses,
+            dedup.reused if dedup is not None else 0, records)
+
+
+class BatchProcessor:
+    """
+    Classe per elaborare un batch di immagini, anche su più processi
+
+    Con la lista "variants" nelle impostazioni ogni sorgente viene decodificata
+    una sola volta e produce tutte le varianti (vedi resolve_variants).
+    """
+
+    def __init__(self, settings, workers=None, memory_budget_mb=MEMORY_BUDGET_MB):
+        """
+        Inizializza il processore batch
+
+        Args:
+            settings: Dizionario impostazioni (stesse chiavi di save_settings)
+            workers: Numero di processi worker (None = numero di CPU)
+            memory_budget_mb: Memoria massima per le immagini decodificate
+                contemporaneamente dai worker (None o 0 = nessun limite)
+        """
+        self.settings = dict(DEFAULT_BATCH_SETTINGS)
+        self.settings.update(settings)
+        self.workers = workers or os.cpu_count() or 1
+        self.memory_budget_mb = memory_budget_mb
+        # Calcola l'hash delle sorgenti durante l'elaborazione (per il manifest)
+        self.hash_sources = False
+        # DedupIndex per riusare gli output delle sorgenti duplicate (opzionale)
+        self.dedup = None
+        self._output_fingerprints = None
+        self.variants = resolve_variants(self.settings)
+        # Loghi (con sfondo) di ogni variante, caricati da load_logo
+        self.logos = None
+        self.logo = None
+        self.logo_cache = LogoCache()
+        self.fingerprints = [LogoCache.settings_fingerprint(variant) for variant in self.variants]
+        self.fingerprint = self.fingerprints[0]
+        # Contatori cache dei processi worker {pid: (hit, miss, output riusati)}
+        self._worker_cache_stats = {}
+        # Controllo da un altro thread (es. GUI): pausa e annullamento
+        self._resume = threading.Event()
+        self._resume.set()
+        self._cancelled = threading.Event()
+        # Pool di processi persistente tra più batch (vedi open_pool)
+        self._executor = None
+
+    def _new_executor(self):
+        """Crea il pool di processi worker (ognuno carica il logo una volta)"""
+        memory_budget = None
+        if self.memory_budget_mb:
+            memory_budget = MemoryBudget(self.memory_budget_mb, shared=True)
+        # Importato qui: elaborazione seriale, pipeline e servizio HTTP non lo usano
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.settings, self.hash_sources,
+                      ImageProcessor.profiler is not None, memory_budget,
+                      ImageProcessor.blend_backend,
+                      (self.dedup.path, self.dedup.hardlink, self.dedup.since)
+                      if self.dedup else None,
+                      Image.MAX_IMAGE_PIXELS)
+        )
+
+    def open_pool(self):
+        """
+        Avvia un pool di worker che resta attivo tra più chiamate a run/process
+
+        I worker mantengono logo e cache dei loghi ridimensionati (es. per
+        la modalità di sorveglianza di una cartella). hash_sources e dedup
+        vanno impostati prima, perché i worker li ricevono all'avvio.
+        """
+        if self.workers > 1 and self._executor is None:
+            self._executor = self._new_executor()
+
+    def close(self):
+        """Chiude il pool avviato con open_pool"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def pause(self):
+        """Sospende l'avvio di nuove immagini (quelle in corso terminano)"""
+        self._resume.clear()
+
+    def resume(self):
+        """Riprende l'elaborazione dopo pause()"""
+        self._resume.set()
+
+    def cancel(self):
+        """Annulla le immagini non ancora avviate (quelle in corso terminano)"""
+        self._cancelled.set()
+        self._resume.set()
+
+    @property
+    def paused(self):
+        return not self._resume.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def _wait_resume(self):
+        """Attende la fine di un'eventuale pausa; False se l'elaborazione è annullata"""
+        self._resume.wait()
+        return not self._cancelled.is_set()
+
+    def load_logo(self):
+        """
+        Carica i loghi (con sfondo) di tutte le varianti se non ancora caricati
+
+        Returns:
+            Logo della prima variante
+        """
+        if self.logos is None:
+            loaded = {}
+            logos = []
+            for variant in self.variants:
+                key = (variant["logo_file"], variant["bg_color"], variant["bg_shape"])
+                if key not in loaded:
+                    loaded[key] = ImageProcessor.load_logo(*key)
+                logos.append(loaded[key])
+            self.logos = logos
+            self.logo = logos[0]
+        return self.logo
+
+    @property
+    def cache_hits(self):
+        """Numero di loghi riusati dalla cache (tutti i processi)"""
+        return self.logo_cache.hits + sum(h for h, _, _ in self._worker_cache_stats.values())
+
+    @property
+    def cache_misses(self):
+        """Numero di ridimensionamenti effettivi del logo (tutti i processi)"""
+        return self.logo_cache.misses + sum(m for _, m, _ in self._worker_cache_stats.values())
+
+    @property
+    def dedup_reused(self):
+        """Numero di output riusati da sorgenti duplicate (tutti i processi)"""
+        reused = self.dedup.reused if self.dedup is not None else 0
+        return reused + sum(r for _, _, r in self._worker_cache_stats.values())
+
+    def output_path_for(self, img_path, variant=None, profile=None):
+        """
+        Calcola il percorso di output riproducendo le sottocartelle della sorgente
+
+        Args:
+            img_path: Percorso immagine sorgente
+            variant: Impostazioni della variante (default: la prima)
+            profile: Profilo effettivo (default: quello della variante, o
+                ANIMATED_OUTPUT_PROFILE per le animazioni)
+
+        Returns:
+            Percorso del file di output
+        """
+        variant = variant or self.variants[0]
+        if profile is None:
+            profile = ImageProcessor.output_profile_for(img_path, variant["output_profile"])
+        return ImageProcessor.get_output_path(
+            img_path,
+            variant["dest_folder"],
+            variant["source_folder"],
+            profile
+        )
+
+    def variant_jobs(self, img_path):
+        """
+        Prepara le varianti da produrre per un'immagine
+
+        Args:
+            img_path: Percorso immagine sorgente
+
+        Returns:
+            Lista di dizionari per ImageProcessor.render_variants
+        """
+        self.load_logo()
+        if self._output_fingerprints is None:
+            # Calcolata una volta: include dimensione e data dei file logo
+            self._output_fingerprints = [DedupIndex.variant_fingerprint(variant)
+                                         for variant in self.variants]
+        jobs = []
+        for variant, logo, fingerprint, output_fingerprint in zip(
+                self.variants, self.logos, self.fingerprints, self._output_fingerprints):
+            profile = ImageProcessor.output_profile_for(img_path, variant["output_profile"])
+            jobs.append({
+                'logo': logo,
+                'size_percent': variant["logo_size_percent"],
+                'position_type': variant["fixed_position"],
+                'margin_percent': variant["margin_percent"],
+                'fingerprint': fingerprint,
+                'max_size': variant["max_size"],
+                'output_path': self.output_path_for(img_path, variant, profile),
+                'output_profile': profile,
+                'max_output_bytes': variant["max_output_kb"] * 1024 or None,
+                'output_fingerprint': output_fingerprint
+            })
+        return jobs
+
+    def pending_variants(self, img_path, source_hash, rel_position=None):
+        """
+        Prepara le varianti da produrre, riusando gli output delle sorgenti duplicate
+
+        Args:
+            img_path: Percorso immagine sorgente
+            source_hash: Hash SHA-256 della sorgente (None = nessun riuso)
+            rel_position: Tupla (rel_x, rel_y) per posizionamento manuale
+
+        Returns:
+            Lista di dizionari per ImageProcessor.render_variants, senza le
+            varianti già prodotte dall'indice dei duplicati (vuota se tutte)
+        """
+        jobs = self.variant_jobs(img_path)
+        if self.dedup is None or source_hash is None:
+            return jobs
+        with ImageProcessor.profile_stage('dedup'):
+            return [job for job in jobs
+                    if not self.dedup.reuse(source_hash, job['output_fingerprint'],
+                                            rel_position, job['output_path'])]
+
+    def record_variants(self, source_hash, jobs, rel_position=None):
+        """Registra nell'indice dei duplicati gli output appena salvati"""
+        if self.dedup is None or source_hash is None:
+            return
+        for job in jobs:
+            self.dedup.record(source_hash, job['output_fingerprint'],
+                              rel_position, job['output_path'])
+
+    def process_file(self, img_path, rel_position=None):
+        """
+        Elabora una singola immagine
+
+        Args:
+            img_path: Percorso immagine sorgente
+            rel_position: Tupla (rel_x, rel_y) per posizionamento manuale
+
+        Returns:
+            Tupla (img_path, successo, messaggio di errore o None,
+            hash SHA-256 della sorgente o None, (dimensione, data di modifica)
+            della sorgente letti prima dell'elaborazione o None)
+        """
+        try:
+            with ImageProcessor.profile_image(img_path):
+                source_hash = None
+                source_stat = None
+                if self.hash_sources:
+                    # Prima di hash e decodifica: il manifest registra questi
+                    # valori solo se la sorgente non cambia durante l'elaborazione
+                    stat = os.stat(img_path)
+                    source_stat = (stat.st_size, stat.st_mtime_ns)
+                if self.hash_sources or self.dedup is not None:
+                    with ImageProcessor.profile_stage('hash'):
+                        source_hash = RunManifest.file_hash(img_path)
+                jobs = self.pending_variants(img_path, source_hash, rel_position)
+                if jobs:
+                    ImageProcessor.process_variants(
+                        img_path,
+                        jobs,
+                        rel_position=rel_position,
+                        logo_cache=self.logo_cache
+                    )
+                    self.record_variants(source_hash, jobs, rel_position)
+            return img_path, True, None, source_hash, source_stat
+        except Exception as e:
+            return img_path, False, str(e), None, None
+
+    def process(self, image_files, positions=None):
+        """
+        Elabora le immagini restituendo i risultati man mano che terminano
+
+        Con un solo worker l'elaborazione avviene nel processo corrente,
+        altrimenti le immagini vengono distribuite sui processi worker.
+        Pausa e annullamento hanno effetto entro l'immagine in corso: le
+        immagini già in coda ma non avviate vengono ritirate.
+
+        Args:
+            image_files: Iterabile di percorsi immagine
+            positions: Dizionario {img_path: (rel_x, rel_y)} (opzionale)
+
+        Yields:
+            Tupla restituita da process_file
+        """
+        positions = positions or {}
+        self.load_logo()
+
+        if self.workers <= 1:
+            for img_path in image_files:
+                if not self._wait_resume():
+                    return
+                yield self.process_file(img_path, positions.get(img_path))
+            return
+
+        def collect_worker(future):
+            result, pid, hits, misses, reused, records = future.result()
+            if records and ImageProcessor.profiler is not None:
+                ImageProcessor.profiler.extend(records)
+            # I contatori sono cumulativi, ma i risultati possono arrivare in disordine
+            old = self._worker_cache_stats.get(pid, (0, 0, 0))
+            self._worker_cache_stats[pid] = (max(hits, old[0]), max(misses, old[1]),
+                                             max(reused, old[2]))
+            return result
+
+        # Mantiene un numero limitato di immagini in coda, così anche
+        # cartelle molto grandi non occupano memoria con migliaia di future
+        max_pending = self.workers * PENDING_PER_WORKER
+        if self._executor is not None:
+            # Pool già avviato con open_pool: resta aperto dopo il batch
+            executor_context = nullcontext(self._executor)
+        else:
+            executor_context = self._new_executor()
+        with executor_context as executor:
+            source = iter(image_files)
+            # Immagini ritirate dalla coda durante una pausa (da reinviare per prime)
+            requeued = deque()
+            # Future in corso o in coda {future: img_path}, in ordine di invio
+            submitted = {}
+
+            def collect(done):
+                for future in done:
+                    del submitted[future]
+                    if not future.cancelled():
+                        yield collect_worker(future)
+
+            while not self.cancelled:
+                if self.paused:
+                    # Ritira le immagini non ancora avviate e raccoglie quelle in corso
+                    withdrawn = [img_path for future, img_path in list(submitted.items())
+                                 if future.cancel()]
+                    yield from collect([f for f in list(submitted) if f.cancelled()])
+                    requeued.extendleft(reversed(withdrawn))
+                    while self.paused and submitted:
+                        done, _ = wait(submitted, timeout=CONTROL_POLL_INTERVAL,
+                                       return_when=FIRST_COMPLETED)
+                        yield from collect(done)
+                    if not self._wait_resume():
+                        break
+
+                if len(submitted) >= max_pending:
+                    done, _ = wait(submitted, return_when=FIRST_COMPLETED)
+                    yield from collect(done)
+                    continue
+
+                img_path = requeued.popleft() if requeued else next(source, None)
+                if img_path is None:
+                    break
+                future = executor.submit(_process_in_worker, img_path, positions.get(img_path))
+                submitted[future] = img_path
+
+            if self.cancelled:
+                for future in submitted:
+                    future.cancel()
+            yield from collect(wait(submitted).done)
+
+    def run(self, image_files, positions=None, progress_callback=None, manifest=None):
+        """
+        Elabora tutte le immagini e raccoglie i risultati
+
+        Args:
+            image_files: Iterabile di percorsi immagine
+            positions: Dizionario {img_path: (rel_x, rel_y)} per le immagini
+                posizionate manualmente (opzionale)
+            progress_callback: Funzione chiamata con (img_path, successo, errore)
+                al termine di ogni immagine (opzionale)
+            manifest: RunManifest per saltare le immagini già aggiornate e
+                registrare quelle elaborate (opzionale)
+
+        Returns:
+            Tupla (numero immagini elaborate, lista di (img_path, errore))
+        """
+        positions = positions or {}
+        os.makedirs(self.settings["dest_folder"], exist_ok=True)
+
+        # Carica il logo subito per segnalare errori prima di avviare i worker
+        self.load_logo()
+
+        if manifest is not None:
+            image_files = manifest.pending(image_files, positions)
+            self.hash_sources = True
+
+        processed = 0
+        errors = []
+        try:
+            for img_path, success, error, source_hash, source_stat in self.process(
+                    image_files, positions):
+                if success:
+                    processed += 1
+                    if manifest is not None:
+                        manifest.record(
+                            img_path,
+                            positions.get(img_path),
+                            source_hash,
+                            [self.output_path_for(img_path, variant)
+                             for variant in self.variants],
+                            source_stat
+                        )
+                else:
+                    errors.append((img_path, error))
+                if progress_callback:
+                    progress_callback(img_path, success, error)
+        finally:
+            if manifest is not None:
+                manifest.close()
+
+        return processed, errors
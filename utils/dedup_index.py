@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo per il riuso degli output di immagini sorgente duplicate
+"""
+
+import json
+import os
+import shutil
+import threading
+
+from config import DEDUP_HARDLINK
+from utils.run_manifest import RunManifest
+from utils.settings_manager import SettingsManager
+
+
+class DedupIndex:
+    """
+    Indice persistente hash del contenuto sorgente -> output già prodotto
+
+    Una stessa foto presente più volte (con nomi diversi o caricata di nuovo)
+    viene elaborata una sola volta: per le copie successive con le stesse
+    impostazioni l'output esistente viene collegato con un hardlink (o
+    copiato se il collegamento non è possibile) invece di decodificare,
+    comporre e codificare di nuovo l'immagine.
+
+    L'indice è un file JSON con una riga per output, aggiunta in coda subito
+    dopo il salvataggio; più processi (worker o batch diversi) possono
+    condividere lo stesso file e ognuno rilegge solo le righe nuove. Due
+    copie elaborate nello stesso istante da worker diversi vengono entrambe
+    elaborate: si perde solo il risparmio, non la correttezza.
+    """
+
+    def __init__(self, path, hardlink=DEDUP_HARDLINK, since=None):
+        """
+        Carica l'indice
+
+        Args:
+            path: Percorso del file indice (creato alla prima registrazione)
+            hardlink: Riusa gli output con hardlink (False = copia sempre)
+            since: Posizione nel file da cui leggere le righe (vedi
+                end_offset); None = tutto l'indice
+        """
+        self.path = os.path.abspath(path)
+        self.hardlink = hardlink
+        self.since = since
+        self.entries = {}
+        # Output riusati da questo processo
+        self.reused = 0
+        # Byte del file già letti e inode del file letto
+        self._offset = 0
+        self._inode = None
+        if since is not None:
+            try:
+                self._inode = os.stat(self.path).st_ino
+                self._offset = since
+            except FileNotFoundError:
+                pass
+        self._lock = threading.Lock()
+        self.refresh()
+
+    @staticmethod
+    def end_offset(path):
+        """
+        Posizione attuale della fine del file indice
+
+        Passata come since (es. con --force) fa riusare solo gli output
+        registrati da quel momento, cioè prodotti dall'esecuzione corrente.
+
+        Args:
+            path: Percorso del file indice
+
+        Returns:
+            Dimensione del file in byte (0 se non esiste)
+        """
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def variant_fingerprint(variant):
+        """
+        Calcola l'impronta delle impostazioni che determinano l'output di una variante
+
+        Args:
+            variant: Impostazioni della variante (vedi resolve_variants)
+
+        Returns:
+            Stringa esadecimale (include dimensione e data dei file logo)
+        """
+        return SettingsManager.fingerprint({
+            "settings": RunManifest.settings_fingerprint(variant),
+            "max_size": variant.get("max_size", 0)
+        })
+
+    @staticmethod
+    def _key(source_hash, fingerprint, rel_position):
+        return SettingsManager.fingerprint({
+            "sha256": source_hash,
+            "settings": fingerprint,
+            "position": list(rel_position) if rel_position else None
+        })
+
+    def refresh(self):
+        """Legge le righe aggiunte al file (anche da altri processi) dall'ultima lettura"""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                # File sostituito o troncato: viene riletto da capo
+                self.entries.clear()
+                self._offset = 0
+                self._inode = stat.st_ino
+            if stat.st_size == self._offset:
+                return
+            try:
+                with open(self.path, "rb") as f:
+                    f.seek(self._offset)
+                    data = f.read()
+            except OSError as e:
+                print(f"Errore nella lettura dell'indice duplicati: {e}")
+                return
+            # Un'eventuale riga scritta a metà viene letta alla prossima volta
+            complete = data.rfind(b"\n") + 1
+            self._offset += complete
+            for line in data[:complete].splitlines():
+                try:
+                    entry = json.loads(line)
+                    self.entries[entry["key"]] = entry
+                except (ValueError, KeyError, TypeError):
+                    # Riga troncata da un'interruzione: viene ignorata
+                    continue
+
+    def lookup(self, source_hash, fingerprint, rel_position=None):
+        """
+        Cerca un output già prodotto dalla stessa sorgente con le stesse impostazioni
+
+        Args:
+            source_hash: Hash SHA-256 del file sorgente
+            fingerprint: Impronta della variante (vedi variant_fingerprint)
+            rel_position: Posizione relativa manuale (opzionale)
+
+        Returns:
+            Percorso dell'output o None se assente, cancellato o sovrascritto
+        """
+        self.refresh()
+        with self._lock:
+            entry = self.entries.get(self._key(source_hash, fingerprint, rel_position))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(entry["output"])
+        except OSError:
+            return None
+        if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+            return None
+        return entry["output"]
+
+    def reuse(self, source_hash, fingerprint, rel_position, output_path):
+        """
+        Produce l'output collegando o copiando quello di una sorgente identica
+
+        Args:
+            source_hash: Hash SHA-256 del file sorgente
+            fingerprint: Impronta della variante (vedi variant_fingerprint)
+            rel_position: Posizione relativa manuale (opzionale)
+            output_path: Percorso dell'output da produrre
+
+        Returns:
+            True se l'output è stato riusato, False se va elaborato
+        """
+        existing = self.lookup(source_hash, fingerprint, rel_position)
+        if existing is None:
+            return False
+        output_path = os.path.abspath(output_path)
+        if existing != output_path:
+            output_dir = os.path.dirname(output_path)
+            os.makedirs(output_dir, exist_ok=True)
+            # Nome temporaneo e rinomina: l'output non è mai visibile a metà
+            tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                try:
+                    if not self.hardlink:
+                        raise OSError("hardlink disattivati")
+                    os.link(existing, tmp_path)
+                except OSError:
+                    # Filesystem diversi o senza hardlink
+                    shutil.copyfile(existing, tmp_path)
+                os.replace(tmp_path, output_path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return False
+        with self._lock:
+            self.reused += 1
+        return True
+
+    def record(self, source_hash, fingerprint, rel_position, output_path):
+        """
+        Registra un output appena salvato
+
+        Args:
+            source_hash: Hash SHA-256 del file sorgente
+            fingerprint: Impronta della variante (vedi variant_fingerprint)
+            rel_position: Posizione relativa manuale (opzionale)
+            output_path: Percorso dell'output salvato
+        """
+        output_path = os.path.abspath(output_path)
+        stat = os.stat(output_path)
+        entry = {
+            "key": self._key(source_hash, fingerprint, rel_position),
+            "output": output_path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns
+        }
+        line = (json.dumps(entry) + "\n").encode("utf-8")
+        index_dir = os.path.dirname(self.path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        # Una sola write in modalità append: le righe di più processi non si mescolano
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        with self._lock:
+            self.entries[entry["key"]] = entry
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo per la sorveglianza di una cartella (elaborazione continua dei nuovi file)
+"""
+
+import os
+import threading
+import time
+
+from config import WATCH_POLL_INTERVAL, WATCH_SETTLE_SECONDS
+from utils.image_processor import ImageProcessor
+
+
+class FolderWatcher:
+    """
+    Rileva i file nuovi o modificati in una cartella tramite polling
+
+    Un file è pronto quando dimensione e data di modifica restano invariate
+    per settle_seconds: così non si elabora un file ancora in copia. Il
+    polling funziona anche sulle cartelle condivise in rete, dove le
+    notifiche del sistema operativo (inotify) non arrivano.
+    """
+
+    def __init__(self, folder, extensions, settle_seconds=WATCH_SETTLE_SECONDS,
+                 recursive=False, include=None, exclude=None):
+        """
+        Inizializza la sorveglianza
+
+        Args:
+            folder: Cartella da sorvegliare
+            extensions: Tupla di estensioni valide
+            settle_seconds: Secondi senza modifiche prima di considerare un file completo
+            recursive, include, exclude: Come ImageProcessor.iter_image_files
+        """
+        self.folder = folder
+        self.extensions = extensions
+        self.settle_seconds = settle_seconds
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        # File in attesa {percorso: {'signature', 'arrival', 'changed'}}
+        self._pending = {}
+        # Firma (dimensione, data) dei file già consegnati {percorso: firma}
+        self._done = {}
+
+    def _scan(self):
+        """Restituisce {percorso: (dimensione, data modifica)} dei file presenti"""
+        current = {}
+        for img_path in ImageProcessor.iter_image_files(
+                self.folder, self.extensions, recursive=self.recursive,
+                include=self.include, exclude=self.exclude):
+            try:
+                stat = os.stat(img_path)
+            except OSError:
+                # Eliminato o rinominato durante la scansione
+                continue
+            current[img_path] = (stat.st_size, stat.st_mtime_ns)
+        return current
+
+    def poll(self):
+        """
+        Controlla la cartella
+
+        Returns:
+            Lista dei file pronti (completi e non ancora consegnati)
+        """
+        now = time.monotonic()
+        current = self._scan()
+
+        # Dimentica i file eliminati
+        for img_path in list(self._pending):
+            if img_path not in current:
+                del self._pending[img_path]
+        for img_path in list(self._done):
+            if img_path not in current:
+                del self._done[img_path]
+
+        ready = []
+        for img_path, signature in current.items():
+            if self._done.get(img_path) == signature:
+                continue
+            entry = self._pending.get(img_path)
+            if entry is None or entry['signature'] != signature:
+                # Nuovo o ancora in scrittura: riparte l'attesa di stabilità
+                self._pending[img_path] = {
+                    'signature': signature,
+                    'arrival': entry['arrival'] if entry else now,
+                    'changed': now
+                }
+            elif signature[0] > 0 and now - entry['changed'] >= self.settle_seconds:
+                ready.append(img_path)
+        return ready
+
+    def arrival(self, img_path):
+        """Istante (time.monotonic) in cui il file è stato rilevato"""
+        entry = self._pending.get(img_path)
+        return entry['arrival'] if entry else None
+
+    def mark_done(self, img_path):
+        """Segna il file come consegnato (verrà riproposto solo se cambia)"""
+        entry = self._pending.pop(img_path, None)
+        if entry is not None:
+            self._done[img_path] = entry['signature']
+
+
+class WatchService:
+    """
+    Elabora di continuo i file che arrivano nella cartella sorgente
+
+    Usa un BatchProcessor con pool di worker sempre attivo (logo e cache
+    dei loghi ridimensionati restano in memoria tra un file e l'altro) e
+    riporta per ogni file il tempo trascorso dal rilevamento all'output.
+    """
+
+    def __init__(self, batch, watcher, manifest=None, poll_interval=WATCH_POLL_INTERVAL,
+                 report=print):
+        """
+        Args:
+            batch: BatchProcessor (o PipelineProcessor) configurato
+            watcher: FolderWatcher della cartella sorgente
+            manifest: RunManifest per saltare i file già aggiornati (opzionale)
+            poll_interval: Secondi tra due controlli della cartella
+            report: Funzione che riceve i messaggi di avanzamento
+        """
+        self.batch = batch
+        self.watcher = watcher
+        self.manifest = manifest
+        self.poll_interval = poll_interval
+        self.report = report
+        self.waits = []
+
+    def run_once(self):
+        """
+        Elabora i file pronti in questo momento
+
+        Returns:
+            Lista di (img_path, successo, errore, secondi dal rilevamento all'output)
+        """
+        ready = self.watcher.poll()
+        if not ready:
+            return []
+
+        results = []
+
+        def on_progress(img_path, success, error):
+            arrival = self.watcher.arrival(img_path)
+            waited = time.monotonic() - arrival if arrival is not None else 0.0
+            results.append((img_path, success, error, waited))
+            if success:
+                self.waits.append(waited)
+                self.report(f"{os.path.basename(img_path)}: pronto in {waited:.1f} s")
+            else:
+                self.report(f"Errore elaborazione {os.path.basename(img_path)}: {error}")
+
+        try:
+            self.batch.run(ready, progress_callback=on_progress, manifest=self.manifest)
+        finally:
+            # Anche i file in errore o già aggiornati vengono riproposti solo se cambiano
+            for img_path in ready:
+                self.watcher.mark_done(img_path)
+        return results
+
+    def run(self, stop_event=None):
+        """
+        Sorveglia la cartella finché stop_event non viene impostato (o Ctrl+C)
+
+        Args:
+            stop_event: threading.Event per fermare il servizio (opzionale)
+        """
+        stop_event = stop_event or threading.Event()
+        if self.manifest is not None:
+            # I worker del pool ricevono l'impostazione all'avvio
+            self.batch.hash_sources = True
+        self.batch.load_logo()
+        self.batch.open_pool()
+        try:
+            while not stop_event.is_set():
+                self.run_once()
+                stop_event.wait(self.poll_interval)
+        finally:
+            self.batch.close()
@@ -4,19 +4,264 @@
 Modulo per l'elaborazione delle immagini
 """
 
-from PIL import Image, ImageDraw
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+from collections import OrderedDict
+from contextlib import ExitStack, nullcontext
+import fnmatch
+import hashlib
+import importlib
+import io
 import os
-from config import OUTPUT_QUALITY, OUTPUT_FORMAT, BACKGROUND_COLORS
+import struct
+import threading
+import zlib
+from config import (
+    SUPPORTED_IMAGE_FORMATS, OUTPUT_PROFILES, OUTPUT_PROFILE, TARGET_QUALITY_RANGE, BACKGROUND_COLORS,
+    BACKGROUND_SUPERSAMPLE, BACKGROUND_CACHE_SIZE, MAX_IMAGE_PIXELS, BLEND_BACKEND,
+    AUTO_POSITION_ANALYSIS_SIZE, AUTO_POSITION_MIN_CONTRAST, ANIMATED_FORMATS,
+    ANIMATED_OUTPUT_PROFILE, ANIMATED_PALETTE_SAMPLE, ANIMATED_PALETTE_MAX_ERROR,
+    STRIP_MIN_PIXELS, STRIP_MAX_BYTES
+)
+
+# Plugin Pillow per estensione: (modulo in PIL, formato registrato)
+_PILLOW_PLUGINS = {
+    '.jpg': ('JpegImagePlugin', 'JPEG'),
+    '.jpeg': ('JpegImagePlugin', 'JPEG'),
+    '.png': ('PngImagePlugin', 'PNG'),
+    '.bmp': ('BmpImagePlugin', 'BMP'),
+    '.gif': ('GifImagePlugin', 'GIF'),
+    '.webp': ('WebPImagePlugin', 'WEBP'),
+}
+
+
+def _register_plugins(extensions):
+    """
+    Importa solo i plugin Pillow dei formati indicati
+    
+    Così Pillow non importa tutti i suoi plugin (decine di moduli) alla
+    prima immagine non riconosciuta o al primo salvataggio in un formato
+    non ancora caricato.
+    
+    Args:
+        extensions: Estensioni dei file ('.jpg', ...)
+        
+    Returns:
+        Tupla dei formati Pillow registrati (per Image.open(formats=...))
+    """
+    formats = []
+    for extension in extensions:
+        module, image_format = _PILLOW_PLUGINS[extension]
+        try:
+            importlib.import_module(f"PIL.{module}")
+        except ImportError:  # Pillow compilato senza questo formato
+            continue
+        if image_format not in formats:
+            formats.append(image_format)
+    return tuple(formats)
+
+
+# Formati accettati in lettura e plugin dei formati di output
+INPUT_FORMATS = _register_plugins(SUPPORTED_IMAGE_FORMATS)
+_register_plugins(sorted({profile['extension'] for profile in OUTPUT_PROFILES.values()}))
+
+# NumPy è opzionale e viene importato solo al primo uso (vedi _load_numpy):
+# chi non lo usa non paga il suo tempo di import all'avvio
+np = None
+_numpy_missing = False
+
+
+def _load_numpy():
+    """Importa NumPy al primo uso; restituisce None se non è installato"""
+    global np, _numpy_missing
+    if np is None and not _numpy_missing:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            _numpy_missing = True
+    return np
+
+
+# Posizioni valutate dalla posizione automatica
+AUTO_CORNERS = ('top_left', 'top_right', 'bottom_left', 'bottom_right')
+AUTO_EDGES = ('top_center', 'bottom_center', 'center_left', 'center_right')
+
+# Byte per pixel delle immagini decodificate (Pillow usa 4 byte anche per RGB)
+_PIXEL_BYTES = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2, 'I;16L': 2, 'I;16B': 2, 'I;16N': 2}
+
+# Estensioni dei formati che possono contenere un'animazione
+_ANIMATED_EXTENSIONS = ('.gif', '.png', '.webp')
+
+# Elaborazione a fasce (vedi ImageProcessor.process_strips): modi PNG a 8 bit
+# leggibili a fasce (byte per pixel)
+_PNG_STRIP_MODES = {'L': 1, 'P': 1, 'LA': 2, 'RGB': 3, 'RGBA': 4}
+
+
+class _FrameStream:
+    """
+    Fotogrammi passati uno alla volta al salvataggio animato di Pillow (WebP)
+    
+    Image.save(save_all=True) legge gli append_images con seek() e la durata
+    di ogni fotogramma subito dopo averlo codificato: la lista delle durate
+    viene riempita man mano, senza mai tenere in memoria tutti i fotogrammi.
+    """
+    
+    def __init__(self, frames, n_frames, durations):
+        self._frames = frames
+        self.n_frames = n_frames
+        self._durations = durations
+        self._frame = None
+    
+    def seek(self, index):
+        self._frame, duration = next(self._frames)
+        self._durations.append(duration)
+    
+    @property
+    def mode(self):
+        return self._frame.mode
+    
+    def getim(self):
+        return self._frame.getim()
+
+
+class _PngStripWriter:
+    """
+    PNG RGB scritto una fascia di righe alla volta
+    
+    Le righe vengono compresse appena arrivano in un unico flusso zlib,
+    senza filtri di riga: il file è un PNG standard, un po' più grande di
+    quello scritto da Pillow ma con gli stessi pixel.
+    """
+    
+    def __init__(self, fp, size, options, icc_profile=None, transparency=None):
+        self._fp = fp
+        self._compressor = zlib.compressobj(options.get('compress_level', 6))
+        fp.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', size[0], size[1], 8, 2, 0, 0, 0))
+        if icc_profile:
+            self._chunk(b'iCCP', b'ICC Profile\0\0' + zlib.compress(icc_profile))
+        if transparency is not None:
+            self._chunk(b'tRNS', struct.pack('>HHH', *transparency))
+    
+    def _chunk(self, kind, data):
+        self._fp.write(struct.pack('>I', len(data)) + kind + data
+                       + struct.pack('>I', zlib.crc32(kind + data)))
+    
+    def write(self, y, strip):
+        row = strip.width * 3
+        data = strip.tobytes()
+        # Ogni riga inizia con il tipo di filtro (0 = nessuno)
+        compressed = self._compressor.compress(b''.join(
+            b'\0' + data[start:start + row] for start in range(0, len(data), row)
+        ))
+        if compressed:
+            self._chunk(b'IDAT', compressed)
+    
+    def close(self):
+        self._chunk(b'IDAT', self._compressor.flush())
+        self._chunk(b'IEND', b'')
 
 
 class ImageProcessor:
     """Classe per gestire l'elaborazione delle immagini"""
     
+    # Cache dei loghi con sfondo: {(hash logo, colore, forma, padding): immagine}
+    _background_cache = OrderedDict()
+    _background_lock = threading.Lock()
+    
+    # Profiler opzionale delle fasi di elaborazione (vedi StageProfiler)
+    profiler = None
+    
+    # Budget opzionale della memoria di decodifica (vedi MemoryBudget)
+    memory_budget = None
+    
+    # Metodo di fusione del logo (vedi set_blend_backend)
+    blend_backend = BLEND_BACKEND
+    
+    @staticmethod
+    def allow_large_images(limit=MAX_IMAGE_PIXELS):
+        """
+        Alza il limite di pixel delle immagini accettate da Pillow
+        
+        Solo per le elaborazioni locali (CLI, GUI e i loro worker): il
+        servizio HTTP riceve immagini da altri programmi e mantiene la
+        protezione predefinita di Pillow contro le "decompression bomb".
+        
+        Args:
+            limit: Pixel oltre i quali Pillow avvisa (rifiuta oltre il doppio)
+        """
+        Image.MAX_IMAGE_PIXELS = limit
+    
+    @staticmethod
+    def set_blend_backend(backend):
+        """
+        Sceglie il metodo di fusione del logo
+        
+        Args:
+            backend: 'pillow' (Image.paste) o 'numpy' (piani premoltiplicati)
+            
+        Raises:
+            ValueError: Metodo sconosciuto o NumPy non installato
+        """
+        if backend not in ('pillow', 'numpy'):
+            raise ValueError(f"Metodo di fusione sconosciuto: {backend}")
+        if backend == 'numpy' and _load_numpy() is None:
+            raise ValueError("Il metodo di fusione 'numpy' richiede NumPy (pip install numpy)")
+        ImageProcessor.blend_backend = backend
+    
+    @staticmethod
+    def profile_stage(name, bytes_read=0):
+        """Misura una fase se il profiler è attivo (altrimenti non fa nulla)"""
+        profiler = ImageProcessor.profiler
+        if profiler is None:
+            return nullcontext()
+        return profiler.stage(name, bytes_read=bytes_read)
+    
+    @staticmethod
+    def profile_image(img_path):
+        """Attribuisce le fasi misurate all'immagine se il profiler è attivo"""
+        profiler = ImageProcessor.profiler
+        if profiler is None:
+            return nullcontext()
+        return profiler.image(img_path)
+    
+    @staticmethod
+    def estimate_memory(img, frames=1, rows=None):
+        """
+        Stima la memoria necessaria per elaborare un'immagine dalla sola intestazione
+        
+        Args:
+            img: Immagine PIL aperta ma non ancora decodificata
+            frames: Fotogrammi RGB tenuti insieme (2 per le varianti, che
+                lavorano su una copia dell'originale)
+            rows: Righe decodificate insieme (elaborazione a fasce, vedi
+                process_strips); None = l'intera immagine
+            
+        Returns:
+            Byte dell'immagine decodificata più le copie RGB
+        """
+        pixels = img.width * (img.height if rows is None else min(rows, img.height))
+        estimate = pixels * _PIXEL_BYTES.get(img.mode, 4)
+        if img.mode != 'RGB':
+            estimate += pixels * 4
+        return estimate + pixels * 4 * (frames - 1)
+    
+    @staticmethod
+    def reserve_memory(img, frames=1, rows=None):
+        """Prenota la memoria dell'immagine se il budget è attivo (altrimenti non fa nulla)"""
+        budget = ImageProcessor.memory_budget
+        if budget is None:
+            return nullcontext()
+        return budget.reserve(ImageProcessor.estimate_memory(img, frames, rows))
+    
     @staticmethod
     def create_logo_with_background(logo, bg_color, bg_shape, padding=10):
         """
         Crea un logo con sfondo colorato
         
+        La forma viene disegnata con sovracampionamento (bordi anti-alias) e il
+        risultato viene tenuto in cache, così il costo si paga una volta per batch.
+        
         Args:
             logo: Immagine PIL del logo
             bg_color: Colore esadecimale dello sfondo (es. '#FFFFFF')
@@ -29,52 +274,125 @@ class ImageProcessor:
         if bg_color is None or bg_color == 'Nessuno':
             return logo
         
+        # Il risultato dipende solo da contenuto del logo, colore, forma e padding
+        logo_hash = hashlib.sha1(
+            f"{logo.mode}{logo.size}".encode("utf-8") + logo.tobytes()
+        ).hexdigest()
+        key = (logo_hash, bg_color, bg_shape, padding)
+        
+        with ImageProcessor._background_lock:
+            cached = ImageProcessor._background_cache.get(key)
+            if cached is not None:
+                ImageProcessor._background_cache.move_to_end(key)
+                return cached.copy()
+        
         # Dimensioni del canvas
         new_width = logo.width + padding * 2
         new_height = logo.height + padding * 2
         
-        # Crea canvas trasparente
-        result = Image.new('RGBA', (new_width, new_height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(result)
-        
-        # Converti colore esadecimale in RGB
+        # Sfondo colorato con maschera della forma (bordi anti-alias)
         bg_rgb = ImageProcessor._hex_to_rgb(bg_color)
+        result = Image.new('RGBA', (new_width, new_height), bg_rgb + (0,))
+        result.putalpha(ImageProcessor._render_shape_mask(new_width, new_height, bg_shape))
+        
+        # Incolla il logo al centro
+        result.paste(logo, (padding, padding), logo if logo.mode == 'RGBA' else None)
+        
+        with ImageProcessor._background_lock:
+            ImageProcessor._background_cache[key] = result
+            while len(ImageProcessor._background_cache) > BACKGROUND_CACHE_SIZE:
+                ImageProcessor._background_cache.popitem(last=False)
+        
+        return result.copy()
+    
+    @staticmethod
+    def _render_shape_mask(width, height, bg_shape, supersample=BACKGROUND_SUPERSAMPLE):
+        """
+        Disegna la maschera della forma di sfondo con anti-aliasing
+        
+        La forma viene disegnata a risoluzione moltiplicata per supersample
+        e poi ridotta con media dei pixel, così i bordi risultano sfumati.
+        
+        Args:
+            width: Larghezza del canvas
+            height: Altezza del canvas
+            bg_shape: Forma dello sfondo ('Circolare', 'Rettangolare', 'Ovale')
+            supersample: Fattore di sovracampionamento
+            
+        Returns:
+            Immagine PIL 'L' (255 = sfondo pieno)
+        """
+        ss = max(1, int(supersample))
+        mask = Image.new('L', (width * ss, height * ss), 0)
+        draw = ImageDraw.Draw(mask)
+        
+        def scaled(box):
+            return [coord * ss for coord in box]
         
         # Disegna lo sfondo in base alla forma
         if bg_shape == 'Circolare':
             # Usa il diametro del lato più lungo per il cerchio
-            diameter = max(new_width, new_height)
-            offset_x = (diameter - new_width) // 2
-            offset_y = (diameter - new_height) // 2
-            draw.ellipse([0 - offset_x, 0 - offset_y, diameter - offset_x, diameter - offset_y], 
-                        fill=bg_rgb)
+            diameter = max(width, height)
+            offset_x = (diameter - width) // 2
+            offset_y = (diameter - height) // 2
+            draw.ellipse(scaled([0 - offset_x, 0 - offset_y, diameter - offset_x, diameter - offset_y]),
+                         fill=255)
             
         elif bg_shape == 'Ovale':
             # Ellisse "vera": allarga un po' la larghezza
-            oval_width = int(new_width)
-            oval_height = int(new_height * 0.8)
-            offset_x = (oval_width - new_width) // 2
-            offset_y = (oval_height - new_height) // 2
+            oval_width = int(width)
+            oval_height = int(height * 0.8)
+            offset_x = (oval_width - width) // 2
+            offset_y = (oval_height - height) // 2
             draw.ellipse(
-                [0 - offset_x, 0 - offset_y, oval_width - offset_x, oval_height - offset_y],
-                fill=bg_rgb
+                scaled([0 - offset_x, 0 - offset_y, oval_width - offset_x, oval_height - offset_y]),
+                fill=255
             )
-
+        
         elif bg_shape == 'Rettangolare':
             # Rettangolo allungato orizzontalmente
-            rect_width = int(new_width)
-            rect_height = int(new_height * 0.8)
-            offset_x = (rect_width - new_width) // 2
-            offset_y = (rect_height - new_height) // 2
+            rect_width = int(width)
+            rect_height = int(height * 0.8)
+            offset_x = (rect_width - width) // 2
+            offset_y = (rect_height - height) // 2
             draw.rectangle(
-                [0 - offset_x, 0 - offset_y, rect_width - offset_x, rect_height - offset_y],
-                fill=bg_rgb
+                scaled([0 - offset_x, 0 - offset_y, rect_width - offset_x, rect_height - offset_y]),
+                fill=255
             )
         
-        # Incolla il logo al centro
-        result.paste(logo, (padding, padding), logo if logo.mode == 'RGBA' else None)
+        return mask.reduce(ss) if ss > 1 else mask
+    
+    @staticmethod
+    def load_logo(logo_path, bg_color_name='Nessuno', bg_shape='Rettangolare', padding=15):
+        """
+        Carica il logo da file e applica lo sfondo se selezionato
         
-        return result
+        Args:
+            logo_path: Percorso file logo
+            bg_color_name: Nome del colore sfondo (chiave di BACKGROUND_COLORS)
+            bg_shape: Forma dello sfondo
+            padding: Padding attorno al logo (pixel)
+            
+        Returns:
+            Immagine PIL RGBA del logo (con sfondo se applicato)
+        """
+        logo = Image.open(logo_path)
+        if logo.mode != 'RGBA':
+            logo = logo.convert('RGBA')
+        else:
+            # Decodifica subito: il logo può essere condiviso tra più thread
+            logo.load()
+        
+        bg_color_value = BACKGROUND_COLORS.get(bg_color_name)
+        if bg_color_value:
+            logo = ImageProcessor.create_logo_with_background(
+                logo,
+                bg_color_value,
+                bg_shape,
+                padding=padding
+            )
+        
+        return logo
     
     @staticmethod
     def _hex_to_rgb(hex_color):
@@ -95,18 +413,40 @@ class ImageProcessor:
         Returns:
             Logo ridimensionato
         """
-        is_horizontal = target_img.width >= target_img.height
+        logo_size = ImageProcessor.calculate_logo_size(
+            logo.width, logo.height,
+            target_img.width, target_img.height,
+            size_percent
+        )
+        return logo.resize(logo_size, Image.Resampling.LANCZOS)
+    
+    @staticmethod
+    def calculate_logo_size(logo_width, logo_height, img_width, img_height, size_percent):
+        """
+        Calcola le dimensioni del logo in base all'orientamento dell'immagine
+        
+        Args:
+            logo_width: Larghezza logo originale
+            logo_height: Altezza logo originale
+            img_width: Larghezza immagine target
+            img_height: Altezza immagine target
+            size_percent: Percentuale di dimensione (5-20)
+            
+        Returns:
+            Tupla (larghezza, altezza) del logo ridimensionato
+        """
+        is_horizontal = img_width >= img_height
         
         if is_horizontal:
-            logo_width = int(target_img.width * (size_percent / 100))
-            logo_ratio = logo_width / logo.width
-            logo_height = int(logo.height * logo_ratio)
+            new_width = int(img_width * (size_percent / 100))
+            logo_ratio = new_width / logo_width
+            new_height = int(logo_height * logo_ratio)
         else:
-            logo_height = int(target_img.height * (size_percent / 100))
-            logo_ratio = logo_height / logo.height
-            logo_width = int(logo.width * logo_ratio)
+            new_height = int(img_height * (size_percent / 100))
+            logo_ratio = new_height / logo_height
+            new_width = int(logo_width * logo_ratio)
         
-        return logo.resize((logo_width, logo_height), Image.Resampling.LANCZOS)
+        return new_width, new_height
     
     @staticmethod
     def calculate_fixed_position(img_width, img_height, logo_width, logo_height, 
@@ -131,11 +471,1065 @@ class ImageProcessor:
             "top_left": (margin, margin),
             "top_right": (img_width - logo_width - margin, margin),
             "bottom_left": (margin, img_height - logo_height - margin),
-            "bottom_right": (img_width - logo_width - margin, img_height - logo_height - margin)
+            "bottom_right": (img_width - logo_width - margin, img_height - logo_height - margin),
+            # Centri dei lati (candidati della posizione automatica)
+            "top_center": ((img_width - logo_width) // 2, margin),
+            "bottom_center": ((img_width - logo_width) // 2, img_height - logo_height - margin),
+            "center_left": (margin, (img_height - logo_height) // 2),
+            "center_right": (img_width - logo_width - margin, (img_height - logo_height) // 2)
         }
         
         return positions.get(position_type, (margin, margin))
     
+    @staticmethod
+    def calculate_auto_position(img, logo_resized, margin_percent, edges=False,
+                                min_contrast=AUTO_POSITION_MIN_CONTRAST):
+        """
+        Sceglie la posizione fissa più uniforme su cui il logo resta visibile
+        
+        Le zone candidate vengono valutate su una riduzione dell'immagine
+        (un campione di pixel, senza filtri: costa meno di un millisecondo
+        anche a 50 MP). Tra le zone con contrasto di luminosità sufficiente
+        rispetto al logo si sceglie quella con meno dettagli (deviazione
+        standard minima); se nessuna ha abbastanza contrasto, quella con
+        il contrasto maggiore.
+        
+        Args:
+            img: Immagine PIL decodificata
+            logo_resized: Logo RGBA già ridimensionato
+            margin_percent: Percentuale di margine
+            edges: True per valutare anche i centri dei lati
+            min_contrast: Differenza minima di luminosità media (0-255)
+            
+        Returns:
+            Tupla (x, y) con coordinate dell'angolo in alto a sinistra
+        """
+        scale = min(1.0, AUTO_POSITION_ANALYSIS_SIZE / max(img.size))
+        small_size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        small = img.resize(small_size, Image.Resampling.NEAREST).convert('L')
+        
+        # Luminosità media del logo (pesata dall'alpha), sulla stessa riduzione
+        logo_small = logo_resized.resize(
+            (max(1, round(logo_resized.width * scale)), max(1, round(logo_resized.height * scale))),
+            Image.Resampling.NEAREST
+        )
+        logo_alpha = logo_small.getchannel('A') if logo_small.mode == 'RGBA' else None
+        logo_luma = ImageStat.Stat(logo_small.convert('L'), logo_alpha).mean[0]
+        
+        candidates = AUTO_CORNERS + (AUTO_EDGES if edges else ())
+        positions = {}
+        boxes = []
+        for name in candidates:
+            x, y = ImageProcessor.calculate_fixed_position(
+                img.width, img.height,
+                logo_resized.width, logo_resized.height,
+                name, margin_percent
+            )
+            positions[name] = (x, y)
+            # Riquadro del logo nell'immagine ridotta (almeno un pixel)
+            left = min(max(int(x * scale), 0), small.width - 1)
+            top = min(max(int(y * scale), 0), small.height - 1)
+            right = max(min(int((x + logo_resized.width) * scale + 0.999), small.width), left + 1)
+            bottom = max(min(int((y + logo_resized.height) * scale + 0.999), small.height), top + 1)
+            boxes.append((left, top, right, bottom))
+        
+        stats = ImageProcessor.window_stats(small, boxes)
+        scores = [
+            (name, abs(mean - logo_luma), stddev)
+            for name, (mean, stddev) in zip(candidates, stats)
+        ]
+        visible = [score for score in scores if score[1] >= min_contrast]
+        if visible:
+            best = min(visible, key=lambda score: score[2])
+        else:
+            best = max(scores, key=lambda score: score[1])
+        return positions[best[0]]
+    
+    @staticmethod
+    def window_stats(img, boxes):
+        """
+        Media e deviazione standard di più riquadri di un'immagine 'L'
+        
+        Con NumPy usa le tabelle delle somme cumulative (summed-area table)
+        di valori e quadrati: ogni riquadro costa quattro letture. Senza
+        NumPy ogni riquadro viene misurato con ImageStat.
+        
+        Args:
+            img: Immagine PIL 'L' (piccola)
+            boxes: Lista di (left, top, right, bottom) non vuoti
+            
+        Returns:
+            Lista di tuple (media, deviazione standard)
+        """
+        if _load_numpy() is None:
+            results = []
+            for box in boxes:
+                stat = ImageStat.Stat(img.crop(box))
+                results.append((stat.mean[0], stat.stddev[0]))
+            return results
+        
+        # Somme intere esatte: 255² per 2^32 pixel non superano int64
+        values = np.asarray(img, dtype=np.int64)
+        sums = np.zeros((img.height + 1, img.width + 1), dtype=np.int64)
+        squares = np.zeros((img.height + 1, img.width + 1), dtype=np.int64)
+        np.cumsum(values, axis=0, out=sums[1:, 1:])
+        np.cumsum(sums[1:, 1:], axis=1, out=sums[1:, 1:])
+        np.cumsum(values * values, axis=0, out=squares[1:, 1:])
+        np.cumsum(squares[1:, 1:], axis=1, out=squares[1:, 1:])
+        
+        results = []
+        for left, top, right, bottom in boxes:
+            count = (right - left) * (bottom - top)
+            total = sums[bottom, right] - sums[top, right] - sums[bottom, left] + sums[top, left]
+            total_sq = (squares[bottom, right] - squares[top, right]
+                        - squares[bottom, left] + squares[top, left])
+            mean = int(total) / count
+            variance = max(int(total_sq) / count - mean * mean, 0.0)
+            results.append((mean, variance ** 0.5))
+        return results
+    
+    @staticmethod
+    def calculate_relative_position(img_width, img_height, logo_width, logo_height, rel_position):
+        """
+        Calcola posizione del logo da coordinate relative (posizionamento manuale)
+        
+        Args:
+            img_width: Larghezza immagine
+            img_height: Altezza immagine
+            logo_width: Larghezza logo
+            logo_height: Altezza logo
+            rel_position: Tupla (rel_x, rel_y) con il centro del logo (0-1)
+            
+        Returns:
+            Tupla (x, y) con coordinate dell'angolo in alto a sinistra
+        """
+        rel_x, rel_y = rel_position
+        x = int(rel_x * img_width) - logo_width // 2
+        y = int(rel_y * img_height) - logo_height // 2
+        return x, y
+    
+    @staticmethod
+    def get_output_path(img_path, dest_folder, source_folder=None, profile=OUTPUT_PROFILE):
+        """
+        Calcola il percorso di output per un'immagine sorgente
+        
+        Args:
+            img_path: Percorso immagine sorgente
+            dest_folder: Cartella destinazione
+            source_folder: Cartella sorgente; se indicata, le sottocartelle
+                vengono riprodotte nella destinazione (opzionale)
+            profile: Profilo di codifica (determina l'estensione)
+            
+        Returns:
+            Percorso del file di output
+        """
+        extension = OUTPUT_PROFILES[profile]['extension']
+        output_name = os.path.splitext(os.path.basename(img_path))[0] + extension
+        if source_folder:
+            rel_dir = os.path.relpath(os.path.dirname(os.path.abspath(img_path)),
+                                      os.path.abspath(source_folder))
+            if rel_dir != os.curdir and not rel_dir.startswith(os.pardir):
+                return os.path.join(dest_folder, rel_dir, output_name)
+        return os.path.join(dest_folder, output_name)
+    
+    @staticmethod
+    def process_image(img_path, logo, output_path, size_percent,
+                      position_type='top_left', margin_percent=2, rel_position=None,
+                      logo_cache=None, fingerprint=None,
+                      output_profile=OUTPUT_PROFILE, max_output_bytes=None):
+        """
+        Ridimensiona, posiziona e applica il logo su un'immagine e la salva
+        
+        A differenza di apply_logo_to_image le eccezioni vengono propagate,
+        così il chiamante può riportare l'errore per ogni file. Le immagini
+        animate restano animate se il profilo è GIF o WebP.
+        
+        Args:
+            img_path: Percorso immagine sorgente
+            logo: Immagine PIL del logo (con sfondo, non ridimensionato)
+            output_path: Percorso output
+            size_percent: Percentuale di dimensione del logo
+            position_type: Tipo posizione fissa ('top_left', 'top_right', etc.
+                o 'auto' e 'auto_edges' per la zona più uniforme)
+            margin_percent: Percentuale di margine (solo posizione fissa)
+            rel_position: Tupla (rel_x, rel_y) per posizionamento manuale;
+                se presente ha la precedenza sulla posizione fissa
+            logo_cache: LogoCache per riusare i loghi già ridimensionati (opzionale)
+            fingerprint: Impronta delle impostazioni del logo, usata come chiave cache
+            output_profile: Profilo di codifica in OUTPUT_PROFILES
+            max_output_bytes: Dimensione massima del file di output (opzionale)
+        """
+        with ImageProcessor.profile_image(img_path):
+            img = ImageProcessor.open_image(img_path)
+            if (ImageProcessor.is_animated(img)
+                    and OUTPUT_PROFILES[output_profile]['format'] in ANIMATED_FORMATS):
+                with ImageProcessor.reserve_memory(img, 2):
+                    ImageProcessor.process_animation(img, [{
+                        'logo': logo,
+                        'size_percent': size_percent,
+                        'position_type': position_type,
+                        'margin_percent': margin_percent,
+                        'fingerprint': fingerprint,
+                        'max_size': 0,
+                        'output_path': output_path,
+                        'output_profile': output_profile
+                    }], rel_position, logo_cache)
+                return
+            # La memoria resta prenotata fino al salvataggio
+            with ImageProcessor.reserve_memory(img):
+                img = ImageProcessor.decode_image(img)
+                img = ImageProcessor.composite_logo(
+                    img, logo, size_percent,
+                    position_type=position_type,
+                    margin_percent=margin_percent,
+                    rel_position=rel_position,
+                    logo_cache=logo_cache,
+                    fingerprint=fingerprint
+                )
+                ImageProcessor.save_image(img, output_path, output_profile, max_output_bytes)
+    
+    @staticmethod
+    def process_variants(img_path, variants, rel_position=None, logo_cache=None):
+        """
+        Produce più versioni di un'immagine decodificandola una sola volta
+        
+        Le immagini animate vengono elaborate fotogramma per fotogramma
+        (vedi process_animation), quelle molto grandi che lo permettono a
+        fasce di righe (vedi process_strips).
+        
+        Args:
+            img_path: Percorso immagine sorgente
+            variants: Lista di dizionari variante (vedi render_variants)
+            rel_position: Tupla (rel_x, rel_y) per posizionamento manuale
+            logo_cache: LogoCache condivisa da tutte le varianti (opzionale)
+        """
+        with ImageProcessor.profile_image(img_path):
+            img = ImageProcessor.open_image(img_path)
+            if ImageProcessor.is_animated(img):
+                # Sorgente e un fotogramma alla volta
+                with ImageProcessor.reserve_memory(img, 2):
+                    ImageProcessor.process_animation(img, variants, rel_position, logo_cache)
+                return
+            frames = 2 if len(variants) > 1 else 1
+            if ImageProcessor.can_stream(img, variants, rel_position):
+                # Una fascia di righe alla volta (vedi process_strips)
+                with ImageProcessor.reserve_memory(img, frames, ImageProcessor.strip_rows(img)):
+                    ImageProcessor.process_strips(img, variants, rel_position, logo_cache)
+                return
+            with ImageProcessor.reserve_memory(img, frames):
+                img = ImageProcessor.decode_image(img)
+                for frame, variant in ImageProcessor.render_variants(
+                        img, variants, rel_position, logo_cache):
+                    ImageProcessor.save_image(
+                        frame,
+                        variant['output_path'],
+                        variant['output_profile'],
+                        variant['max_output_bytes']
+                    )
+    
+    @staticmethod
+    def render_variants(img, variants, rel_position=None, logo_cache=None):
+        """
+        Applica il logo di ogni variante su una copia (o riduzione) dell'immagine
+        
+        Le varianti ridotte vengono generate per prime dall'originale; l'ultima
+        variante a piena risoluzione riusa l'originale senza copiarlo, così
+        una sola variante non costa nessuna copia.
+        
+        Args:
+            img: Immagine PIL RGB decodificata (l'ultima variante la modifica)
+            variants: Lista di dizionari con chiavi logo, size_percent,
+                position_type, margin_percent, fingerprint, max_size
+                (lato lungo massimo in pixel, 0 = nessuna riduzione) e
+                quelle usate dal chiamante (es. output_path)
+            rel_position: Tupla (rel_x, rel_y) per posizionamento manuale
+            logo_cache: LogoCache condivisa da tutte le varianti (opzionale)
+            
+        Yields:
+            Tupla (immagine con logo, variante), una variante alla volta
+        """
+        def downscaled(variant):
+            return bool(variant['max_size']) and max(img.size) > variant['max_size']
+        
+        ordered = sorted(variants, key=lambda variant: not downscaled(variant))
+        for index, variant in enumerate(ordered):
+            if downscaled(variant):
+                frame = ImageProcessor.downscale(img, variant['max_size'])
+            elif index == len(ordered) - 1:
+                frame = img
+            else:
+                with ImageProcessor.profile_stage('copy'):
+                    frame = img.copy()
+            
+            frame = ImageProcessor.composite_logo(
+                frame, variant['logo'], variant['size_percent'],
+                position_type=variant['position_type'],
+                margin_percent=variant['margin_percent'],
+                rel_position=rel_position,
+                logo_cache=logo_cache,
+                fingerprint=variant['fingerprint']
+            )
+            yield frame, variant
+    
+    @staticmethod
+    def downscale(img, max_size):
+        """
+        Riduce l'immagine in modo che il lato lungo sia max_size
+        
+        Returns:
+            Nuova immagine PIL ridotta
+        """
+        with ImageProcessor.profile_stage('downscale'):
+            scale = max_size / max(img.size)
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    
+    @staticmethod
+    def is_animated(img):
+        """True se l'immagine aperta ha più fotogrammi (GIF, PNG o WebP animati)"""
+        return bool(getattr(img, 'is_animated', False))
+    
+    @staticmethod
+    def output_profile_for(img_path, profile):
+        """
+        Profilo di output effettivo di un'immagine sorgente
+        
+        Le animazioni restano animate: se il profilo scelto non supporta
+        l'animazione (es. JPEG) si usa ANIMATED_OUTPUT_PROFILE. Viene letta
+        solo l'intestazione dei file con estensione di un formato animabile
+        (o di qualunque oggetto file-like).
+        
+        Args:
+            img_path: Percorso immagine sorgente o oggetto file-like
+            profile: Profilo scelto in OUTPUT_PROFILES
+            
+        Returns:
+            Nome del profilo da usare
+        """
+        if OUTPUT_PROFILES[profile]['format'] in ANIMATED_FORMATS:
+            return profile
+        if (isinstance(img_path, str)
+                and os.path.splitext(img_path)[1].lower() not in _ANIMATED_EXTENSIONS):
+            return profile
+        try:
+            with Image.open(img_path, formats=INPUT_FORMATS) as img:
+                animated = ImageProcessor.is_animated(img)
+        except Exception:
+            # L'errore viene riportato all'elaborazione
+            return profile
+        return ANIMATED_OUTPUT_PROFILE if animated else profile
+    
+    @staticmethod
+    def process_animation(img, variants, rel_position=None, logo_cache=None):
+        """
+        Applica il logo a ogni fotogramma di un'animazione e la salva animata
+        
+        I fotogrammi vengono decodificati, composti e scritti uno alla volta:
+        la memoria usata è quella di un fotogramma, non dell'intera animazione.
+        Ogni variante rilegge l'animazione dal primo fotogramma.
+        
+        Args:
+            img: Immagine animata aperta con open_image
+            variants: Lista di dizionari variante (vedi render_variants) con
+                output_path e output_profile
+            rel_position: Tupla (rel_x, rel_y) per posizionamento manuale
+            logo_cache: LogoCache condivisa da tutte le varianti (opzionale)
+        """
+        img.seek(0)
+        loop = img.info.get('loop')
+        # Tavolozza del primo fotogramma (di solito quella globale della GIF,
+        # con i colori anche dei fotogrammi successivi)
+        source_palette = img.getpalette() if img.mode == 'P' else None
+        for variant in variants:
+            profile = variant['output_profile']
+            if OUTPUT_PROFILES[profile]['format'] not in ANIMATED_FORMATS:
+                profile = ANIMATED_OUTPUT_PROFILE
+            ImageProcessor.save_animation(
+                ImageProcessor.animation_frames(img, variant, rel_position, logo_cache),
+                img.n_frames,
+                variant['output_path'],
+                profile,
+                loop,
+                source_palette
+            )
+    
+    @staticmethod
+    def animation_frames(img, variant, rel_position=None, logo_cache=None):
+        """
+        Fotogrammi RGB con il logo, letti uno alla volta
+        
+        Logo ridimensionato e posizione vengono calcolati sul primo
+        fotogramma e restano gli stessi per tutta l'animazione (anche con la
+        posizione automatica il logo non si sposta).
+        
+        Args:
+            img: Immagine animata aperta con open_image
+            variant: Dizionario variante (vedi render_variants)
+            rel_position: Tupla (rel_x, rel_y) per posizionamento manuale
+            logo_cache: LogoCache per riusare il logo ridimensionato (opzionale)
+            
+        Yields:
+            Tupla (fotogramma con logo, durata in millisecondi)
+        """
+        placement = None
+        for index in range(img.n_frames):
+            with ImageProcessor.profile_stage('decode'):
+                img.seek(index)
+                img.load()
+            with ImageProcessor.profile_stage('convert'):
+                # Copia: il fotogramma sorgente fa da base per il successivo
+                frame = img.convert('RGB')
+            if variant['max_size'] and max(frame.size) > variant['max_size']:
+                frame = ImageProcessor.downscale(frame, variant['max_size'])
+            if placement is None:
+                logo_resized, planes = ImageProcessor.prepare_logo(
+                    frame.size, variant['logo'], variant['size_percent'],
+                    logo_cache, variant['fingerprint']
+                )
+                position = ImageProcessor.logo_position(
+                    frame, logo_resized, variant['position_type'],
+                    variant['margin_percent'], rel_position
+                )
+                placement = (logo_resized, position, planes)
+            ImageProcessor.blend_logo(frame, *placement)
+            yield frame, img.info.get('duration', 0)
+    
+    @staticmethod
+    def save_animation(frames, n_frames, output_path, profile=ANIMATED_OUTPUT_PROFILE, loop=None,
+                       source_palette=None):
+        """
+        Salva un'animazione GIF o WebP leggendo i fotogrammi uno alla volta
+        
+        Args:
+            frames: Iteratore di tuple (fotogramma RGB, durata in millisecondi)
+            n_frames: Numero di fotogrammi
+            output_path: Percorso output (o oggetto file-like)
+            profile: Profilo in OUTPUT_PROFILES con formato GIF o WEBP
+            loop: Ripetizioni (0 = infinite, None = una sola riproduzione)
+            source_palette: Tavolozza della sorgente come lista [r, g, b, ...]
+                (solo GIF, opzionale)
+        """
+        ImageProcessor._prepare_output(output_path)
+        settings = OUTPUT_PROFILES[profile]
+        if settings['format'] == 'GIF':
+            if isinstance(output_path, str):
+                with open(output_path, 'wb') as f:
+                    ImageProcessor._write_gif(frames, f, loop, source_palette)
+            else:
+                ImageProcessor._write_gif(frames, output_path, loop, source_palette)
+            return
+        
+        first, duration = next(frames)
+        durations = [duration]
+        first.save(
+            output_path, settings['format'],
+            save_all=True,
+            append_images=[_FrameStream(frames, n_frames - 1, durations)],
+            duration=durations,
+            loop=1 if loop is None else loop,
+            **settings['options']
+        )
+    
+    @staticmethod
+    def animation_palette(frame, source_palette=None):
+        """
+        Calcola la tavolozza fissa di un'animazione GIF
+        
+        Unisce i colori del fotogramma con il logo e quelli della
+        tavolozza sorgente (usati anche dai fotogrammi successivi). Se sono
+        al più 256 vengono mantenuti esatti, altrimenti vengono ridotti con
+        una quantizzazione in cui la tavolozza sorgente pesa quanto il
+        fotogramma.
+        
+        Args:
+            frame: Fotogramma RGB con il logo (il primo o uno non più coperto)
+            source_palette: Tavolozza della sorgente [r, g, b, ...] (opzionale)
+            
+        Returns:
+            Immagine PIL in modo P da usare come tavolozza
+        """
+        quantized = frame.quantize(256)
+        if not source_palette:
+            return quantized
+        
+        frame_palette = quantized.getpalette()
+        colors = {tuple(frame_palette[index * 3:index * 3 + 3])
+                  for _, index in quantized.getcolors(256)}
+        source_colors = list(dict.fromkeys(zip(*[iter(source_palette)] * 3)))
+        colors.update(source_colors)
+        if len(colors) <= 256:
+            palette = Image.new('P', (1, 1))
+            palette.putpalette([value for color in sorted(colors) for value in color])
+            return palette
+        
+        # Riquadri della tavolozza sorgente, in totale grandi quanto il fotogramma
+        block = max(1, int((frame.width * frame.height / len(source_colors)) ** 0.5))
+        swatch = Image.new('RGB', (len(source_colors), 1))
+        swatch.putdata(source_colors)
+        swatch = swatch.resize((len(source_colors) * block, block), Image.Resampling.NEAREST)
+        sample = Image.new('RGB', (max(frame.width, swatch.width),
+                                   frame.height + block))
+        sample.paste(frame, (0, 0))
+        sample.paste(swatch, (0, frame.height))
+        return sample.quantize(256)
+    
+    @staticmethod
+    def palette_covers(palette, frame):
+        """
+        Verifica se una tavolozza rappresenta bene i colori di un fotogramma
+        
+        Il controllo avviene su un campione ridotto del fotogramma, molto
+        più economico di una nuova quantizzazione.
+        
+        Args:
+            palette: Immagine PIL in modo P con la tavolozza
+            frame: Fotogramma RGB
+            
+        Returns:
+            True se l'errore medio è entro ANIMATED_PALETTE_MAX_ERROR
+        """
+        sample = frame.resize((ANIMATED_PALETTE_SAMPLE, ANIMATED_PALETTE_SAMPLE),
+                              Image.Resampling.NEAREST)
+        mapped = sample.quantize(palette=palette, dither=Image.Dither.NONE).convert('RGB')
+        error = ImageChops.difference(sample, mapped).convert('L')
+        return ImageStat.Stat(error).mean[0] <= ANIMATED_PALETTE_MAX_ERROR
+    
+    @staticmethod
+    def _write_gif(frames, fp, loop, source_palette=None):
+        """
+        Scrive una GIF animata un fotogramma alla volta
+        
+        La tavolozza viene calcolata sul primo fotogramma (vedi
+        animation_palette) e scritta come tavolozza globale: i fotogrammi
+        successivi vengono solo associati ai colori più vicini. Solo quando
+        un fotogramma non è più coperto (es. cambio di scena) la tavolozza
+        viene ricalcolata e scritta come tavolozza locale.
+        """
+        from PIL import GifImagePlugin
+        palette = None
+        local = False
+        for frame, duration in frames:
+            with ImageProcessor.profile_stage('save'):
+                if palette is None:
+                    palette = ImageProcessor.animation_palette(frame, source_palette)
+                    frame = frame.quantize(palette=palette, dither=Image.Dither.NONE)
+                    # Le estensioni con durata e ripetizioni richiedono GIF89a
+                    frame.info['version'] = b'89a'
+                    info = {'loop': loop} if loop is not None else {}
+                    header, _ = GifImagePlugin.getheader(frame, info=info)
+                    fp.write(b''.join(header))
+                else:
+                    if not ImageProcessor.palette_covers(palette, frame):
+                        palette = ImageProcessor.animation_palette(frame, source_palette)
+                        local = True
+                    frame = frame.quantize(palette=palette, dither=Image.Dither.NONE)
+                fp.write(b''.join(GifImagePlugin.getdata(
+                    frame, duration=duration, include_color_table=local
+                )))
+        fp.write(b';')
+    
+    @staticmethod
+    def can_stream(img, variants, rel_position=None):
+        """
+        True se l'immagine può essere elaborata a fasce di righe
+        
+        Serve un'immagine molto grande (vedi STRIP_MIN_PIXELS) letta da un
+        PNG a 8 bit non interlacciato o da un BMP non compresso, varianti
+        salvate in PNG senza riduzione e una posizione del logo che
+        non richiede di analizzare l'immagine (non automatica). JPEG e WebP
+        vengono sempre decodificati interi.
+        
+        Args:
+            img: Immagine PIL aperta con open_image (non decodificata)
+            variants: Lista di dizionari variante (vedi render_variants)
+            rel_position: Tupla (rel_x, rel_y) per posizionamento manuale
+        """
+        if img.width * img.height < STRIP_MIN_PIXELS or len(img.tile) != 1:
+            return False
+        codec, _, _, args = img.tile[0][:4]
+        if img.format == 'PNG':
+            readable = (codec == 'zip' and args == img.mode and img.mode in _PNG_STRIP_MODES
+                        and not img.info.get('interlace'))
+        elif img.format == 'BMP':
+            readable = codec == 'raw' and isinstance(args, tuple) and len(args) == 3
+        else:
+            readable = False
+        if not readable:
+            return False
+        for variant in variants:
+            if OUTPUT_PROFILES[variant['output_profile']]['format'] != 'PNG':
+                return False
+            if variant['max_size'] and max(img.size) > variant['max_size']:
+                return False
+            if rel_position is None and variant['position_type'] in ('auto', 'auto_edges'):
+                return False
+        return True
+    
+    @staticmethod
+    def strip_rows(img):
+        """Righe di una fascia: circa STRIP_MAX_BYTES di pixel decodificati"""
+        return max(1, min(img.height, STRIP_MAX_BYTES // (img.width * 4)))
+    
+    @staticmethod
+    def process_strips(img, variants, rel_position=None, logo_cache=None):
+        """
+        Applica il logo leggendo e scrivendo l'immagine a fasce di righe
+        
+        Solo la fascia corrente è in memoria: il logo viene fuso nelle fasce
+        che attraversa, le altre passano dalla sorgente all'output senza
+        modifiche. Il risultato ha gli stessi pixel dell'elaborazione
+        dell'immagine intera (vedi can_stream per le condizioni).
+        
+        Args:
+            img: Immagine PIL aperta con open_image (non decodificata)
+            variants: Lista di dizionari variante (vedi render_variants) con
+                output_path e output_profile
+            rel_position: Tupla (rel_x, rel_y) per posizionamento manuale
+            logo_cache: LogoCache condivisa da tutte le varianti (opzionale)
+        """
+        with ExitStack() as stack:
+            stack.callback(img.close)
+            targets = []
+            for variant in variants:
+                logo_resized, planes = ImageProcessor.prepare_logo(
+                    img.size, variant['logo'], variant['size_percent'],
+                    logo_cache=logo_cache, fingerprint=variant['fingerprint']
+                )
+                position = ImageProcessor.logo_position(
+                    img, logo_resized, variant['position_type'],
+                    variant['margin_percent'], rel_position
+                )
+                writer = ImageProcessor._strip_writer(img, variant, stack)
+                targets.append((logo_resized, planes, position, writer))
+            
+            for y, strip in ImageProcessor.read_strips(img, ImageProcessor.strip_rows(img)):
+                for index, (logo_resized, planes, (x, top), writer) in enumerate(targets):
+                    frame = strip
+                    top_in_strip = top - y
+                    if top_in_strip < strip.height and top_in_strip + logo_resized.height > 0:
+                        if index < len(targets) - 1:
+                            with ImageProcessor.profile_stage('copy'):
+                                frame = strip.copy()
+                        ImageProcessor.blend_logo(frame, logo_resized, (x, top_in_strip), planes)
+                    with ImageProcessor.profile_stage('save'):
+                        writer.write(y, frame)
+            
+            for target in targets:
+                with ImageProcessor.profile_stage('save'):
+                    target[3].close()
+    
+    @staticmethod
+    def _strip_writer(img, variant, stack):
+        """Apre l'output PNG di una variante per la scrittura a fasce (chiuso da stack)"""
+        output_path = variant['output_path']
+        ImageProcessor._prepare_output(output_path)
+        fp = stack.enter_context(open(output_path, 'wb')) if isinstance(output_path, str) else output_path
+        settings = OUTPUT_PROFILES[variant['output_profile']]
+        return _PngStripWriter(fp, img.size, settings['options'],
+                               img.info.get('icc_profile'), ImageProcessor._strip_transparency(img))
+    
+    @staticmethod
+    def _strip_transparency(img):
+        """Colore trasparente RGB che il salvataggio PNG di Pillow scriverebbe (o None)"""
+        if 'transparency' not in img.info or img.mode in ('LA', 'RGBA'):
+            return None
+        # Stessa conversione di decode_image, su un solo pixel
+        probe = Image.new(img.mode, (1, 1))
+        if img.mode == 'P':
+            probe.putpalette(img.palette)
+        probe.info['transparency'] = img.info['transparency']
+        transparency = probe.convert('RGB').info.get('transparency')
+        return transparency if isinstance(transparency, tuple) else None
+    
+    @staticmethod
+    def read_strips(img, rows):
+        """
+        Legge un'immagine PNG o BMP a fasce di righe (vedi can_stream)
+        
+        Args:
+            img: Immagine PIL aperta con open_image (non decodificata)
+            rows: Righe per fascia (l'ultima può essere più corta)
+            
+        Yields:
+            Tupla (riga iniziale, fascia RGB)
+        """
+        if img.format == 'BMP':
+            strips = ImageProcessor._read_bmp_strips(img, rows)
+        else:
+            strips = ImageProcessor._read_png_strips(img, rows)
+        for y, strip in strips:
+            if strip.mode == 'P':
+                strip.putpalette(img.palette)
+            if strip.mode != 'RGB':
+                with ImageProcessor.profile_stage('convert'):
+                    strip = strip.convert('RGB')
+            yield y, strip
+    
+    @staticmethod
+    def _read_bmp_strips(img, rows):
+        """Fasce di un BMP non compresso: le righe si leggono direttamente dal file"""
+        _, _, offset, (rawmode, stride, orientation) = img.tile[0][:4]
+        width, height = img.size
+        for y in range(0, height, rows):
+            count = min(rows, height - y)
+            # Con orientation -1 le righe sono memorizzate dal basso
+            first = y if orientation > 0 else height - y - count
+            with ImageProcessor.profile_stage('decode'):
+                img.fp.seek(offset + first * stride)
+                data = img.fp.read(count * stride)
+                strip = Image.frombytes(img.mode, (width, count), data,
+                                        'raw', rawmode, stride, orientation)
+            yield y, strip
+    
+    @staticmethod
+    def _read_png_strips(img, rows):
+        """
+        Fasce di un PNG: il flusso IDAT viene decompresso solo per le righe richieste
+        
+        I filtri PNG di una riga dipendono dalla precedente: ogni fascia viene
+        decodificata preceduta dall'ultima riga già decodificata (senza
+        filtro), poi scartata.
+        """
+        _, _, offset, rawmode = img.tile[0][:4]
+        width, height = img.size
+        row_size = 1 + width * _PNG_STRIP_MODES[rawmode]
+        decompressor = zlib.decompressobj()
+        chunks = ImageProcessor._png_idat(img.fp, offset)
+        previous = b''
+        for y in range(0, height, rows):
+            count = min(rows, height - y)
+            with ImageProcessor.profile_stage('decode'):
+                needed = count * row_size
+                data = bytearray()
+                while len(data) < needed:
+                    compressed = decompressor.unconsumed_tail or next(chunks, None)
+                    if compressed is None:
+                        raise OSError("Immagine PNG troncata")
+                    data += decompressor.decompress(compressed, needed - len(data))
+                if previous:
+                    data[:0] = b'\0' + previous
+                strip = Image.frombytes(img.mode, (width, count + bool(previous)),
+                                        zlib.compress(bytes(data), 0), 'zip', rawmode)
+                previous = strip.crop((0, strip.height - 1, width, strip.height)).tobytes()
+                if strip.height > count:
+                    strip = strip.crop((0, 1, width, strip.height))
+            yield y, strip
+    
+    @staticmethod
+    def _png_idat(fp, offset):
+        """Dati compressi dei chunk IDAT consecutivi, dal primo (offset = inizio dati)"""
+        fp.seek(offset - 8)
+        while True:
+            length, kind = struct.unpack('>I4s', fp.read(8))
+            if kind != b'IDAT':
+                return
+            while length:
+                data = fp.read(min(length, 1 << 16))
+                if not data:
+                    return
+                length -= len(data)
+                yield data
+            fp.seek(4, os.SEEK_CUR)  # CRC
+    
+    @staticmethod
+    def open_image(source):
+        """
+        Apre un'immagine leggendo solo l'intestazione (senza decodificarla)
+        
+        Args:
+            source: Percorso file o oggetto file-like (es. BytesIO)
+            
+        Returns:
+            Immagine PIL non ancora decodificata
+        """
+        # I byte letti si contano solo per i file (non per dati già in memoria)
+        bytes_read = 0
+        if ImageProcessor.profiler is not None and isinstance(source, str):
+            bytes_read = os.path.getsize(source)
+        
+        with ImageProcessor.profile_stage('open', bytes_read):
+            return Image.open(source, formats=INPUT_FORMATS)
+    
+    @staticmethod
+    def decode_image(source):
+        """
+        Decodifica un'immagine nel modo RGB di output
+        
+        Le immagini già RGB (es. JPEG) non vengono convertite: il logo viene
+        poi fuso solo nella regione che occupa, senza passare l'intero
+        fotogramma per RGBA e di nuovo per RGB.
+        
+        Args:
+            source: Percorso file, oggetto file-like (es. BytesIO) o
+                immagine già aperta con open_image
+            
+        Returns:
+            Immagine PIL RGB
+        """
+        if isinstance(source, Image.Image):
+            img = source
+        else:
+            img = ImageProcessor.open_image(source)
+        with ImageProcessor.profile_stage('decode'):
+            img.load()
+        if img.mode != 'RGB':
+            # L'eventuale canale alpha viene scartato, come nel salvataggio JPEG
+            with ImageProcessor.profile_stage('convert'):
+                img = img.convert('RGB')
+        return img
+    
+    @staticmethod
+    def composite_logo(img, logo, size_percent, position_type='top_left',
+                       margin_percent=2, rel_position=None,
+                       logo_cache=None, fingerprint=None):
+        """
+        Ridimensiona, posiziona e applica il logo su un'immagine già decodificata
+        
+        Args:
+            img: Immagine PIL RGB (viene modificata)
+            logo: Immagine PIL del logo (con sfondo, non ridimensionato)
+            size_percent: Percentuale di dimensione del logo
+            position_type: Tipo posizione fissa ('top_left', 'top_right', etc.
+                o 'auto' e 'auto_edges' per la zona più uniforme)
+            margin_percent: Percentuale di margine (solo posizione fissa)
+            rel_position: Tupla (rel_x, rel_y) per posizionamento manuale
+            logo_cache: LogoCache per riusare i loghi già ridimensionati (opzionale)
+            fingerprint: Impronta delle impostazioni del logo, usata come chiave cache
+            
+        Returns:
+            Immagine PIL RGB pronta per il salvataggio
+        """
+        logo_resized, planes = ImageProcessor.prepare_logo(
+            img.size, logo, size_percent, logo_cache, fingerprint)
+        position = ImageProcessor.logo_position(
+            img, logo_resized, position_type, margin_percent, rel_position)
+        ImageProcessor.blend_logo(img, logo_resized, position, planes)
+        return img
+    
+    @staticmethod
+    def prepare_logo(target_size, logo, size_percent, logo_cache=None, fingerprint=None):
+        """
+        Ridimensiona il logo per l'immagine (e ne prepara i piani per NumPy)
+        
+        Args:
+            target_size: Tupla (larghezza, altezza) dell'immagine
+            logo: Immagine PIL del logo (con sfondo, non ridimensionato)
+            size_percent: Percentuale di dimensione del logo
+            logo_cache: LogoCache per riusare i loghi già ridimensionati (opzionale)
+            fingerprint: Impronta delle impostazioni del logo, usata come chiave cache
+            
+        Returns:
+            Tupla (logo ridimensionato, piani premoltiplicati o None se la
+            fusione non usa NumPy)
+        """
+        planes = None
+        with ImageProcessor.profile_stage('resize_logo'):
+            if logo_cache is not None:
+                logo_resized = logo_cache.get_resized(logo, target_size, size_percent, fingerprint)
+                if ImageProcessor.blend_backend == 'numpy':
+                    planes = logo_cache.get_premultiplied(logo_resized, fingerprint)
+            else:
+                logo_width, logo_height = ImageProcessor.calculate_logo_size(
+                    logo.width, logo.height, target_size[0], target_size[1], size_percent
+                )
+                logo_resized = logo.resize((logo_width, logo_height), Image.Resampling.LANCZOS)
+                if ImageProcessor.blend_backend == 'numpy':
+                    planes = ImageProcessor.premultiply_logo(logo_resized)
+        return logo_resized, planes
+    
+    @staticmethod
+    def logo_position(img, logo_resized, position_type='top_left', margin_percent=2,
+                      rel_position=None):
+        """
+        Calcola la posizione del logo (manuale, fissa o automatica)
+        
+        Args:
+            img: Immagine PIL RGB (analizzata solo per la posizione automatica)
+            logo_resized: Logo già ridimensionato
+            position_type, margin_percent, rel_position: Come composite_logo
+            
+        Returns:
+            Tupla (x, y) dell'angolo in alto a sinistra del logo
+        """
+        if rel_position is not None:
+            return ImageProcessor.calculate_relative_position(
+                img.width, img.height,
+                logo_resized.width, logo_resized.height,
+                rel_position
+            )
+        if position_type in ('auto', 'auto_edges'):
+            with ImageProcessor.profile_stage('auto_position'):
+                return ImageProcessor.calculate_auto_position(
+                    img, logo_resized, margin_percent,
+                    edges=position_type == 'auto_edges'
+                )
+        return ImageProcessor.calculate_fixed_position(
+            img.width, img.height,
+            logo_resized.width, logo_resized.height,
+            position_type, margin_percent
+        )
+    
+    @staticmethod
+    def blend_logo(img, logo_resized, position, planes=None):
+        """
+        Fonde il logo solo nel suo riquadro, l'alpha del logo fa da maschera
+        
+        Args:
+            img: Immagine PIL RGB (viene modificata)
+            logo_resized: Logo già ridimensionato
+            position: Tupla (x, y) del logo
+            planes: Piani premoltiplicati (se indicati la fusione usa NumPy)
+        """
+        with ImageProcessor.profile_stage('paste'):
+            if planes is not None:
+                ImageProcessor.blend_premultiplied(img, planes, position)
+            else:
+                img.paste(logo_resized, position, logo_resized)
+    
+    @staticmethod
+    def premultiply_logo(logo_resized):
+        """
+        Prepara i piani premoltiplicati del logo per blend_premultiplied
+        
+        Args:
+            logo_resized: Logo RGBA già ridimensionato
+            
+        Returns:
+            Tupla di array uint16 (colore * alpha + 128, 255 - alpha) con
+            forma (altezza, larghezza, 3) e (altezza, larghezza, 1)
+        """
+        _load_numpy()
+        rgba = np.asarray(logo_resized.convert('RGBA'), dtype=np.uint16)
+        alpha = rgba[:, :, 3:]
+        # Il +128 è l'arrotondamento della divisione per 255, come in Pillow
+        premultiplied = rgba[:, :, :3] * alpha + 128
+        inverse_alpha = 255 - alpha
+        premultiplied.flags.writeable = False
+        inverse_alpha.flags.writeable = False
+        return premultiplied, inverse_alpha
+    
+    @staticmethod
+    def blend_premultiplied(img, planes, position):
+        """
+        Fonde il logo premoltiplicato nella sua regione dell'immagine
+        
+        Calcola dst * (255 - a) + src * a con la stessa divisione per 255
+        arrotondata di Image.paste, quindi il risultato è identico pixel per
+        pixel. Le parti del logo fuori dall'immagine vengono ignorate.
+        
+        Args:
+            img: Immagine PIL RGB (viene modificata)
+            planes: Tupla restituita da premultiply_logo
+            position: Tupla (x, y) dell'angolo in alto a sinistra del logo
+        """
+        premultiplied, inverse_alpha = planes
+        height, width = inverse_alpha.shape[:2]
+        x, y = position
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + width, img.width), min(y + height, img.height)
+        if left >= right or top >= bottom:
+            return
+        rows = slice(top - y, bottom - y)
+        cols = slice(left - x, right - x)
+        
+        # Un solo buffer uint16: (255 * 255 + 128) + 255 non supera 65535
+        region = np.array(img.crop((left, top, right, bottom)), dtype=np.uint16)
+        region *= inverse_alpha[rows, cols]
+        region += premultiplied[rows, cols]
+        region += region >> 8
+        region >>= 8
+        img.paste(Image.fromarray(region.astype(np.uint8)), (left, top))
+    
+    @staticmethod
+    def _prepare_output(output_path):
+        """Crea la cartella dell'output (se è un percorso) prima della scrittura"""
+        if not isinstance(output_path, str):
+            return
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        # Un output condiviso con hardlink (vedi DedupIndex) va sostituito,
+        # non sovrascritto: l'altro file non deve cambiare
+        try:
+            if os.stat(output_path).st_nlink > 1:
+                os.remove(output_path)
+        except FileNotFoundError:
+            pass
+    
+    @staticmethod
+    def save_image(img, output_path, profile=OUTPUT_PROFILE, max_bytes=None):
+        """
+        Salva l'immagine con il profilo di codifica indicato
+        
+        Args:
+            img: Immagine PIL RGB
+            output_path: Percorso output (o oggetto file-like)
+            profile: Nome del profilo in OUTPUT_PROFILES
+            max_bytes: Dimensione massima del file; se indicata la qualità
+                viene cercata per ogni immagine (solo JPEG e WebP)
+        """
+        ImageProcessor._prepare_output(output_path)
+        settings = OUTPUT_PROFILES[profile]
+        with ImageProcessor.profile_stage('save') as record:
+            if max_bytes and 'quality' in settings['options']:
+                data = ImageProcessor.encode_to_size(img, profile, max_bytes)
+                if isinstance(output_path, str):
+                    with open(output_path, 'wb') as f:
+                        f.write(data)
+                else:
+                    output_path.write(data)
+            else:
+                img.save(output_path, settings['format'], **settings['options'])
+            if record is not None:
+                record['bytes_written'] = (os.path.getsize(output_path)
+                                           if isinstance(output_path, str)
+                                           else output_path.tell())
+    
+    @staticmethod
+    def encode_to_size(img, profile, max_bytes):
+        """
+        Codifica in memoria con la qualità più alta che rispetta la dimensione massima
+        
+        La qualità viene cercata per bisezione tra TARGET_QUALITY_RANGE e la
+        qualità del profilo; se nemmeno la minima basta, si usa la minima.
+        
+        Args:
+            img: Immagine PIL RGB
+            profile: Nome del profilo in OUTPUT_PROFILES (JPEG o WebP)
+            max_bytes: Dimensione massima in byte
+            
+        Returns:
+            Byte dell'immagine codificata
+        """
+        settings = OUTPUT_PROFILES[profile]
+        
+        def encode(quality):
+            buffer = io.BytesIO()
+            img.save(buffer, settings['format'], **dict(settings['options'], quality=quality))
+            return buffer.getvalue()
+        
+        low, high = TARGET_QUALITY_RANGE
+        high = min(high, settings['options']['quality'])
+        data = encode(high)
+        if len(data) <= max_bytes:
+            return data
+        
+        best = None
+        high -= 1
+        while low <= high:
+            quality = (low + high) // 2
+            data = encode(quality)
+            if len(data) <= max_bytes:
+                best = data
+                low = quality + 1
+            else:
+                high = quality - 1
+        
+        if best is None:
+            # Obiettivo irraggiungibile: meglio un file più grande che illeggibile
+            best = encode(TARGET_QUALITY_RANGE[0])
+        return best
+    
     @staticmethod
     def apply_logo_to_image(img_path, logo, position, output_path):
         """
@@ -151,22 +1545,73 @@ class ImageProcessor:
             True se successo, False altrimenti
         """
         try:
-            img = Image.open(img_path)
-            if img.mode != 'RGBA':
-                img = img.convert('RGBA')
+            img = ImageProcessor.decode_image(img_path)
             
-            # Applica logo
+            # Applica logo (solo nella regione che occupa)
             img.paste(logo, position, logo if logo.mode == 'RGBA' else None)
             
-            # Converti in RGB e salva
-            img_rgb = img.convert('RGB')
-            img_rgb.save(output_path, OUTPUT_FORMAT, quality=OUTPUT_QUALITY)
+            ImageProcessor.save_image(img, output_path)
             
             return True
         except Exception as e:
             print(f"Errore nell'applicazione del logo: {e}")
             return False
     
+    @staticmethod
+    def open_preview_image(img_path, max_size):
+        """
+        Apre un'immagine ridotta per l'anteprima decodificando solo i pixel necessari
+        
+        Per i JPEG usa lo scaling DCT del decoder (Image.draft), così un'immagine
+        da 24-50 MP non viene mai decodificata a piena risoluzione.
+        
+        Args:
+            img_path: Percorso immagine
+            max_size: Tupla (larghezza, altezza) massima dell'anteprima
+            
+        Returns:
+            Tupla (immagine PIL ridotta, (larghezza, altezza) originali)
+        """
+        img = Image.open(img_path, formats=INPUT_FORMATS)
+        original_size = img.size
+        
+        # Riduzione in fase di decodifica (solo JPEG, no-op per altri formati)
+        img.draft('RGB', max_size)
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        
+        return img, original_size
+    
+    @staticmethod
+    def create_preview_logo(logo, original_size, preview_size, size_percent):
+        """
+        Ridimensiona il logo per l'anteprima in scala con l'immagine ridotta
+        
+        Args:
+            logo: Immagine PIL del logo (con sfondo, non ridimensionato)
+            original_size: Tupla (larghezza, altezza) dell'immagine originale
+            preview_size: Tupla (larghezza, altezza) dell'anteprima
+            size_percent: Percentuale di dimensione del logo
+            
+        Returns:
+            Logo ridimensionato per l'anteprima
+        """
+        original_width, original_height = original_size
+        logo_width, logo_height = ImageProcessor.calculate_logo_size(
+            logo.width, logo.height,
+            original_width, original_height,
+            size_percent
+        )
+        
+        # Un solo ridimensionamento direttamente alla scala dell'anteprima
+        scale_factor = preview_size[0] / original_width
+        logo_width_preview = max(1, int(logo_width * scale_factor))
+        logo_height_preview = max(1, int(logo_height * scale_factor))
+        
+        return logo.resize(
+            (logo_width_preview, logo_height_preview),
+            Image.Resampling.LANCZOS
+        )
+    
     @staticmethod
     def get_image_files(folder_path, extensions):
         """
@@ -179,8 +1624,65 @@ class ImageProcessor:
         Returns:
             Lista ordinata di percorsi file
         """
-        files = []
-        for file in os.listdir(folder_path):
-            if file.lower().endswith(extensions):
-                files.append(os.path.join(folder_path, file))
-        return sorted(files)
\ No newline at end of file
+        return sorted(ImageProcessor.iter_image_files(folder_path, extensions))
+    
+    @staticmethod
+    def iter_image_files(folder_path, extensions, recursive=False,
+                         include=None, exclude=None, sort=False):
+        """
+        Scorre i file immagine di una cartella restituendoli man mano
+        
+        Basato su os.scandir: l'elaborazione può iniziare appena trovato il
+        primo file, senza attendere l'elenco completo della cartella.
+        
+        Args:
+            folder_path: Percorso cartella
+            extensions: Tupla di estensioni supportate
+            recursive: Se True visita anche le sottocartelle
+            include: Lista di pattern glob da includere, confrontati con il
+                percorso relativo alla cartella (None = tutti)
+            exclude: Lista di pattern glob da escludere (file o sottocartelle)
+            sort: Se True restituisce i file in ordine alfabetico per cartella
+                (riproducibile, ma ogni cartella viene letta per intero)
+            
+        Yields:
+            Percorsi dei file immagine
+        """
+        include = include or []
+        exclude = exclude or []
+        
+        def matches(rel_path, patterns):
+            return any(fnmatch.fnmatch(rel_path, pattern) for pattern in patterns)
+        
+        pending_dirs = [(folder_path, "")]
+        while pending_dirs:
+            current_dir, rel_dir = pending_dirs.pop()
+            subdirs = []
+            try:
+                with os.scandir(current_dir) as it:
+                    entries = sorted(it, key=lambda e: e.name) if sort else it
+                    for entry in entries:
+                        rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            continue
+                        if is_dir:
+                            if recursive and not matches(rel_path, exclude):
+                                subdirs.append((entry.path, rel_path))
+                            continue
+                        if not entry.name.lower().endswith(extensions):
+                            continue
+                        if include and not matches(rel_path, include):
+                            continue
+                        if matches(rel_path, exclude):
+                            continue
+                        yield entry.path
+            except OSError as e:
+                if not rel_dir:
+                    raise
+                print(f"Errore nella lettura della cartella {current_dir}: {e}")
+                continue
+            
+            # Visita le sottocartelle nell'ordine in cui sono state trovate
+            pending_dirs.extend(reversed(subdirs))
\ No newline at end of file
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo per la cache dei loghi ridimensionati
+"""
+
+from collections import OrderedDict
+import hashlib
+import threading
+
+from PIL import Image
+
+from config import LOGO_CACHE_SIZE
+from utils.image_processor import ImageProcessor
+from utils.settings_manager import SettingsManager
+
+
+# Impostazioni da cui dipende il logo (con sfondo) prima del ridimensionamento
+LOGO_SETTINGS_KEYS = ("logo_file", "bg_color", "bg_shape")
+
+
+class LogoCache:
+    """
+    Cache LRU dei loghi ridimensionati
+
+    Il logo ridimensionato dipende solo dalle dimensioni calcolate e dalle
+    impostazioni del logo (file, sfondo, forma): le foto di una stessa
+    fotocamera condividono poche risoluzioni, quindi quasi tutti i
+    ridimensionamenti LANCZOS vengono evitati.
+    """
+
+    def __init__(self, maxsize=LOGO_CACHE_SIZE):
+        """
+        Inizializza la cache
+
+        Args:
+            maxsize: Numero massimo di loghi tenuti in memoria
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        # Piani premoltiplicati dei loghi ridimensionati (fusione con NumPy)
+        self._planes = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def settings_fingerprint(settings):
+        """
+        Calcola l'impronta delle impostazioni che determinano il logo
+
+        Args:
+            settings: Dizionario impostazioni (chiavi di save_settings)
+
+        Returns:
+            Stringa esadecimale da usare come parte della chiave cache
+        """
+        return SettingsManager.fingerprint(settings, LOGO_SETTINGS_KEYS)
+
+    @staticmethod
+    def content_fingerprint(logo):
+        """
+        Calcola l'impronta del contenuto di un logo
+
+        Usata come chiave quando il chiamante non passa l'impronta delle
+        impostazioni: loghi diversi della stessa dimensione non condividono
+        mai una voce della cache.
+
+        Args:
+            logo: Immagine PIL del logo
+
+        Returns:
+            Stringa esadecimale
+        """
+        digest = hashlib.sha1(f"{logo.mode}{logo.size}".encode("utf-8"))
+        digest.update(logo.tobytes())
+        return digest.hexdigest()
+
+    def get_resized(self, logo, target_size, size_percent, fingerprint=None):
+        """
+        Restituisce il logo ridimensionato per l'immagine target
+
+        Args:
+            logo: Immagine PIL del logo (con sfondo, non ridimensionato)
+            target_size: Tupla (larghezza, altezza) dell'immagine target
+            size_percent: Percentuale di dimensione del logo
+            fingerprint: Impronta delle impostazioni del logo (None = impronta
+                del contenuto, calcolata a ogni chiamata)
+
+        Returns:
+            Logo ridimensionato (condiviso: non va modificato)
+        """
+        if fingerprint is None:
+            fingerprint = self.content_fingerprint(logo)
+        logo_size = ImageProcessor.calculate_logo_size(
+            logo.width, logo.height,
+            target_size[0], target_size[1],
+            size_percent
+        )
+        key = (logo_size, fingerprint)
+
+        with self._lock:
+            logo_resized = self._items.get(key)
+            if logo_resized is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return logo_resized
+            self.misses += 1
+
+        logo_resized = logo.resize(logo_size, Image.Resampling.LANCZOS)
+
+        with self._lock:
+            self._items[key] = logo_resized
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+        return logo_resized
+
+    def get_premultiplied(self, logo_resized, fingerprint=None):
+        """
+        Restituisce i piani premoltiplicati di un logo ridimensionato
+
+        Vengono calcolati una volta per dimensione, come il ridimensionamento.
+
+        Args:
+            logo_resized: Logo restituito da get_resized
+            fingerprint: Impronta delle impostazioni del logo (None = impronta
+                del contenuto del logo ridimensionato)
+
+        Returns:
+            Tupla restituita da ImageProcessor.premultiply_logo (sola lettura)
+        """
+        if fingerprint is None:
+            fingerprint = self.content_fingerprint(logo_resized)
+        key = (logo_resized.size, fingerprint)
+
+        with self._lock:
+            planes = self._planes.get(key)
+            if planes is not None:
+                self._planes.move_to_end(key)
+                return planes
+
+        planes = ImageProcessor.premultiply_logo(logo_resized)
+
+        with self._lock:
+            self._planes[key] = planes
+            self._planes.move_to_end(key)
+            while len(self._planes) > self.maxsize:
+                self._planes.popitem(last=False)
+
+        return planes
+
+    def clear(self):
+        """Svuota la cache e azzera i contatori"""
+        with self._lock:
+            self._items.clear()
+            self._planes.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
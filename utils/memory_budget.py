@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo per limitare la memoria delle immagini decodificate contemporaneamente
+"""
+
+from contextlib import contextmanager
+import threading
+
+
+class MemoryBudget:
+    """
+    Budget di memoria condiviso tra i job di elaborazione
+
+    Ogni job prenota la memoria stimata dall'intestazione dell'immagine
+    prima di decodificarla e la rilascia dopo il salvataggio: se il budget
+    è esaurito attende che un altro job termini. Così più worker non
+    decodificano insieme decine di panorami da centinaia di megapixel.
+
+    Un'immagine più grande dell'intero budget viene comunque elaborata,
+    ma da sola.
+    """
+
+    def __init__(self, limit_mb, shared=False):
+        """
+        Inizializza il budget
+
+        Args:
+            limit_mb: Memoria massima in MB
+            shared: True per condividerlo tra processi (passandolo
+                all'inizializzazione dei worker), False per i soli thread
+        """
+        self.limit = int(limit_mb * 1024 * 1024)
+        if shared:
+            import multiprocessing
+            self._condition = multiprocessing.Condition()
+            self._used = multiprocessing.Value('q', 0, lock=False)
+        else:
+            self._condition = threading.Condition()
+            self._used = _Counter()
+
+    @property
+    def used(self):
+        """Byte attualmente prenotati"""
+        with self._condition:
+            return self._used.value
+
+    def acquire(self, nbytes):
+        """
+        Prenota memoria, attendendo se il budget è esaurito
+
+        Args:
+            nbytes: Byte stimati del job
+
+        Returns:
+            Byte effettivamente prenotati (da passare a release)
+        """
+        nbytes = min(max(0, int(nbytes)), self.limit)
+        with self._condition:
+            while self._used.value + nbytes > self.limit:
+                self._condition.wait()
+            self._used.value += nbytes
+        return nbytes
+
+    def release(self, nbytes):
+        """Rilascia la memoria prenotata con acquire"""
+        if not nbytes:
+            return
+        with self._condition:
+            self._used.value -= nbytes
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes):
+        """Prenota memoria per la durata del blocco with"""
+        reserved = self.acquire(nbytes)
+        try:
+            yield reserved
+        finally:
+            self.release(reserved)
+
+
+class _Counter:
+    """Contatore con la stessa interfaccia di multiprocessing.Value"""
+
+    def __init__(self):
+        self.value = 0
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo per l'elaborazione a stadi (lettura -> decodifica -> composizione -> scrittura)
+"""
+
+import hashlib
+import io
+import os
+import queue
+import threading
+
+from config import PIPELINE_THREADS, PIPELINE_QUEUE_SIZE
+from utils.image_processor import ImageProcessor
+from utils.batch_processor import BatchProcessor
+from utils.memory_budget import MemoryBudget
+
+
+# Segnale di fine flusso tra gli stadi
+_END = object()
+
+
+class PipelineProcessor(BatchProcessor):
+    """
+    Elabora un batch di immagini con una pipeline di thread a stadi
+
+    Ogni stadio ha la sua coda limitata e il suo numero di thread: mentre
+    un'immagine viene codificata, le successive vengono già lette dal
+    disco e decodificate. Pillow rilascia il GIL durante decodifica e
+    codifica, quindi I/O e CPU si sovrappongono anche senza processi.
+
+    La memoria di ogni immagine viene prenotata prima della decodifica e
+    rilasciata dopo la scrittura, così le code non si riempiono di
+    immagini decodificate oltre il budget.
+    """
+
+    STAGES = ('reader', 'decoder', 'compositor', 'writer')
+
+    def __init__(self, settings, threads=None, queue_size=PIPELINE_QUEUE_SIZE, **kwargs):
+        """
+        Inizializza la pipeline
+
+        Args:
+            settings: Dizionario impostazioni (stesse chiavi di save_settings)
+            threads: Dizionario {stadio: numero thread} (default PIPELINE_THREADS)
+            queue_size: Elementi massimi in coda tra due stadi
+            **kwargs: Altre opzioni di BatchProcessor (es. memory_budget_mb)
+        """
+        super().__init__(settings, workers=1, **kwargs)
+        self._memory_budget = None
+        self.threads = dict(PIPELINE_THREADS)
+        self.threads.update(threads or {})
+        self.queue_size = queue_size
+
+    # Stadi: ogni funzione riceve e restituisce il dizionario del job
+
+    def _read(self, job):
+        """Legge i byte del file sorgente (e riusa gli output dei duplicati)"""
+        with ImageProcessor.profile_stage('read') as record:
+            with open(job['img_path'], 'rb') as f:
+                if self.hash_sources:
+                    # Prima della lettura (vedi BatchProcessor.process_file)
+                    stat = os.fstat(f.fileno())
+                    job['source_stat'] = (stat.st_size, stat.st_mtime_ns)
+                job['data'] = f.read()
+            if record is not None:
+                record['bytes_read'] = len(job['data'])
+        if self.hash_sources or self.dedup is not None:
+            with ImageProcessor.profile_stage('hash'):
+                job['sha256'] = hashlib.sha256(job['data']).hexdigest()
+        job['variants'] = self.pending_variants(job['img_path'], job.get('sha256'),
+                                                job['rel_position'])
+        return job
+
+    def _decode(self, job):
+        """Decodifica l'immagine"""
+        if not job['variants']:
+            # Tutti gli output riusati dall'indice dei duplicati
+            job.pop('data')
+            return job
+        img = ImageProcessor.open_image(io.BytesIO(job.pop('data')))
+        animated = ImageProcessor.is_animated(img)
+        strips = not animated and ImageProcessor.can_stream(img, job['variants'],
+                                                            job['rel_position'])
+        if self._memory_budget is not None:
+            frames = 2 if animated else len(job['variants'])
+            rows = ImageProcessor.strip_rows(img) if strips else None
+            job['memory'] = self._memory_budget.acquire(
+                ImageProcessor.estimate_memory(img, frames=frames, rows=rows)
+            )
+        if animated:
+            # Decodificata un fotogramma alla volta dallo stadio di scrittura
+            job['animation'] = img
+        elif strips:
+            # Letta e scritta a fasce di righe dallo stadio di scrittura
+            job['strips'] = img
+        else:
+            job['img'] = ImageProcessor.decode_image(img)
+        return job
+
+    def _composite(self, job):
+        """Applica il logo (di ogni variante)"""
+        if not job['variants'] or 'animation' in job or 'strips' in job:
+            job['outputs'] = []
+            return job
+        job['outputs'] = list(ImageProcessor.render_variants(
+            job.pop('img'),
+            job['variants'],
+            rel_position=job['rel_position'],
+            logo_cache=self.logo_cache
+        ))
+        return job
+
+    def _write(self, job):
+        """Codifica e salva l'immagine (ogni variante)"""
+        if 'animation' in job:
+            ImageProcessor.process_animation(job.pop('animation'), job['variants'],
+                                             job['rel_position'], self.logo_cache)
+        if 'strips' in job:
+            ImageProcessor.process_strips(job.pop('strips'), job['variants'],
+                                          job['rel_position'], self.logo_cache)
+        for frame, variant in job.pop('outputs'):
+            ImageProcessor.save_image(
+                frame,
+                variant['output_path'],
+                variant['output_profile'],
+                variant['max_output_bytes']
+            )
+        self.record_variants(job.get('sha256'), job['variants'], job['rel_position'])
+        self._release_memory(job)
+        return job
+
+    def _release_memory(self, job):
+        """Rilascia la memoria prenotata dal job"""
+        if self._memory_budget is not None:
+            self._memory_budget.release(job.pop('memory', 0))
+
+    def _start_stage(self, func, num_threads, in_queue, out_queue):
+        """
+        Avvia i thread di uno stadio
+
+        Gli errori non interrompono la pipeline: il job viene marcato con
+        l'errore e passato allo stadio successivo senza elaborarlo.
+        L'ultimo thread che termina propaga il segnale di fine.
+        """
+        num_threads = max(1, num_threads)
+        remaining = [num_threads]
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                job = in_queue.get()
+                if job is _END:
+                    # Rimette il segnale per gli altri thread dello stadio
+                    in_queue.put(_END)
+                    with lock:
+                        remaining[0] -= 1
+                        last = remaining[0] == 0
+                    if last:
+                        out_queue.put(_END)
+                    return
+                if self.cancelled and not job.get('cancelled'):
+                    # Annullamento: i job già in coda vengono scartati
+                    job.pop('data', None)
+                    job.pop('img', None)
+                    job.pop('animation', None)
+                    job.pop('strips', None)
+                    job.pop('outputs', None)
+                    self._release_memory(job)
+                    job['cancelled'] = True
+                if job.get('error') is None and not job.get('cancelled'):
+                    try:
+                        with ImageProcessor.profile_image(job['img_path']):
+                            job = func(job)
+                    except Exception as e:
+                        job.pop('data', None)
+                        job.pop('img', None)
+                        job.pop('animation', None)
+                        job.pop('strips', None)
+                        job.pop('outputs', None)
+                        self._release_memory(job)
+                        job['error'] = str(e)
+                out_queue.put(job)
+
+        threads = [
+            threading.Thread(target=worker, name=f"pipeline-{func.__name__}", daemon=True)
+            for _ in range(num_threads)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def process(self, image_files, positions=None):
+        """
+        Elabora le immagini restituendo i risultati man mano che terminano
+
+        Args:
+            image_files: Iterabile di percorsi immagine
+            positions: Dizionario {img_path: (rel_x, rel_y)} (opzionale)
+
+        Yields:
+            Tupla (img_path, successo, errore o None, hash sorgente o None,
+            dimensione e data di modifica della sorgente o None)
+        """
+        positions = positions or {}
+        self.load_logo()
+        if self.memory_budget_mb:
+            self._memory_budget = MemoryBudget(self.memory_budget_mb)
+
+        funcs = (self._read, self._decode, self._composite, self._write)
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(funcs) + 1)]
+
+        threads = []
+        for stage, func, in_queue, out_queue in zip(self.STAGES, funcs, queues, queues[1:]):
+            threads += self._start_stage(func, self.threads[stage], in_queue, out_queue)
+
+        def feed():
+            for img_path in image_files:
+                if not self._wait_resume():
+                    break
+                queues[0].put({
+                    'img_path': img_path,
+                    'rel_position': positions.get(img_path),
+                    'error': None
+                })
+            queues[0].put(_END)
+
+        threading.Thread(target=feed, name="pipeline-feed", daemon=True).start()
+
+        while True:
+            job = queues[-1].get()
+            if job is _END:
+                break
+            if job.get('cancelled'):
+                continue
+            yield (job['img_path'], job['error'] is None, job['error'], job.get('sha256'),
+                   job.get('source_stat'))
+
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo per la preparazione anticipata delle anteprime (modalità manuale)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    PREFETCH_DEPTH, PREFETCH_WORKERS, PREFETCH_MAX_MEMORY_MB,
+    PREVIEW_MAX_WIDTH, PREVIEW_MAX_HEIGHT
+)
+from utils.image_processor import ImageProcessor
+
+
+class PreviewPrefetcher:
+    """
+    Prepara in background anteprima e logo delle prossime immagini
+
+    Mentre l'operatore posiziona il logo sull'immagine corrente, le
+    successive vengono decodificate su thread separati, così ogni click
+    passa subito a un'anteprima già pronta.
+    """
+
+    def __init__(self, image_files, logo, size_percent,
+                 depth=PREFETCH_DEPTH, workers=PREFETCH_WORKERS,
+                 max_memory_mb=PREFETCH_MAX_MEMORY_MB):
+        """
+        Inizializza il prefetcher
+
+        Args:
+            image_files: Lista di percorsi immagine
+            logo: Immagine PIL del logo (con sfondo, non ridimensionato)
+            size_percent: Percentuale di dimensione del logo
+            depth: Numero di immagini preparate in anticipo
+            workers: Numero di thread di decodifica
+            max_memory_mb: Memoria massima per le anteprime in anticipo
+        """
+        self.image_files = image_files
+        self.logo = logo
+        self.size_percent = size_percent
+        self.max_size = (PREVIEW_MAX_WIDTH, PREVIEW_MAX_HEIGHT)
+
+        # Limita la profondità in base alla memoria (anteprima RGBA nel caso peggiore)
+        max_item_bytes = PREVIEW_MAX_WIDTH * PREVIEW_MAX_HEIGHT * 4
+        max_items = max(1, (max_memory_mb * 1024 * 1024) // max_item_bytes)
+        self.depth = max(0, min(depth, max_items))
+
+        # Il logo viene condiviso tra i thread: va decodificato prima
+        self.logo.load()
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers),
+            thread_name_prefix="prefetch"
+        )
+        self._futures = {}
+
+    def _prepare(self, index):
+        """
+        Prepara anteprima e logo per l'immagine all'indice dato
+
+        Returns:
+            Tupla (anteprima PIL, dimensioni originali, logo anteprima)
+        """
+        preview_img, original_size = ImageProcessor.open_preview_image(
+            self.image_files[index],
+            self.max_size
+        )
+        preview_logo = ImageProcessor.create_preview_logo(
+            self.logo,
+            original_size,
+            preview_img.size,
+            self.size_percent
+        )
+        return preview_img, original_size, preview_logo
+
+    def _schedule(self, index):
+        """Avvia la preparazione dell'immagine se non già in corso"""
+        if index < len(self.image_files) and index not in self._futures:
+            self._futures[index] = self._executor.submit(self._prepare, index)
+
+    def get(self, index):
+        """
+        Restituisce anteprima e logo per l'immagine all'indice dato
+
+        Attende la preparazione se non ancora terminata e avvia quella
+        delle immagini successive. Le eccezioni di caricamento vengono
+        propagate al chiamante.
+
+        Args:
+            index: Indice dell'immagine in image_files
+
+        Returns:
+            Tupla (anteprima PIL, dimensioni originali, logo anteprima)
+        """
+        self._schedule(index)
+        for next_index in range(index + 1, index + 1 + self.depth):
+            self._schedule(next_index)
+
+        # Libera le immagini già superate
+        for old_index in [i for i in self._futures if i < index]:
+            self._futures.pop(old_index).cancel()
+
+        return self._futures.pop(index).result()
+
+    def shutdown(self):
+        """Annulla le preparazioni in corso e chiude i thread"""
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo per il manifest delle elaborazioni (batch incrementali e ripristinabili)
+"""
+
+import hashlib
+import json
+import os
+
+from config import MANIFEST_FILE
+from utils.image_processor import ImageProcessor
+from utils.settings_manager import SettingsManager
+
+
+# Impostazioni che influiscono sul risultato dell'elaborazione
+PROCESSING_SETTINGS_KEYS = (
+    "logo_file", "position_mode", "fixed_position",
+    "logo_size_percent", "margin_percent", "bg_color", "bg_shape",
+    "output_profile", "max_output_kb", "variants"
+)
+
+# Dimensione dei blocchi letti per calcolare l'hash dei file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class RunManifest:
+    """
+    Manifest delle immagini elaborate, salvato nella cartella destinazione
+
+    Per ogni immagine sorgente registra dimensione, data di modifica, hash
+    del contenuto, impronta delle impostazioni e percorsi di output (uno per
+    variante). Una
+    nuova esecuzione salta le immagini il cui output è già aggiornato; il
+    controllo usa solo stat() finché dimensione e data non cambiano.
+
+    Ogni immagine elaborata viene aggiunta subito in coda al file (una riga
+    JSON), così un batch interrotto riprende da dove si era fermato.
+    """
+
+    def __init__(self, dest_folder, settings):
+        """
+        Carica il manifest dalla cartella destinazione
+
+        Args:
+            dest_folder: Cartella destinazione
+            settings: Dizionario impostazioni (chiavi di save_settings)
+        """
+        self.dest_folder = dest_folder
+        self.path = os.path.join(dest_folder, MANIFEST_FILE)
+        self.fingerprint = self.settings_fingerprint(settings)
+        self.entries = {}
+        self.skipped = 0
+        self._journal = None
+        self._load()
+
+    @staticmethod
+    def settings_fingerprint(settings):
+        """
+        Calcola l'impronta delle impostazioni che determinano l'output
+
+        Include dimensione e data di modifica dei file logo (anche quelli
+        delle varianti), così un logo aggiornato invalida tutte le immagini
+        già elaborate.
+        """
+        fingerprint_data = {key: settings.get(key) for key in PROCESSING_SETTINGS_KEYS}
+        logo_files = [settings.get("logo_file", "")]
+        logo_files += [variant["logo_file"] for variant in settings.get("variants") or []
+                       if "logo_file" in variant]
+        logo_stats = []
+        for logo_file in logo_files:
+            try:
+                logo_stat = os.stat(logo_file)
+                logo_stats.append([logo_stat.st_size, logo_stat.st_mtime_ns])
+            except OSError:
+                logo_stats.append(None)
+        fingerprint_data["logo_stat"] = logo_stats[0] if len(logo_stats) == 1 else logo_stats
+        return SettingsManager.fingerprint(fingerprint_data)
+
+    @staticmethod
+    def file_hash(path):
+        """Calcola l'hash SHA-256 del file leggendolo a blocchi"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _key(img_path):
+        return os.path.abspath(img_path)
+
+    def _load(self):
+        """Legge il manifest (le righe successive sovrascrivono le precedenti)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Riga troncata da un'interruzione: viene ignorata
+                        continue
+                    self.entries[entry["source"]] = entry
+        except Exception as e:
+            print(f"Errore nel caricamento del manifest: {e}")
+            self.entries = {}
+
+    def is_up_to_date(self, img_path, position=None):
+        """
+        Verifica se l'output di un'immagine è già aggiornato
+
+        Args:
+            img_path: Percorso immagine sorgente
+            position: Posizione relativa manuale (opzionale)
+
+        Returns:
+            True se l'immagine può essere saltata
+        """
+        entry = self.entries.get(self._key(img_path))
+        if entry is None:
+            return False
+        if entry["settings"] != self.fingerprint:
+            return False
+        if entry.get("position") != (list(position) if position else None):
+            return False
+        # Manifest precedenti: un solo percorso di output
+        outputs = entry.get("outputs") or [entry["output"]]
+        if not all(os.path.exists(output) for output in outputs):
+            return False
+
+        try:
+            stat = os.stat(img_path)
+        except OSError:
+            return False
+        if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+
+        # File toccato ma forse non modificato: decide il contenuto
+        if stat.st_size != entry["size"] or self.file_hash(img_path) != entry["sha256"]:
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+        self._append(entry)
+        return True
+
+    def pending(self, image_files, positions=None):
+        """
+        Filtra le immagini da elaborare
+
+        Args:
+            image_files: Iterabile di percorsi immagine
+            positions: Dizionario {img_path: (rel_x, rel_y)} (opzionale)
+
+        Yields:
+            Percorsi delle immagini non ancora aggiornate
+        """
+        positions = positions or {}
+        for img_path in image_files:
+            if self.is_up_to_date(img_path, positions.get(img_path)):
+                self.skipped += 1
+            else:
+                yield img_path
+
+    def record(self, img_path, position=None, source_hash=None, output_path=None,
+               source_stat=None):
+        """
+        Registra un'immagine elaborata con successo
+
+        Args:
+            img_path: Percorso immagine sorgente
+            position: Posizione relativa manuale (opzionale)
+            source_hash: Hash SHA-256 già calcolato dal worker (opzionale)
+            output_path: Percorso di output o lista dei percorsi di tutte le
+                varianti (default: nella cartella destinazione)
+            source_stat: Tupla (dimensione, data di modifica in ns) della
+                sorgente letta prima dell'elaborazione (opzionale)
+
+        Returns:
+            False se la sorgente è cambiata durante l'elaborazione: l'output
+            non corrisponde al file attuale e l'immagine non viene registrata
+        """
+        if output_path is None:
+            output_path = ImageProcessor.get_output_path(img_path, self.dest_folder)
+        outputs = [output_path] if isinstance(output_path, str) else output_path
+        stat = os.stat(img_path)
+        if source_stat is not None and (stat.st_size, stat.st_mtime_ns) != tuple(source_stat):
+            return False
+        entry = {
+            "source": self._key(img_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": source_hash or self.file_hash(img_path),
+            "settings": self.fingerprint,
+            "position": list(position) if position else None,
+            "output": os.path.abspath(outputs[0]),
+            "outputs": [os.path.abspath(output) for output in outputs]
+        }
+        self.entries[entry["source"]] = entry
+        self._append(entry)
+        return True
+
+    def _append(self, entry):
+        """Aggiunge una riga al manifest e la scrive subito su disco"""
+        if self._journal is None:
+            os.makedirs(self.dest_folder, exist_ok=True)
+            self._journal = open(self.path, "a+", encoding="utf-8")
+            # Chiude un'eventuale riga troncata da un'interruzione precedente
+            if self._journal.tell() > 0:
+                self._journal.seek(self._journal.tell() - 1)
+                if self._journal.read(1) != "\n":
+                    self._journal.write("\n")
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+
+    def close(self):
+        """Compatta il manifest (una riga per immagine) con scrittura atomica"""
+        if self._journal is None:
+            return
+        self._journal.close()
+        self._journal = None
+
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Errore nel salvataggio del manifest: {e}")
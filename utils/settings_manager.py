@@ -4,28 +4,192 @@
 Modulo per la gestione delle impostazioni utente
 """
 
+from contextlib import contextmanager
+import copy
+import hashlib
 import json
 import os
-from config import SETTINGS_FILE
+import threading
+from config import OUTPUT_PROFILE, SETTINGS_FILE, SETTINGS_ENV_VAR
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Chiave del file che contiene i preset {nome: impostazioni}
+PRESETS_KEY = "presets"
+
+# Impostazioni di default (stesse chiavi di LogoApplierApp.save_settings)
+DEFAULT_BATCH_SETTINGS = {
+    "source_folder": "",
+    "logo_file": "",
+    "dest_folder": "",
+    "position_mode": "fixed",
+    "fixed_position": "top_left",
+    "logo_size_percent": 10,
+    "margin_percent": 2,
+    "bg_color": "Nessuno",
+    "bg_shape": "Rettangolare",
+    "output_profile": OUTPUT_PROFILE,
+    "max_output_kb": 0,
+    "variants": []
+}
+
+# Cartella dell'applicazione (dove si trova config.py)
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 class SettingsManager:
-    """Classe per gestire il salvataggio e caricamento delle impostazioni"""
+    """
+    Classe per gestire il salvataggio e caricamento delle impostazioni
+    
+    Il file viene letto una volta e riletto solo quando cambia (data di
+    modifica, dimensione o inode). Ogni scrittura crea un file temporaneo
+    nella stessa cartella e lo sostituisce con una rinomina atomica, sotto
+    un lock di file: più processi possono leggerlo e aggiornarlo insieme
+    senza mai vedere un file scritto a metà.
+    
+    Oltre alle impostazioni correnti il file contiene i preset con nome
+    (es. uno per cliente o marchio), selezionabili dai batch con --preset.
+    """
+    
+    # Contenuto del file letto per ultimo: {'path', 'signature', 'data'}
+    _cache = None
+    _cache_lock = threading.Lock()
+    
+    @staticmethod
+    def settings_path():
+        """
+        Percorso assoluto del file impostazioni
+        
+        Returns:
+            Percorso dalla variabile d'ambiente SETTINGS_ENV_VAR oppure
+            SETTINGS_FILE nella cartella dell'applicazione (non in quella
+            corrente)
+        """
+        path = os.environ.get(SETTINGS_ENV_VAR) or os.path.join(_APP_DIR, SETTINGS_FILE)
+        return os.path.abspath(path)
+    
+    @staticmethod
+    def _read_file():
+        """
+        Legge il file impostazioni, riusando la lettura precedente se non è cambiato
+        
+        Returns:
+            Contenuto del file (condiviso: non va modificato) o dizionario vuoto
+        """
+        path = SettingsManager.settings_path()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return {}
+        signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        
+        with SettingsManager._cache_lock:
+            cache = SettingsManager._cache
+            if cache is not None and cache['path'] == path and cache['signature'] == signature:
+                return cache['data']
+        
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("Il file impostazioni non contiene un dizionario")
+        
+        with SettingsManager._cache_lock:
+            SettingsManager._cache = {'path': path, 'signature': signature, 'data': data}
+        return data
+    
+    @staticmethod
+    def invalidate():
+        """Dimentica la lettura in memoria (il file verrà riletto)"""
+        with SettingsManager._cache_lock:
+            SettingsManager._cache = None
+    
+    @staticmethod
+    @contextmanager
+    def _file_lock(path):
+        """Lock esclusivo tra processi per le modifiche del file impostazioni"""
+        with open(path + ".lock", "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    
+    @staticmethod
+    def _update_file(update):
+        """
+        Modifica il file impostazioni in modo atomico
+        
+        Args:
+            update: Funzione che riceve una copia del contenuto e la modifica
+        """
+        path = SettingsManager.settings_path()
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        with SettingsManager._file_lock(path):
+            # Riletto sotto lock: le modifiche degli altri processi non vanno perse
+            try:
+                data = copy.deepcopy(SettingsManager._read_file())
+            except ValueError as e:
+                # File danneggiato: ne resta una copia .bak e il salvataggio lo ripara
+                print(f"File impostazioni non valido, verrà sostituito: {e}")
+                import shutil  # solo in caso di errore
+                shutil.copyfile(path, path + ".bak")
+                data = {}
+            update(data)
+            # Nome unico per processo e thread (le scritture sono sotto lock)
+            tmp_path = os.path.join(
+                folder, f".settings-{os.getpid()}-{threading.get_ident()}.tmp")
+            try:
+                # Stessi permessi del file sostituito (o quelli dati dalla umask)
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+                try:
+                    os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+                except FileNotFoundError:
+                    pass
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        SettingsManager.invalidate()
     
     @staticmethod
     def save_settings(settings_dict):
         """
-        Salva le impostazioni in un file JSON
+        Salva le impostazioni in un file JSON (i preset vengono mantenuti)
         
         Args:
             settings_dict: Dizionario con le impostazioni
-            
+        
         Returns:
             True se successo, False altrimenti
         """
+        def update(data):
+            presets = data.get(PRESETS_KEY)
+            data.clear()
+            data.update(settings_dict)
+            if presets:
+                data[PRESETS_KEY] = presets
+        
         try:
-            with open(SETTINGS_FILE, "w") as f:
-                json.dump(settings_dict, f, indent=2)
+            SettingsManager._update_file(update)
             return True
         except Exception as e:
             print(f"Errore nel salvataggio delle impostazioni: {e}")
@@ -37,16 +201,15 @@ class SettingsManager:
         Carica le impostazioni dal file JSON
         
         Returns:
-            Dizionario con le impostazioni o dizionario vuoto se file non esiste
+            Dizionario con le impostazioni (senza i preset) o dizionario
+            vuoto se il file non esiste
         """
         try:
-            if os.path.exists(SETTINGS_FILE):
-                with open(SETTINGS_FILE, "r") as f:
-                    return json.load(f)
-            return {}
+            data = SettingsManager._read_file()
         except Exception as e:
             print(f"Errore nel caricamento delle impostazioni: {e}")
             return {}
+        return copy.deepcopy({key: value for key, value in data.items() if key != PRESETS_KEY})
     
     @staticmethod
     def get_setting(key, default=None):
@@ -56,9 +219,133 @@ class SettingsManager:
         Args:
             key: Chiave dell'impostazione
             default: Valore di default se non trovato
-            
+        
         Returns:
             Valore dell'impostazione
         """
         settings = SettingsManager.load_settings()
-        return settings.get(key, default)
\ No newline at end of file
+        return settings.get(key, default)
+    
+    @staticmethod
+    def list_presets():
+        """
+        Returns:
+            Lista ordinata dei nomi dei preset salvati
+        """
+        try:
+            data = SettingsManager._read_file()
+        except Exception as e:
+            print(f"Errore nel caricamento delle impostazioni: {e}")
+            return []
+        return sorted(data.get(PRESETS_KEY) or {})
+    
+    @staticmethod
+    def load_preset(name):
+        """
+        Carica un preset sopra le impostazioni correnti
+        
+        Args:
+            name: Nome del preset
+        
+        Returns:
+            Dizionario impostazioni (le chiavi assenti nel preset vengono
+            dalle impostazioni correnti)
+        
+        Raises:
+            ValueError: Preset inesistente
+        """
+        presets = SettingsManager._read_file().get(PRESETS_KEY) or {}
+        if name not in presets:
+            raise ValueError(f"Preset sconosciuto: {name}")
+        settings = SettingsManager.load_settings()
+        settings.update(copy.deepcopy(presets[name]))
+        return settings
+    
+    @staticmethod
+    def load_defaults(argv=None):
+        """
+        Impostazioni usate come default dalle righe di comando (batch e
+        servizio HTTP): quelle salvate dalla GUI o quelle del preset
+        indicato con --preset
+        
+        Args:
+            argv: Argomenti da riga di comando (None = sys.argv)
+        
+        Returns:
+            Dizionario con tutte le chiavi di DEFAULT_BATCH_SETTINGS
+        
+        Raises:
+            ValueError: Preset inesistente
+        """
+        import argparse  # solo per le righe di comando, non per la GUI
+        pre_parser = argparse.ArgumentParser(add_help=False)
+        pre_parser.add_argument("--preset", default=None)
+        known, _ = pre_parser.parse_known_args(argv)
+        
+        defaults = dict(DEFAULT_BATCH_SETTINGS)
+        if known.preset:
+            defaults.update(SettingsManager.load_preset(known.preset))
+        else:
+            defaults.update(SettingsManager.load_settings())
+        return defaults
+    
+    @staticmethod
+    def save_preset(name, settings_dict):
+        """
+        Salva (o sostituisce) un preset con nome
+        
+        Args:
+            name: Nome del preset (es. cliente o marchio)
+            settings_dict: Dizionario con le impostazioni
+        
+        Returns:
+            True se successo, False altrimenti
+        """
+        def update(data):
+            data.setdefault(PRESETS_KEY, {})[name] = settings_dict
+        
+        try:
+            SettingsManager._update_file(update)
+            return True
+        except Exception as e:
+            print(f"Errore nel salvataggio del preset: {e}")
+            return False
+    
+    @staticmethod
+    def delete_preset(name):
+        """
+        Elimina un preset
+        
+        Returns:
+            True se il preset esisteva ed è stato eliminato
+        """
+        found = []
+        
+        def update(data):
+            presets = data.get(PRESETS_KEY) or {}
+            if presets.pop(name, None) is not None:
+                found.append(name)
+        
+        try:
+            SettingsManager._update_file(update)
+        except Exception as e:
+            print(f"Errore nell'eliminazione del preset: {e}")
+            return False
+        return bool(found)
+    
+    @staticmethod
+    def fingerprint(settings_dict, keys=None):
+        """
+        Calcola un'impronta stabile delle impostazioni
+        
+        Args:
+            settings_dict: Dizionario con le impostazioni
+            keys: Chiavi da considerare (None = tutte)
+        
+        Returns:
+            Stringa esadecimale SHA-1
+        """
+        if keys is not None:
+            settings_dict = {key: settings_dict.get(key) for key in keys}
+        payload = json.dumps(settings_dict, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo per la misura dei tempi di ogni fase dell'elaborazione
+"""
+
+from contextlib import contextmanager
+import csv
+import json
+import threading
+import time
+
+
+# Campi di ogni misura (anche colonne della traccia CSV)
+TRACE_FIELDS = ("image", "stage", "wall", "cpu", "bytes_read", "bytes_written")
+
+# Percentili riportati nel riepilogo
+SUMMARY_PERCENTILES = (50, 90, 99)
+
+
+class StageProfiler:
+    """
+    Raccoglie tempo reale, tempo CPU e byte letti/scritti per immagine e fase
+
+    Si attiva assegnandolo a ImageProcessor.profiler: le fasi di
+    ImageProcessor (apertura, decodifica, conversione, ridimensionamento
+    logo, incolla, salvataggio) vengono allora misurate automaticamente.
+    Il tempo CPU è quello del thread corrente, quindi è corretto anche
+    nella pipeline a thread.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def image(self, img_path):
+        """Attribuisce le misure successive del thread corrente all'immagine"""
+        previous = getattr(self._local, "image", None)
+        self._local.image = img_path
+        try:
+            yield
+        finally:
+            self._local.image = previous
+
+    @contextmanager
+    def stage(self, name, bytes_read=0):
+        """
+        Misura una fase
+
+        Yields:
+            Dizionario della misura (il chiamante può aggiornare i byte)
+        """
+        record = {
+            "image": getattr(self._local, "image", None),
+            "stage": name,
+            "bytes_read": bytes_read,
+            "bytes_written": 0
+        }
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield record
+        finally:
+            record["wall"] = time.perf_counter() - wall_start
+            record["cpu"] = time.thread_time() - cpu_start
+            with self._lock:
+                self.records.append(record)
+
+    def drain(self):
+        """Restituisce e rimuove le misure raccolte (per i processi worker)"""
+        with self._lock:
+            records, self.records = self.records, []
+        return records
+
+    def extend(self, records):
+        """Aggiunge misure raccolte altrove (es. da un processo worker)"""
+        with self._lock:
+            self.records.extend(records)
+
+    @staticmethod
+    def _percentile(sorted_values, percent):
+        """Percentile con metodo nearest-rank su valori già ordinati"""
+        if not sorted_values:
+            return 0.0
+        rank = max(1, int(round(percent / 100 * len(sorted_values))))
+        return sorted_values[min(rank, len(sorted_values)) - 1]
+
+    def summary(self, slowest=5):
+        """
+        Crea il riepilogo per fase con totali e percentili
+
+        Args:
+            slowest: Numero di immagini più lente da elencare
+
+        Returns:
+            Testo della tabella di riepilogo
+        """
+        with self._lock:
+            records = list(self.records)
+        if not records:
+            return "Nessuna misura raccolta"
+
+        stages = {}
+        per_image = {}
+        for record in records:
+            stages.setdefault(record["stage"], []).append(record)
+            if record["image"] is not None:
+                per_image[record["image"]] = per_image.get(record["image"], 0.0) + record["wall"]
+
+        percentile_headers = "".join(f"{f'p{p} ms':>10}" for p in SUMMARY_PERCENTILES)
+        lines = [
+            f"{'Fase':<14}{'N':>7}{'Totale s':>11}{'CPU s':>9}{'Media ms':>10}"
+            f"{percentile_headers}{'MB letti':>10}{'MB scritti':>11}"
+        ]
+        total_wall = sum(record["wall"] for record in records)
+        for name, stage_records in stages.items():
+            walls = sorted(record["wall"] for record in stage_records)
+            wall = sum(walls)
+            cpu = sum(record["cpu"] for record in stage_records)
+            read_mb = sum(record["bytes_read"] for record in stage_records) / 1e6
+            written_mb = sum(record["bytes_written"] for record in stage_records) / 1e6
+            percentiles = "".join(
+                f"{self._percentile(walls, p) * 1000:>10.1f}" for p in SUMMARY_PERCENTILES
+            )
+            lines.append(
+                f"{name:<14}{len(walls):>7}{wall:>11.2f}{cpu:>9.2f}"
+                f"{wall / len(walls) * 1000:>10.1f}{percentiles}"
+                f"{read_mb:>10.1f}{written_mb:>11.1f}"
+            )
+        lines.append(f"Tempo totale misurato: {total_wall:.2f} s su {len(per_image)} immagini")
+
+        if per_image and slowest:
+            lines.append("Immagini più lente:")
+            for img_path, wall in sorted(per_image.items(), key=lambda item: -item[1])[:slowest]:
+                lines.append(f"  {wall * 1000:>9.1f} ms  {img_path}")
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        """
+        Salva tutte le misure in JSON o CSV (in base all'estensione)
+
+        Args:
+            path: Percorso del file di traccia (.json o .csv)
+        """
+        with self._lock:
+            records = list(self.records)
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=TRACE_FIELDS)
+                writer.writeheader()
+                writer.writerows(records)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(records, f, indent=2)
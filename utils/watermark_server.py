@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo del servizio HTTP locale che applica il logo alle immagini ricevute
+"""
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import os
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+from config import (
+    APP_VERSION, BACKGROUND_COLORS, BACKGROUND_SHAPES, FIXED_POSITIONS, OUTPUT_PROFILES,
+    SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_QUEUE_SIZE, SERVER_MAX_BODY_MB,
+    SERVER_RETRY_AFTER
+)
+from utils.image_processor import ImageProcessor
+from utils.logo_cache import LogoCache
+
+
+# Tipo MIME dei formati di output
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'PNG': 'image/png',
+    'GIF': 'image/gif'
+}
+
+
+class ServiceBusy(Exception):
+    """Il servizio ha già il numero massimo di richieste in corso e in attesa"""
+
+
+class WatermarkService:
+    """
+    Applica il logo alle immagini ricevute in memoria
+
+    I loghi (con sfondo) e i loghi ridimensionati restano in memoria tra
+    una richiesta e l'altra. Al più `workers` immagini vengono elaborate
+    insieme e al più `queue_size` richieste attendono il proprio turno:
+    oltre questo limite il servizio è saturo e la richiesta viene
+    rifiutata subito (il client riprova più tardi), invece di accumulare
+    immagini decodificate in memoria.
+    """
+
+    def __init__(self, settings, logos=None, workers=SERVER_WORKERS,
+                 queue_size=SERVER_QUEUE_SIZE):
+        """
+        Inizializza il servizio
+
+        Args:
+            settings: Dizionario impostazioni (chiavi di save_settings) usate
+                come default dei parametri della richiesta
+            logos: Dizionario {nome: percorso} di loghi aggiuntivi scelti
+                con il parametro 'logo' (il logo delle impostazioni è 'default')
+            workers: Immagini elaborate contemporaneamente (None = numero di CPU)
+            queue_size: Richieste in attesa oltre quelle in elaborazione
+        """
+        self.settings = settings
+        self.logo_files = {'default': settings["logo_file"]}
+        self.logo_files.update(logos or {})
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.logo_cache = LogoCache()
+        # Loghi con sfondo {(nome, colore, forma): (logo, impronta)}
+        self._logos = {}
+        self._logo_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + queue_size)
+        self._running = threading.BoundedSemaphore(self.workers)
+        self._stats_lock = threading.Lock()
+        self._stats = {'active': 0, 'processed': 0, 'errors': 0, 'rejected': 0}
+
+    def preload(self):
+        """Carica tutti i loghi con lo sfondo delle impostazioni (errori subito all'avvio)"""
+        for name in self.logo_files:
+            self.get_logo(name, self.settings["bg_color"], self.settings["bg_shape"])
+
+    def get_logo(self, name, bg_color, bg_shape):
+        """
+        Restituisce il logo con sfondo, caricandolo alla prima richiesta
+
+        Returns:
+            Tupla (immagine PIL RGBA, impronta per la LogoCache)
+        """
+        key = (name, bg_color, bg_shape)
+        with self._logo_lock:
+            entry = self._logos.get(key)
+            if entry is None:
+                logo_settings = {
+                    "logo_file": self.logo_files[name],
+                    "bg_color": bg_color,
+                    "bg_shape": bg_shape
+                }
+                logo = ImageProcessor.load_logo(self.logo_files[name], bg_color, bg_shape)
+                entry = (logo, LogoCache.settings_fingerprint(logo_settings))
+                self._logos[key] = entry
+        return entry
+
+    def parse_options(self, query):
+        """
+        Legge i parametri della richiesta, con le impostazioni come default
+
+        Args:
+            query: Dizionario {nome: [valori]} (come da urllib.parse.parse_qs)
+
+        Returns:
+            Dizionario delle opzioni di elaborazione
+
+        Raises:
+            ValueError: Parametro sconosciuto o valore non valido
+        """
+        def value(name, default):
+            values = query.get(name)
+            return values[-1] if values else default
+
+        def number(name, default, cast=int):
+            try:
+                return cast(value(name, default))
+            except (TypeError, ValueError):
+                raise ValueError(f"Valore non valido per '{name}'") from None
+
+        unknown = set(query) - {"logo", "position", "size", "margin", "bg_color",
+                                "bg_shape", "profile", "max_kb", "x", "y"}
+        if unknown:
+            raise ValueError(f"Parametri sconosciuti: {', '.join(sorted(unknown))}")
+
+        options = {
+            "logo": value("logo", "default"),
+            "position": value("position", self.settings["fixed_position"]),
+            "size": number("size", self.settings["logo_size_percent"]),
+            "margin": number("margin", self.settings["margin_percent"]),
+            "bg_color": value("bg_color", self.settings["bg_color"]),
+            "bg_shape": value("bg_shape", self.settings["bg_shape"]),
+            "profile": value("profile", self.settings["output_profile"]),
+            "max_kb": number("max_kb", self.settings["max_output_kb"]),
+            "rel_position": None
+        }
+        if options["logo"] not in self.logo_files:
+            raise ValueError(f"Logo sconosciuto: {options['logo']}")
+        if options["position"] not in FIXED_POSITIONS:
+            raise ValueError(f"Posizione sconosciuta: {options['position']}")
+        if not 0 < options["size"] <= 100:
+            raise ValueError("La dimensione del logo deve essere tra 1 e 100")
+        if not 0 <= options["margin"] < 50:
+            raise ValueError("Il margine deve essere tra 0 e 49")
+        if options["bg_color"] not in BACKGROUND_COLORS:
+            raise ValueError(f"Colore sfondo sconosciuto: {options['bg_color']}")
+        if options["bg_shape"] not in BACKGROUND_SHAPES:
+            raise ValueError(f"Forma sfondo sconosciuta: {options['bg_shape']}")
+        if options["profile"] not in OUTPUT_PROFILES:
+            raise ValueError(f"Profilo di output sconosciuto: {options['profile']}")
+        if options["max_kb"] < 0:
+            raise ValueError("La dimensione massima non può essere negativa")
+
+        # Posizione manuale (centro del logo in frazioni dell'immagine)
+        if "x" in query or "y" in query:
+            rel_x = number("x", None, float)
+            rel_y = number("y", None, float)
+            if not (0 <= rel_x <= 1 and 0 <= rel_y <= 1):
+                raise ValueError("x e y devono essere tra 0 e 1")
+            options["rel_position"] = (rel_x, rel_y)
+        return options
+
+    @contextmanager
+    def admit(self):
+        """
+        Occupa un posto tra le richieste in elaborazione o in attesa
+
+        Raises:
+            ServiceBusy: Nessun posto libero (il servizio è saturo)
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            raise ServiceBusy()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def watermark(self, data, options):
+        """
+        Applica il logo a un'immagine ricevuta in memoria
+
+        Come nei batch, un'animazione richiesta con un profilo che non la
+        supporta (es. JPEG) viene restituita come GIF animata.
+
+        Args:
+            data: Byte dell'immagine sorgente
+            options: Opzioni restituite da parse_options
+
+        Returns:
+            Tupla (byte dell'immagine con logo, tipo MIME)
+        """
+        logo, fingerprint = self.get_logo(options["logo"], options["bg_color"],
+                                          options["bg_shape"])
+        profile = ImageProcessor.output_profile_for(io.BytesIO(data), options["profile"])
+        content_type = CONTENT_TYPES[OUTPUT_PROFILES[profile]['format']]
+        output = io.BytesIO()
+        with self._running:
+            with self._stats_lock:
+                self._stats['active'] += 1
+            try:
+                ImageProcessor.process_image(
+                    io.BytesIO(data),
+                    logo,
+                    output,
+                    options["size"],
+                    position_type=options["position"],
+                    margin_percent=options["margin"],
+                    rel_position=options["rel_position"],
+                    logo_cache=self.logo_cache,
+                    fingerprint=fingerprint,
+                    output_profile=profile,
+                    max_output_bytes=options["max_kb"] * 1024 or None
+                )
+            except Exception:
+                with self._stats_lock:
+                    self._stats['errors'] += 1
+                raise
+            finally:
+                with self._stats_lock:
+                    self._stats['active'] -= 1
+        with self._stats_lock:
+            self._stats['processed'] += 1
+        return output.getvalue(), content_type
+
+    def stats(self):
+        """Contatori del servizio (per /health e per i test di carico)"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'logos_loaded': len(self._logos),
+            'cache_hits': self.logo_cache.hits,
+            'cache_misses': self.logo_cache.misses
+        })
+        return stats
+
+
+class WatermarkRequestHandler(BaseHTTPRequestHandler):
+    """
+    Gestisce le richieste HTTP del servizio
+
+        POST /watermark?position=...&size=...  corpo: immagine, risposta: immagine con logo
+        GET  /health                           contatori del servizio in JSON
+    """
+
+    server_version = f"LogoApplier/{APP_VERSION}"
+    # Connessioni persistenti: i client di carico non riaprono il socket a ogni richiesta
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, body, content_type="text/plain; charset=utf-8", headers=None,
+              close=False):
+        if isinstance(body, str):
+            body = (body + "\n").encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if close:
+            # Il corpo della richiesta non è stato letto: la connessione non è riusabile
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlsplit(self.path).path != "/health":
+            self._send(404, "Percorso sconosciuto")
+            return
+        self._send(200, json.dumps(self.server.service.stats()), "application/json")
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlsplit(self.path)
+        if url.path != "/watermark":
+            self._send(404, "Percorso sconosciuto", close=True)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._send(411, "Content-Length mancante", close=True)
+            return
+        if length <= 0:
+            self._send(400, "Nessuna immagine nel corpo della richiesta", close=True)
+            return
+        if length > self.server.max_body_bytes:
+            self._send(413, f"Immagine troppo grande (massimo {self.server.max_body_bytes} byte)",
+                       close=True)
+            return
+        try:
+            options = service.parse_options(parse_qs(url.query))
+        except ValueError as e:
+            self._send(400, str(e), close=True)
+            return
+
+        try:
+            # Il corpo viene letto solo dopo aver ottenuto un posto: la
+            # memoria occupata dalle richieste in attesa resta limitata
+            with service.admit():
+                data = self.rfile.read(length)
+                body, content_type = service.watermark(data, options)
+        except ServiceBusy:
+            self._send(503, "Servizio saturo, riprova", close=True,
+                       headers={"Retry-After": str(self.server.retry_after)})
+            return
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            self._send(400, f"Immagine non valida: {e}")
+            return
+        except Exception as e:
+            self._send(500, f"Errore elaborazione: {e}")
+            return
+        self._send(200, body, content_type)
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+
+class WatermarkServer(ThreadingHTTPServer):
+    """
+    Server HTTP del servizio (un thread per connessione)
+
+    Il numero di thread non limita il lavoro: le immagini elaborate e in
+    attesa sono limitate da WatermarkService.admit.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, service, host=SERVER_HOST, port=SERVER_PORT,
+                 max_body_mb=SERVER_MAX_BODY_MB, retry_after=SERVER_RETRY_AFTER,
+                 access_log=False):
+        """
+        Args:
+            service: WatermarkService che elabora le immagini
+            host: Indirizzo di ascolto (default solo locale)
+            port: Porta (0 = porta libera scelta dal sistema)
+            max_body_mb: Dimensione massima dell'immagine ricevuta
+            retry_after: Secondi suggeriti al client quando il servizio è saturo
+            access_log: Stampa una riga per ogni richiesta
+        """
+        self.service = service
+        self.max_body_bytes = int(max_body_mb * 1024 * 1024)
+        self.retry_after = retry_after
+        self.access_log = access_log
+        super().__init__((host, port), WatermarkRequestHandler)
+
+    @property
+    def url(self):
+        """Indirizzo base del servizio"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
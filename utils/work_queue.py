@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modulo per la coda di lavoro condivisa tra più macchine (cartella su disco di rete)
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+
+from config import (
+    WORK_QUEUE_LEASE_SECONDS, WORK_QUEUE_MAX_ATTEMPTS, WORK_QUEUE_POLL_INTERVAL
+)
+from utils.batch_processor import BatchProcessor
+from utils.settings_manager import SettingsManager
+
+
+class WorkQueue:
+    """
+    Coda di immagini in una cartella condivisa (es. NFS) tra più worker
+
+    Ogni immagine è un file JSON che passa tra le sottocartelle:
+
+        todo/<id>.json            in attesa
+        leases/<id>.<worker>.json assegnata a un worker
+        done/<id>.json            elaborata
+        failed/<id>.json          in errore (con il messaggio)
+
+    Ogni passaggio è una rinomina, atomica anche su NFS: se più worker
+    provano a prendere la stessa immagine, uno solo ci riesce. Il worker
+    rinnova l'assegnazione (data di modifica del file) mentre elabora; se
+    non la rinnova per lease_seconds (worker terminato o macchina spenta)
+    l'immagine torna in attesa, al più max_attempts volte.
+
+    Le date vengono confrontate con l'ora del server dei file (quella di un
+    file appena toccato), quindi gli orologi delle macchine possono essere
+    diversi. Le impostazioni del batch sono salvate nella coda: tutti i
+    worker producono gli stessi output di un'elaborazione su una sola
+    macchina. I percorsi devono essere uguali su tutte le macchine.
+    """
+
+    STATES = ('todo', 'leases', 'done', 'failed')
+
+    def __init__(self, queue_dir, lease_seconds=WORK_QUEUE_LEASE_SECONDS,
+                 max_attempts=WORK_QUEUE_MAX_ATTEMPTS):
+        """
+        Apre (o crea) la coda
+
+        Args:
+            queue_dir: Cartella della coda (condivisa tra le macchine)
+            lease_seconds: Secondi senza rinnovo dopo cui un'assegnazione scade
+            max_attempts: Assegnazioni scadute prima di segnare l'immagine in errore
+        """
+        self.queue_dir = os.path.abspath(queue_dir)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        import socket  # solo per chi usa la coda: non rallenta l'avvio della CLI
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{random.getrandbits(32):08x}"
+        for state in self.STATES:
+            os.makedirs(self._dir(state), exist_ok=True)
+        # Nomi in attesa letti dall'ultima scansione di todo/ (provati senza rileggere)
+        self._candidates = []
+
+    def _dir(self, state):
+        return os.path.join(self.queue_dir, state)
+
+    @property
+    def settings_path(self):
+        return os.path.join(self.queue_dir, "settings.json")
+
+    @staticmethod
+    def task_id(img_path):
+        """Identificativo stabile di un'immagine (dal percorso assoluto)"""
+        return hashlib.sha1(os.path.abspath(img_path).encode("utf-8")).hexdigest()
+
+    def _write_json(self, path, data):
+        """Scrive un file JSON con una rinomina atomica"""
+        tmp_path = os.path.join(self.queue_dir, f".{self.worker_id}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_json(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _now(self):
+        """Ora del server dei file (data di modifica di un file appena toccato)"""
+        clock_path = os.path.join(self.queue_dir, ".clock")
+        with open(clock_path, "a"):
+            pass
+        os.utime(clock_path)
+        return os.stat(clock_path).st_mtime
+
+    def _ids(self, state):
+        """Identificativi delle immagini in uno stato"""
+        return {name.split(".", 1)[0] for name in os.listdir(self._dir(state))
+                if name.endswith(".json")}
+
+    def load_settings(self):
+        """
+        Returns:
+            Impostazioni del batch salvate da submit
+
+        Raises:
+            FileNotFoundError: Coda senza impostazioni (nessun submit)
+        """
+        return self._read_json(self.settings_path)
+
+    def submit(self, settings, image_files, positions=None, force=False):
+        """
+        Aggiunge le immagini alla coda (lato coordinatore)
+
+        Le immagini già elaborate con le stesse impostazioni vengono
+        saltate; con impostazioni diverse i risultati precedenti vengono
+        dimenticati.
+
+        Args:
+            settings: Dizionario impostazioni (chiavi di save_settings)
+            image_files: Iterabile di percorsi immagine
+            positions: Dizionario {img_path: (rel_x, rel_y)} (opzionale)
+            force: Rielabora anche le immagini già elaborate
+
+        Returns:
+            Numero di immagini aggiunte
+
+        Raises:
+            ValueError: Impostazioni diverse mentre la coda ha immagini
+                in attesa o in elaborazione
+        """
+        positions = positions or {}
+        fingerprint = SettingsManager.fingerprint(settings)
+        try:
+            previous = SettingsManager.fingerprint(self.load_settings())
+        except FileNotFoundError:
+            previous = None
+        active = self._ids('todo') | self._ids('leases')
+        if previous != fingerprint:
+            if active:
+                raise ValueError("La coda contiene immagini di un batch con impostazioni "
+                                 "diverse: attendi che finisca o usa un'altra cartella")
+            self._write_json(self.settings_path, settings)
+            force = True
+        if force:
+            for state in ('done', 'failed'):
+                for name in os.listdir(self._dir(state)):
+                    os.remove(os.path.join(self._dir(state), name))
+        skip = active | self._ids('done')
+
+        added = 0
+        for img_path in image_files:
+            task_id = self.task_id(img_path)
+            if task_id in skip:
+                continue
+            position = positions.get(img_path)
+            self._write_json(os.path.join(self._dir('todo'), f"{task_id}.json"), {
+                "id": task_id,
+                "source": os.path.abspath(img_path),
+                "position": list(position) if position else None,
+                "attempts": 0
+            })
+            skip.add(task_id)
+            added += 1
+        return added
+
+    def claim(self):
+        """
+        Prende un'immagine in attesa (lato worker)
+
+        Returns:
+            Dizionario dell'immagine (con la chiave 'lease') o None se non
+            ci sono immagini in attesa
+        """
+        for rescanned in (False, True):
+            if rescanned:
+                # Ordine casuale: worker diversi provano immagini diverse
+                self._candidates = os.listdir(self._dir('todo'))
+                random.shuffle(self._candidates)
+            while self._candidates:
+                name = self._candidates.pop()
+                if not name.endswith(".json"):
+                    continue
+                task_id = name[:-len(".json")]
+                todo = os.path.join(self._dir('todo'), name)
+                lease = os.path.join(self._dir('leases'), f"{task_id}.{self.worker_id}.json")
+                try:
+                    # Data aggiornata prima della rinomina: l'assegnazione
+                    # non è mai visibile con la data di quando era in attesa
+                    os.utime(todo)
+                    os.rename(todo, lease)
+                except FileNotFoundError:
+                    # Presa da un altro worker
+                    continue
+                try:
+                    task = self._read_json(lease)
+                    task["lease"] = lease
+                except (OSError, ValueError, TypeError) as e:
+                    # File danneggiato: segnato in errore, si passa al successivo
+                    self._fail({"id": task_id, "source": None},
+                               f"File dell'immagine danneggiato: {e}")
+                    os.remove(lease)
+                    continue
+                return task
+        return None
+
+    def renew(self, task):
+        """
+        Rinnova l'assegnazione
+
+        Returns:
+            False se l'assegnazione è scaduta ed è stata riassegnata
+        """
+        try:
+            os.utime(task["lease"])
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, task, error=None):
+        """
+        Segna l'immagine come elaborata o in errore
+
+        Args:
+            task: Dizionario restituito da claim
+            error: Messaggio di errore (None = elaborata)
+
+        Returns:
+            False se l'assegnazione era scaduta (l'immagine è di un altro worker)
+        """
+        if error is None:
+            target = os.path.join(self._dir('done'), f"{task['id']}.json")
+            try:
+                os.rename(task["lease"], target)
+                return True
+            except FileNotFoundError:
+                return False
+        if not os.path.exists(task["lease"]):
+            return False
+        self._fail(task, error)
+        try:
+            os.remove(task["lease"])
+        except FileNotFoundError:
+            pass
+        return True
+
+    def release(self, task):
+        """Rimette in attesa un'immagine assegnata (es. worker interrotto)"""
+        try:
+            os.rename(task["lease"], os.path.join(self._dir('todo'), f"{task['id']}.json"))
+        except FileNotFoundError:
+            pass
+
+    def _fail(self, task, error):
+        data = {key: value for key, value in task.items() if key != "lease"}
+        data["error"] = error
+        self._write_json(os.path.join(self._dir('failed'), f"{task['id']}.json"), data)
+
+    def reclaim_expired(self):
+        """
+        Rimette in attesa le immagini con assegnazione scaduta
+
+        Le assegnazioni prese in carico da un worker terminato prima di
+        averle rimesse in attesa (file .expired nella cartella della coda)
+        tornano tra le assegnazioni scadute. Un file danneggiato viene
+        segnato in errore invece di fermare il worker.
+
+        Returns:
+            Numero di immagini riassegnate o segnate in errore
+        """
+        now = self._now()
+        self._recover_expired(now)
+        reclaimed = 0
+        for name in os.listdir(self._dir('leases')):
+            lease = os.path.join(self._dir('leases'), name)
+            try:
+                if now - os.stat(lease).st_mtime <= self.lease_seconds:
+                    continue
+                # Data aggiornata: un file .expired abbandonato si riconosce
+                # dopo lease_seconds. La rinomina assegna la scadenza a un solo worker
+                os.utime(lease)
+                owned = os.path.join(self.queue_dir, f".{name}.{self.worker_id}.expired")
+                os.rename(lease, owned)
+            except FileNotFoundError:
+                continue
+            task_id = name.split(".", 1)[0]
+            try:
+                task = self._read_json(owned)
+                task["attempts"] = task.get("attempts", 0) + 1
+                if task["attempts"] >= self.max_attempts:
+                    self._fail(task, f"Assegnazione scaduta {task['attempts']} volte "
+                                     "(worker terminato durante l'elaborazione?)")
+                else:
+                    self._write_json(os.path.join(self._dir('todo'), f"{task_id}.json"), task)
+            except (OSError, ValueError, AttributeError, TypeError) as e:
+                self._fail({"id": task_id, "source": None},
+                           f"File dell'assegnazione danneggiato: {e}")
+            try:
+                os.remove(owned)
+            except FileNotFoundError:
+                pass
+            reclaimed += 1
+        return reclaimed
+
+    def _recover_expired(self, now):
+        """Riporta in leases/ i file .expired abbandonati da un worker terminato"""
+        for name in os.listdir(self.queue_dir):
+            if not (name.startswith(".") and name.endswith(".expired")):
+                continue
+            owned = os.path.join(self.queue_dir, name)
+            # .<id>.<worker>.json.<worker che l'ha presa>.expired
+            lease_name = name[1:].split(".json.", 1)[0] + ".json"
+            task_id = lease_name.split(".", 1)[0]
+            try:
+                if now - os.stat(owned).st_mtime <= self.lease_seconds:
+                    continue
+                if self._known(task_id):
+                    # Già rimessa in attesa (o conclusa) prima dell'interruzione
+                    os.remove(owned)
+                else:
+                    os.rename(owned, os.path.join(self._dir('leases'), lease_name))
+            except FileNotFoundError:
+                continue
+
+    def _known(self, task_id):
+        """True se l'immagine è in attesa, assegnata, elaborata o in errore"""
+        for state in ('todo', 'done', 'failed'):
+            if os.path.exists(os.path.join(self._dir(state), f"{task_id}.json")):
+                return True
+        return any(name.startswith(f"{task_id}.") for name in os.listdir(self._dir('leases')))
+
+    def status(self):
+        """
+        Returns:
+            Dizionario {stato: numero di immagini}
+        """
+        return {state: len(self._ids(state)) for state in self.STATES}
+
+    def failures(self):
+        """
+        Returns:
+            Lista di (percorso sorgente, errore) delle immagini in errore
+        """
+        failed = []
+        for name in sorted(os.listdir(self._dir('failed'))):
+            try:
+                task = self._read_json(os.path.join(self._dir('failed'), name))
+            except (OSError, ValueError):
+                continue
+            failed.append((task["source"], task["error"]))
+        return failed
+
+
+class QueueWorker:
+    """
+    Elabora le immagini della coda finché non ne restano (lato worker)
+
+    Usa un BatchProcessor a processo singolo con le impostazioni salvate
+    nella coda; un thread rinnova l'assegnazione dell'immagine in corso.
+    Si avviano più worker (anche sulla stessa macchina) per usare più core.
+    """
+
+    def __init__(self, queue, batch=None, poll_interval=WORK_QUEUE_POLL_INTERVAL,
+                 report=print):
+        """
+        Args:
+            queue: WorkQueue
+            batch: BatchProcessor (default: dalle impostazioni della coda)
+            poll_interval: Secondi di attesa quando le immagini rimaste sono in corso
+            report: Funzione che riceve i messaggi di errore
+        """
+        self.queue = queue
+        self.batch = batch or BatchProcessor(queue.load_settings(), workers=1)
+        self.poll_interval = poll_interval
+        self.report = report
+        self.processed = 0
+        self.errors = 0
+        self._current = None
+        self._lock = threading.Lock()
+
+    def _heartbeat(self, stop_event):
+        """Rinnova l'assegnazione in corso tre volte per durata dell'assegnazione"""
+        while not stop_event.wait(self.queue.lease_seconds / 3):
+            with self._lock:
+                task = self._current
+            if task is not None:
+                self.queue.renew(task)
+
+    def run(self, stop_event=None):
+        """
+        Elabora le immagini finché la coda non è vuota o stop_event è impostato
+
+        Returns:
+            Tupla (immagini elaborate, immagini in errore) da questo worker
+        """
+        stop_event = stop_event or threading.Event()
+        self.batch.load_logo()
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(heartbeat_stop,),
+                                     name="queue-heartbeat", daemon=True)
+        heartbeat.start()
+        task = None
+        try:
+            while not stop_event.is_set():
+                self.queue.reclaim_expired()
+                task = self.queue.claim()
+                if task is None:
+                    status = self.queue.status()
+                    if not status['todo'] and not status['leases']:
+                        break
+                    # Immagini in corso su altri worker: potrebbero scadere
+                    stop_event.wait(self.poll_interval)
+                    continue
+                with self._lock:
+                    self._current = task
+                position = tuple(task["position"]) if task["position"] else None
+                _, success, error, _, _ = self.batch.process_file(task["source"], position)
+                with self._lock:
+                    self._current = None
+                if self.queue.complete(task, error):
+                    if success:
+                        self.processed += 1
+                    else:
+                        self.errors += 1
+                        self.report(f"Errore elaborazione {os.path.basename(task['source'])}: "
+                                    f"{error}")
+                task = None
+        finally:
+            heartbeat_stop.set()
+            if task is not None:
+                # Interrotto durante l'elaborazione: l'immagine torna subito in attesa
+                self.queue.release(task)
+        return self.processed, self.errors